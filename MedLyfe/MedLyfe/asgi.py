@@ -3,6 +3,9 @@ ASGI config for MedLyfe project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through this module (e.g. ``uvicorn MedLyfe.asgi:application``)
+to enable the push-based WebRTC signaling stream at /signaling/<room_id>/stream/.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +17,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MedLyfe.settings')
 
 application = get_asgi_application()
+
+# Imported after setup: the reaper needs the app registry.
+from main.reaper import start_reaper_from_settings  # noqa: E402
+
+start_reaper_from_settings()
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -47,6 +49,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,13 +79,99 @@ WSGI_APPLICATION = 'MedLyfe.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# SQLite by default. Set MEDLYFE_DB_ENGINE=postgres (needs psycopg) and the
+# MEDLYFE_DB_NAME/USER/PASSWORD/HOST/PORT variables for PostgreSQL, plus
+# MEDLYFE_DB_POOL=1 to use psycopg's connection pool instead of persistent
+# connections.
+
+_db_engine = os.environ.get('MEDLYFE_DB_ENGINE', 'sqlite')
+
+# Seconds a connection is reused across requests (0 closes it after each one).
+_conn_max_age = int(os.environ.get('MEDLYFE_DB_CONN_MAX_AGE', 60))
+
+if _db_engine == 'postgres':
+    _db_pool = os.environ.get('MEDLYFE_DB_POOL', '') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('MEDLYFE_DB_NAME', 'medlyfe'),
+            'USER': os.environ.get('MEDLYFE_DB_USER', 'medlyfe'),
+            'PASSWORD': os.environ.get('MEDLYFE_DB_PASSWORD', ''),
+            'HOST': os.environ.get('MEDLYFE_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('MEDLYFE_DB_PORT', '5432'),
+            # The pool manages connection reuse itself and cannot be combined
+            # with persistent connections.
+            'CONN_MAX_AGE': 0 if _db_pool else _conn_max_age,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('MEDLYFE_DB_POOL_MIN', 2)),
+                    'max_size': int(os.environ.get('MEDLYFE_DB_POOL_MAX', 10)),
+                },
+            } if _db_pool else {},
+        }
+    }
+elif _db_engine == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('MEDLYFE_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': _conn_max_age,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a writer waits for the lock (sqlite3 busy timeout)
+                # before failing with "database is locked".
+                'timeout': int(os.environ.get('MEDLYFE_SQLITE_TIMEOUT', 20)),
+                # Take the write lock when a transaction begins, so concurrent
+                # writers queue on the busy timeout instead of failing when a
+                # read lock cannot be upgraded.
+                'transaction_mode': 'IMMEDIATE',
+                # Run on every new connection. WAL lets reads continue while a
+                # write is in progress. synchronous=NORMAL avoids an fsync per
+                # commit; in WAL mode the database stays consistent, but the
+                # last commits before a power loss or OS crash can be rolled
+                # back. cache_size is in KiB when negative.
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA cache_size=-{int(os.environ.get('MEDLYFE_SQLITE_CACHE_KB', 20000))};"
+                ),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(
+        f"Unknown MEDLYFE_DB_ENGINE {_db_engine!r}; use 'sqlite' or 'postgres'."
+    )
+
+
+# Cache
+# Local memory by default; set MEDLYFE_CACHE_BACKEND=file (and optionally
+# MEDLYFE_CACHE_LOCATION) to share the cache between worker processes on one
+# host.
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+_cache_backend = os.environ.get('MEDLYFE_CACHE_BACKEND', 'locmem')
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKENDS[_cache_backend],
+        'LOCATION': os.environ.get(
+            'MEDLYFE_CACHE_LOCATION',
+            str(BASE_DIR / 'cache') if _cache_backend == 'file' else 'medlyfe',
+        ),
+        'TIMEOUT': 300,
     }
 }
 
+# Seconds the informational pages (home, about, schemes, ...) are served from
+# the page cache before being rendered again.
+PAGE_CACHE_SECONDS = 600
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -103,6 +192,15 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Session users are loaded together with their Profile (users/backends.py).
+# ModelBackend stays listed so sessions created before the switch remain valid.
+
+AUTHENTICATION_BACKENDS = [
+    'users.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -130,3 +228,15 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static'),
                     ]
 
 
+# Video call cleanup
+# Rooms idle for longer than this are deleted by `manage.py reap_call_rooms`,
+# along with signaling messages that were never delivered.
+
+CALL_ROOM_MAX_IDLE_HOURS = 24
+
+CALL_MESSAGE_MAX_AGE_MINUTES = 60
+
+# Set to a number of seconds to also run the reaper in a background thread of
+# each server process started through MedLyfe/asgi.py or MedLyfe/wsgi.py
+# (including runserver); management commands never start it.
+CALL_ROOM_REAPER_INTERVAL_SECONDS = None
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MedLyfe.settings')
 
 application = get_wsgi_application()
+
+# Imported after setup: the reaper needs the app registry.
+from main.reaper import start_reaper_from_settings  # noqa: E402
+
+start_reaper_from_settings()
@@ -0,0 +1,234 @@
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Min, Window
+from django.db.models.functions import Lead
+from django.utils import timezone
+
+from .models import Prescription, PrescribedMedicine, DosageLog
+
+
+def build_adherence_calendar(patient):
+    """
+    Builds the per-medicine dosage calendars shown on the health tracker.
+
+    All existing DosageLog rows for the patient are loaded in a single query and
+    missing days are filled in memory as "not taken". Rows are only written when
+    the patient actually toggles a checkbox (see update_dosage_log_view), so the
+    number of queries does not grow with the length of the prescription history.
+    """
+    prescriptions = (
+        Prescription.objects.filter(patient=patient)
+        .select_related('doctor')
+        .prefetch_related('medicines')
+        .order_by('-date_prescribed')
+    )
+
+    # { (prescribed_medicine_id, date): taken }
+    taken_by_day = {
+        (medicine_id, log_date): taken
+        for medicine_id, log_date, taken in DosageLog.objects.filter(patient=patient).values_list(
+            'prescribed_medicine_id', 'date', 'taken'
+        )
+    }
+
+    prescriptions_data = []
+    for prescription in prescriptions:
+        start_date = prescription.date_prescribed.date()
+        medicines_data = []
+        for medicine in prescription.medicines.all():
+            days = medicine.duration_weeks * 7
+            dates_in_period = []
+            for offset in range(days):
+                current_date = start_date + timedelta(days=offset)
+                dates_in_period.append({
+                    'date': current_date,
+                    'taken': taken_by_day.get((medicine.id, current_date), False),
+                })
+
+            medicines_data.append({
+                'medicine_obj': medicine,
+                'dates_in_period': dates_in_period,
+            })
+        prescriptions_data.append({
+            'prescription_obj': prescription,
+            'medicines': medicines_data,
+        })
+    return prescriptions_data
+
+
+DOSAGE_BATCH_MAX = 500
+
+
+class DosageToggleError(ValueError):
+    """A toggle in a batch is malformed."""
+
+
+def parse_dosage_toggles(data):
+    """
+    {(medicine_id, date): taken} from a list of {'medicine_id', 'date',
+    'taken'} objects (or {'toggles': [...]}). A later toggle of the same day
+    overrides an earlier one, as it would have on screen.
+    """
+    if isinstance(data, dict):
+        data = data.get('toggles')
+    if not isinstance(data, list):
+        raise DosageToggleError('Expected a list of toggles.')
+    toggles = {}
+    for toggle in data:
+        try:
+            medicine_id = int(toggle['medicine_id'])
+            day = date.fromisoformat(toggle['date'])
+            taken = toggle['taken']
+        except (KeyError, TypeError, ValueError):
+            raise DosageToggleError('Each toggle needs medicine_id, date (YYYY-MM-DD) and taken.')
+        if not isinstance(taken, bool):
+            raise DosageToggleError('taken must be true or false.')
+        toggles[medicine_id, day] = taken
+    return toggles
+
+
+def course_dates(date_prescribed, duration_weeks):
+    """First and last day of a medicine's course, as the calendar shows it."""
+    start = date_prescribed.date()
+    return start, start + timedelta(days=duration_weeks * 7 - 1)
+
+
+def apply_dosage_toggles(patient, toggles):
+    """
+    Stores a batch of {(medicine_id, date): taken} for patient: one joined
+    query checks every medicine belongs to one of the patient's prescriptions,
+    then a single upsert on (prescribed_medicine, patient, date) writes them.
+    Returns the ids of foreign medicines, in which case nothing is written.
+    Raises DosageToggleError, writing nothing, if a date falls outside its
+    medicine's course.
+    """
+    medicine_ids = {medicine_id for medicine_id, _day in toggles}
+    courses = {
+        medicine_id: course_dates(prescribed, weeks)
+        for medicine_id, prescribed, weeks in PrescribedMedicine.objects.filter(
+            id__in=medicine_ids, prescription__patient=patient,
+        ).values_list('id', 'prescription__date_prescribed', 'duration_weeks')
+    }
+    if courses.keys() != medicine_ids:
+        return sorted(medicine_ids - courses.keys())
+    for medicine_id, day in toggles:
+        first, last = courses[medicine_id]
+        if not first <= day <= last:
+            raise DosageToggleError(
+                f'{day.isoformat()} is outside the course of medicine {medicine_id} '
+                f'({first.isoformat()} to {last.isoformat()}).'
+            )
+    with transaction.atomic():
+        DosageLog.objects.bulk_create(
+            [
+                DosageLog(prescribed_medicine_id=medicine_id, patient=patient, date=day, taken=taken)
+                for (medicine_id, day), taken in toggles.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['prescribed_medicine', 'patient', 'date'],
+            update_fields=['taken'],
+        )
+    return []
+
+
+def _taken_logs(doctor, first_day, last_day, patient=None):
+    logs = DosageLog.objects.filter(
+        prescribed_medicine__prescription__doctor=doctor, taken=True, date__gte=first_day, date__lte=last_day,
+    )
+    if patient is not None:
+        logs = logs.filter(prescribed_medicine__prescription__patient=patient)
+    return logs
+
+
+def _longest_gaps(logs):
+    """
+    {prescribed_medicine_id: largest distance in days between two consecutive
+    taken days}. LEAD() pairs each taken day with the next one in the database,
+    and only pairs with missed days in between are returned.
+    """
+    gaps = logs.annotate(
+        next_taken=Window(Lead('date'), partition_by=[F('prescribed_medicine')], order_by=F('date').asc()),
+    ).annotate(
+        gap=ExpressionWrapper(F('next_taken') - F('date'), output_field=DurationField()),
+    ).filter(gap__gt=timedelta(days=1))
+
+    longest = {}
+    for medicine_id, gap in gaps.values_list('prescribed_medicine_id', 'gap'):
+        if gap.days > longest.get(medicine_id, 0):
+            longest[medicine_id] = gap.days
+    return longest
+
+
+def adherence_report(doctor, start, end, patient=None, today=None):
+    """
+    Adherence of every medicine the doctor prescribed (optionally to one
+    patient) over [start, end]: one row per patient and medicine with the
+    days due, days taken, percent taken, longest run of missed days and the
+    last dose taken. Days without a DosageLog count as missed; days after
+    today are not due yet.
+
+    Runs three queries whatever the number of patients or logs: the medicines,
+    one grouped aggregate over the taken logs and one LEAD() window over them
+    for the gaps, both range scans of main_dose_adherence_idx.
+    """
+    today = today or timezone.localdate()
+    last_day = min(end, today)
+    if last_day < start:
+        return []
+
+    medicines = PrescribedMedicine.objects.filter(
+        prescription__doctor=doctor, prescription__date_prescribed__date__lte=last_day,
+    )
+    if patient is not None:
+        medicines = medicines.filter(prescription__patient=patient)
+    medicines = medicines.values_list(
+        'id', 'name', 'dosage', 'duration_weeks', 'prescription_id', 'prescription__date_prescribed',
+        'prescription__patient_id', 'prescription__patient__username',
+    )
+
+    logs = _taken_logs(doctor, start, last_day, patient)
+    taken = {
+        row['prescribed_medicine_id']: row
+        for row in logs.values('prescribed_medicine_id').annotate(
+            taken_days=Count('id'), first_taken=Min('date'), last_taken=Max('date'),
+        ).order_by()
+    }
+    gaps = _longest_gaps(logs)
+
+    report = []
+    for medicine_id, name, dosage, weeks, prescription_id, prescribed, patient_id, username in medicines:
+        # Same course dates as the patient's calendar (build_adherence_calendar).
+        course_start, course_end = course_dates(prescribed, weeks)
+        first, last = max(start, course_start), min(last_day, course_end)
+        if last < first:
+            continue
+        due_days = (last - first).days + 1
+
+        stats = taken.get(medicine_id)
+        if stats is None:
+            taken_days, last_dose, missed_streak = 0, None, due_days
+        else:
+            taken_days = min(stats['taken_days'], due_days)
+            last_dose = stats['last_taken']
+            missed_streak = max(
+                (stats['first_taken'] - first).days,
+                (last - stats['last_taken']).days,
+                gaps.get(medicine_id, 1) - 1,
+                0,
+            )
+        report.append({
+            'patient': {'id': patient_id, 'username': username},
+            'prescription': str(prescription_id),
+            'medicine': {'id': medicine_id, 'name': name, 'dosage': dosage},
+            'start': first.isoformat(),
+            'end': last.isoformat(),
+            'due_days': due_days,
+            'taken_days': taken_days,
+            'percent_taken': round(100 * taken_days / due_days, 1),
+            'longest_missed_streak': missed_streak,
+            'last_dose': last_dose.isoformat() if last_dose else None,
+        })
+    # Least adherent first, which is what a doctor scans the report for.
+    report.sort(key=lambda row: (row['percent_taken'], row['patient']['username'], row['medicine']['name']))
+    return report
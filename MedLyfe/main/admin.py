@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Medicine, Substitute, Symptom, Disease
+from .models import Medicine, Substitute, Symptom, Disease, PrescriptionTemplate, PrescriptionTemplateMedicine
 
 # This class allows you to add substitutes directly on the medicine page
 class SubstituteInline(admin.TabularInline):
@@ -22,3 +22,13 @@ class DiseaseAdmin(admin.ModelAdmin):
 
 admin.site.register(Symptom)
 admin.site.register(Disease, DiseaseAdmin)
+
+class PrescriptionTemplateMedicineInline(admin.TabularInline):
+    model = PrescriptionTemplateMedicine
+    extra = 1
+
+class PrescriptionTemplateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'doctor', 'created_at')
+    inlines = [PrescriptionTemplateMedicineInline]
+
+admin.site.register(PrescriptionTemplate, PrescriptionTemplateAdmin)
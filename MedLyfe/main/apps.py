@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        # Registers the signal handlers that keep the in-memory indexes fresh.
+        from . import search, symptom_scoring  # noqa: F401
@@ -0,0 +1,121 @@
+from bisect import bisect_left
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Appointment
+
+DEFAULT_DAY_START = '09:00'
+DEFAULT_DAY_END = '17:00'
+DEFAULT_SLOT_MINUTES = 30
+MAX_AVAILABILITY_DAYS = 31
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def working_hours():
+    """(start, end) of the bookable day in minutes since midnight."""
+    start = time.fromisoformat(getattr(settings, 'APPOINTMENT_DAY_START', DEFAULT_DAY_START))
+    end = time.fromisoformat(getattr(settings, 'APPOINTMENT_DAY_END', DEFAULT_DAY_END))
+    return _minutes(start), _minutes(end)
+
+
+class DaySchedule:
+    """
+    One doctor's booked intervals on one day, merged into disjoint
+    [start, end) ranges (minutes since midnight) kept as two sorted lists, so
+    a conflict check is one binary search.
+    """
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def conflicts(self, start, end):
+        # The only range that can overlap [start, end) is the last one starting
+        # before end.
+        i = bisect_left(self.starts, end) - 1
+        return i >= 0 and self.ends[i] > start
+
+    def free_slots(self, day_start, day_end, slot_minutes, not_before=None):
+        """Slot-aligned [start, end) pairs within working hours that are free."""
+        slots = []
+        slot_start = day_start
+        if not_before is not None and not_before > slot_start:
+            # Round up to the next slot boundary.
+            slot_start += -(-(not_before - day_start) // slot_minutes) * slot_minutes
+        while slot_start + slot_minutes <= day_end:
+            slot_end = slot_start + slot_minutes
+            i = bisect_left(self.starts, slot_end) - 1
+            if i >= 0 and self.ends[i] > slot_start:
+                # Jump to the first slot boundary at or after the blocking range.
+                blocked_until = self.ends[i]
+                slot_start = day_start + -(-(blocked_until - day_start) // slot_minutes) * slot_minutes
+                continue
+            slots.append((slot_start, slot_end))
+            slot_start = slot_end
+        return slots
+
+
+class AvailabilityIndex:
+    """
+    Per-day schedules for one doctor over a date range, built from a single
+    query over the non-cancelled appointments.
+    """
+
+    def __init__(self, doctor, first_day, last_day, exclude_pk=None):
+        self.doctor = doctor
+        self.first_day = first_day
+        self.last_day = last_day
+        appointments = Appointment.objects.filter(
+            doctor=doctor, date__gte=first_day, date__lte=last_day
+        ).exclude(status='Cancelled')
+        if exclude_pk is not None:
+            appointments = appointments.exclude(pk=exclude_pk)
+
+        intervals = {}
+        for day, start, end in appointments.values_list('date', 'start_time', 'end_time'):
+            intervals.setdefault(day, []).append((_minutes(start), _minutes(end)))
+        self._days = {day: DaySchedule(day_intervals) for day, day_intervals in intervals.items()}
+        self._empty = DaySchedule()
+
+    def schedule(self, day):
+        return self._days.get(day, self._empty)
+
+    def conflicts(self, day, start_time, end_time):
+        return self.schedule(day).conflicts(_minutes(start_time), _minutes(end_time))
+
+    def free_slots(self, slot_minutes=None, now=None):
+        """
+        {day: [(start time, end time), ...]} for every day in the range; days
+        and slots already in the past are left empty.
+        """
+        slot_minutes = slot_minutes or getattr(settings, 'APPOINTMENT_SLOT_MINUTES', DEFAULT_SLOT_MINUTES)
+        day_start, day_end = working_hours()
+        now = timezone.localtime(now)
+        today = now.date()
+
+        result = {}
+        day = self.first_day
+        while day <= self.last_day:
+            if day < today:
+                slots = []
+            else:
+                not_before = _minutes(now) if day == today else None
+                slots = self.schedule(day).free_slots(day_start, day_end, slot_minutes, not_before)
+            result[day] = [(_time(start), _time(end)) for start, end in slots]
+            day += timedelta(days=1)
+        return result
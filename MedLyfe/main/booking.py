@@ -0,0 +1,61 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .availability import AvailabilityIndex
+from .models import Appointment, AppointmentDayLock
+
+# Bookings in one process first take one of these striped locks, so threads
+# competing for the same doctor-day queue here instead of in the database.
+BOOKING_LOCK_STRIPES = 64
+_booking_locks = [threading.Lock() for _ in range(BOOKING_LOCK_STRIPES)]
+
+
+class SlotUnavailable(Exception):
+    """The requested time overlaps a live appointment of the doctor."""
+
+
+@contextmanager
+def doctor_day_lock(doctor, day):
+    """
+    Holds exclusive booking rights for one doctor and day for the duration of
+    the block, which runs inside a transaction.
+
+    Across processes the lock is the doctor-day's AppointmentDayLock row: it is
+    written before anything is read, so a concurrent booking blocks on the row
+    lock (PostgreSQL) or the database write lock (SQLite) until this
+    transaction commits, and then sees its appointment.
+    """
+    with _booking_locks[hash((doctor.pk, day)) % BOOKING_LOCK_STRIPES]:
+        with transaction.atomic():
+            locks = AppointmentDayLock.objects.filter(doctor=doctor, date=day)
+            if not locks.update(version=F('version') + 1):
+                try:
+                    with transaction.atomic():
+                        AppointmentDayLock.objects.create(doctor=doctor, date=day, version=1)
+                except IntegrityError:
+                    # Created concurrently by another process; lock its row.
+                    locks.update(version=F('version') + 1)
+            yield
+
+
+def book_appointment(patient, doctor, day, start_time, end_time, reason='', status='Pending'):
+    """
+    Creates the appointment if the doctor is free from start_time to end_time
+    on day, checking and inserting under the doctor-day lock so two concurrent
+    requests can never both get overlapping times. Raises SlotUnavailable when
+    the time is taken.
+    """
+    with doctor_day_lock(doctor, day):
+        if AvailabilityIndex(doctor, day, day).conflicts(day, start_time, end_time):
+            raise SlotUnavailable()
+        try:
+            with transaction.atomic():
+                return Appointment.objects.create(
+                    patient=patient, doctor=doctor, date=day,
+                    start_time=start_time, end_time=end_time, reason=reason, status=status,
+                )
+        except IntegrityError:
+            raise SlotUnavailable()
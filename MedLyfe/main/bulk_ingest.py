@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import WeightEntry, BloodPressureEntry, GlucoseEntry, Activity, MealEntry
+from .rollups import rebuild_rollups_between
+
+# reading type -> (model, value fields, upsert on (user, date))
+# Weight, blood pressure and glucose allow one reading per user and day, so a
+# re-synced reading replaces the stored one. Activities and meals may repeat
+# within a day and are always inserted.
+READING_TYPES = {
+    'weight': (WeightEntry, ['weight'], True),
+    'blood_pressure': (BloodPressureEntry, ['systolic', 'diastolic'], True),
+    'glucose': (GlucoseEntry, ['glucose_level'], True),
+    'activity': (Activity, ['activity_type', 'duration_minutes', 'calories_burned'], False),
+    'meal': (MealEntry, ['meal_type', 'food_items', 'calories'], False),
+}
+
+INGEST_MAX_ROWS = 10000
+INGEST_BATCH_SIZE = 500
+
+
+def parse_readings(body, content_type):
+    """
+    Reads a batch of readings from a request body. JSON bodies are a list of
+    {'type', 'date', <value fields>} objects (or {'readings': [...]}); CSV
+    bodies have a header row with 'type', 'date' and the value field columns
+    needed, blank cells meaning "not given".
+    """
+    text = body.decode('utf-8-sig')
+    if content_type.startswith('text/csv'):
+        return [
+            {key: value for key, value in row.items() if value not in ('', None)}
+            for row in csv.DictReader(io.StringIO(text, newline=''))
+        ]
+    # Decimals keep readings like 78.8 exact for the DecimalField validators.
+    data = json.loads(text, parse_float=Decimal)
+    if isinstance(data, dict):
+        data = data.get('readings')
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise ValueError('Expected a list of reading objects.')
+    if any(not isinstance(row.get('type', ''), str) for row in data):
+        raise ValueError('Reading types must be strings.')
+    return data
+
+
+def _build(user, reading):
+    # Returns (reading type, unsaved instance) or raises ValidationError.
+    reading_type = reading.get('type')
+    if reading_type not in READING_TYPES:
+        raise ValidationError({'type': [f'Unknown reading type {reading_type!r}.']})
+    model, fields, _upsert = READING_TYPES[reading_type]
+    try:
+        day = date.fromisoformat(str(reading.get('date', '')))
+    except ValueError:
+        raise ValidationError({'date': ['Enter a date as YYYY-MM-DD.']})
+    instance = model(user=user, date=day, **{field: reading.get(field) for field in fields})
+    # Field validation only; (user, date) conflicts are resolved by the upsert.
+    instance.full_clean(exclude=['user'], validate_unique=False, validate_constraints=False)
+    return reading_type, instance
+
+
+def ingest_readings(user, readings):
+    """
+    Validates and stores a batch of mixed readings for user in one transaction:
+    one bulk_create per reading type (an upsert on (user, date) for the daily
+    metrics), one query per type to tell inserts from updates, and one rollup
+    rebuild per type over the dates touched.
+
+    Returns {'created', 'updated', 'errors', 'results'}, with one result per
+    input row: {'row', 'status': 'created'|'updated'|'duplicate'|'error', ...}.
+    """
+    results = [None] * len(readings)
+    by_type = {reading_type: {} for reading_type in READING_TYPES}  # type -> {key: (row, instance)}
+
+    for row, reading in enumerate(readings):
+        try:
+            reading_type, instance = _build(user, reading)
+        except ValidationError as e:
+            results[row] = {'row': row, 'status': 'error', 'errors': e.message_dict}
+            continue
+        pending = by_type[reading_type]
+        key = instance.date if READING_TYPES[reading_type][2] else row
+        if key in pending:
+            # The same day twice in one upload: the later reading wins.
+            earlier = pending[key][0]
+            results[earlier] = {'row': earlier, 'status': 'duplicate', 'superseded_by': row}
+        pending[key] = (row, instance)
+
+    with transaction.atomic():
+        for reading_type, pending in by_type.items():
+            if not pending:
+                continue
+            model, fields, upsert = READING_TYPES[reading_type]
+            instances = [instance for _row, instance in pending.values()]
+            days = [instance.date for instance in instances]
+            first, last = min(days), max(days)
+
+            if upsert:
+                existing = set(
+                    model.objects.filter(user=user, date__gte=first, date__lte=last).values_list('date', flat=True)
+                )
+                model.objects.bulk_create(
+                    instances, batch_size=INGEST_BATCH_SIZE,
+                    update_conflicts=True, unique_fields=['user', 'date'], update_fields=fields,
+                )
+            else:
+                existing = set()
+                model.objects.bulk_create(instances, batch_size=INGEST_BATCH_SIZE)
+
+            for row, instance in pending.values():
+                results[row] = {
+                    'row': row,
+                    'status': 'updated' if instance.date in existing else 'created',
+                    'type': reading_type,
+                    'date': instance.date.isoformat(),
+                }
+            # bulk_create bypasses the per-entry rollup maintenance of the views.
+            rebuild_rollups_between(user, model, first, last)
+
+    statuses = [result['status'] for result in results]
+    return {
+        'created': statuses.count('created'),
+        'updated': statuses.count('updated'),
+        'errors': statuses.count('error'),
+        'results': results,
+    }
@@ -0,0 +1,92 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .forms import PrescribedMedicineForm
+from .models import Prescription, PrescribedMedicine, PrescriptionTemplate, PrescriptionTemplateMedicine
+
+BULK_PRESCRIBE_MAX_PATIENTS = 500
+
+
+class RegimenError(ValueError):
+    """The submitted regimen or patient list is invalid; errors holds details."""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or {}
+
+
+def clean_regimen(medicines):
+    """
+    Validates a list of {'name', 'dosage', 'duration_weeks'} dicts with the
+    same form as the prescription page and returns the cleaned rows.
+    """
+    if not isinstance(medicines, list) or not medicines:
+        raise RegimenError('A regimen needs at least one medicine.')
+    cleaned, errors = [], {}
+    for row, medicine in enumerate(medicines):
+        form = PrescribedMedicineForm(data=medicine if isinstance(medicine, dict) else {})
+        if form.is_valid():
+            cleaned.append({field: form.cleaned_data[field] for field in ('name', 'dosage', 'duration_weeks')})
+        else:
+            errors[row] = form.errors.get_json_data()
+    if errors:
+        raise RegimenError('Invalid medicines.', errors)
+    return cleaned
+
+
+def save_template(doctor, name, medicines, advice=''):
+    """Creates or replaces the doctor's template called name."""
+    medicines = clean_regimen(medicines)
+    with transaction.atomic():
+        template, _created = PrescriptionTemplate.objects.update_or_create(
+            doctor=doctor, name=name, defaults={'advice': advice},
+        )
+        template.medicines.all().delete()
+        PrescriptionTemplateMedicine.objects.bulk_create([
+            PrescriptionTemplateMedicine(template=template, **medicine) for medicine in medicines
+        ])
+    return template
+
+
+def template_regimen(template):
+    return list(template.medicines.order_by('id').values('name', 'dosage', 'duration_weeks'))
+
+
+def bulk_prescribe(doctor, patient_ids, medicines, advice=''):
+    """
+    Issues the same regimen to every patient in patient_ids in one transaction:
+    one query to check the ids are patients, then one bulk_create for the
+    prescriptions and one for their medicines, whatever the number of patients.
+    Prescription ids are client-side UUIDs, so the medicines can reference
+    them without reading the inserted rows back.
+
+    No DosageLog rows are written: the adherence calendar treats missing days
+    as not taken (see build_adherence_calendar), so a patient's schedule only
+    gets rows as doses are logged.
+
+    Returns the created prescriptions.
+    """
+    medicines = clean_regimen(medicines)
+    try:
+        patient_ids = list(dict.fromkeys(int(patient_id) for patient_id in patient_ids))
+    except (TypeError, ValueError):
+        raise RegimenError('Patients must be a list of user ids.')
+    if not patient_ids:
+        raise RegimenError('Select at least one patient.')
+
+    found = set(
+        User.objects.filter(id__in=patient_ids, profile__user_type='user').values_list('id', flat=True)
+    )
+    unknown = [patient_id for patient_id in patient_ids if patient_id not in found]
+    if unknown:
+        raise RegimenError('Unknown patients.', {'patients': unknown})
+
+    prescriptions = [Prescription(doctor=doctor, patient_id=patient_id, advice=advice) for patient_id in patient_ids]
+    with transaction.atomic():
+        Prescription.objects.bulk_create(prescriptions)
+        PrescribedMedicine.objects.bulk_create([
+            PrescribedMedicine(prescription=prescription, **medicine)
+            for prescription in prescriptions
+            for medicine in medicines
+        ])
+    return prescriptions
@@ -0,0 +1,209 @@
+import csv
+import json
+import os
+import time
+from decimal import Decimal
+
+from django.db import transaction
+
+from .composition import composition_key
+from .models import Medicine, Substitute
+
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+
+MEDICINE_UPDATE_FIELDS = ['name', 'manufacturer', 'composition', 'price', 'composition_key', 'updated_at']
+
+# CSV files carry one row per substitute; medicines without substitutes leave
+# the substitute_* columns empty. Rows for one medicine must be adjacent.
+CSV_COLUMNS = [
+    'search_tag', 'name', 'manufacturer', 'composition', 'price',
+    'substitute_name', 'substitute_manufacturer', 'substitute_composition', 'substitute_price',
+]
+
+
+def iter_json_array(fileobj, chunk_size=READ_CHUNK_SIZE):
+    """Yields the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # Skip whitespace and separators.
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise ValueError('Expected a JSON array of medicines.')
+            started = True
+            position += 1
+            continue
+        if started and position < len(buffer) and buffer[position] == ']':
+            return
+
+        if position < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                position = end
+                continue
+
+        if eof:
+            if not started:
+                return
+            raise ValueError('Unexpected end of JSON data.')
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_ndjson(fileobj):
+    for line_number, line in enumerate(fileobj, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Invalid JSON on line {line_number}: {e}') from e
+
+
+def iter_csv(fileobj):
+    """Groups adjacent CSV rows into the same medicine entries the JSON format uses."""
+    current = None
+    for row in csv.DictReader(fileobj):
+        search_tag = (row.get('search_tag') or '').strip()
+        if current is None or current['search_tag'] != search_tag:
+            if current is not None:
+                yield current
+            current = {
+                'search_tag': search_tag,
+                'name': row['name'],
+                'manufacturer': row['manufacturer'],
+                'composition': row['composition'],
+                'price': row['price'],
+                'substitutes': [],
+            }
+        if row.get('substitute_name'):
+            current['substitutes'].append({
+                'name': row['substitute_name'],
+                'manufacturer': row['substitute_manufacturer'],
+                'composition': row['substitute_composition'],
+                'price': row['substitute_price'],
+            })
+    if current is not None:
+        yield current
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    return {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}.get(extension, 'json')
+
+
+def iter_medicine_entries(fileobj, file_format):
+    if file_format == 'csv':
+        return iter_csv(fileobj)
+    if file_format == 'ndjson':
+        return iter_ndjson(fileobj)
+    return iter_json_array(fileobj)
+
+
+def _price(value):
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def _substitute_identity(medicine_id, name, manufacturer, composition, price):
+    return (medicine_id, name, manufacturer, composition, _price(price))
+
+
+def import_batch(entries):
+    """
+    Upserts one batch of medicine entries (with nested substitutes) in a
+    single transaction: one upsert for the medicines, one query to resolve
+    their ids, one query for the substitutes they already have and one bulk
+    insert for the new substitutes. Returns (medicines, substitutes_created).
+    """
+    medicines = {}
+    for entry in entries:
+        medicines[entry['search_tag']] = Medicine(
+            search_tag=entry['search_tag'],
+            name=entry['name'],
+            manufacturer=entry['manufacturer'],
+            composition=entry['composition'],
+            price=_price(entry['price']),
+            composition_key=composition_key(entry['composition']),
+        )
+
+    with transaction.atomic():
+        Medicine.objects.bulk_create(
+            list(medicines.values()),
+            update_conflicts=True,
+            unique_fields=['search_tag'],
+            update_fields=MEDICINE_UPDATE_FIELDS,
+        )
+        ids = dict(Medicine.objects.filter(search_tag__in=medicines).values_list('search_tag', 'id'))
+
+        existing = {
+            _substitute_identity(*row)
+            for row in Substitute.objects.filter(original_medicine_id__in=ids.values()).values_list(
+                'original_medicine_id', 'name', 'manufacturer', 'composition', 'price'
+            )
+        }
+        new_substitutes = []
+        for entry in entries:
+            medicine_id = ids[entry['search_tag']]
+            for sub in entry.get('substitutes', ()):
+                identity = _substitute_identity(medicine_id, sub['name'], sub['manufacturer'], sub['composition'], sub['price'])
+                if identity in existing:
+                    continue
+                existing.add(identity)
+                new_substitutes.append(Substitute(
+                    original_medicine_id=medicine_id,
+                    name=sub['name'],
+                    manufacturer=sub['manufacturer'],
+                    composition=sub['composition'],
+                    price=identity[-1],
+                    composition_key=composition_key(sub['composition']),
+                ))
+        Substitute.objects.bulk_create(new_substitutes, batch_size=DEFAULT_BATCH_SIZE)
+
+    return len(medicines), len(new_substitutes)
+
+
+def import_catalog(entries, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Streams medicine entries into the database in batches of `batch_size`
+    medicines. Memory use is bounded by one batch. `progress`, if given, is
+    called with the running totals after every batch.
+    """
+    started = time.monotonic()
+    totals = {'medicines': 0, 'substitutes_created': 0, 'rows': 0, 'seconds': 0.0}
+
+    def flush(batch):
+        medicines, substitutes_created = import_batch(batch)
+        totals['medicines'] += medicines
+        totals['substitutes_created'] += substitutes_created
+        totals['rows'] += len(batch) + sum(len(entry.get('substitutes', ())) for entry in batch)
+        totals['seconds'] = time.monotonic() - started
+        if progress:
+            progress(totals)
+
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    totals['seconds'] = time.monotonic() - started
+    return totals
@@ -0,0 +1,127 @@
+"""
+Typed, one-table-per-metric exports of the health tracker data for analytics.
+
+NDJSON needs nothing beyond the standard library. Parquet and Arrow IPC use
+pyarrow, which is imported only when one of those formats is requested.
+Rows are read with chunked values_list cursors and written in record
+batches, so memory is bounded by the batch size for any number of readings.
+"""
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .models import WeightEntry, BloodPressureEntry, GlucoseEntry, Activity, MealEntry, DosageLog
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow'),
+}
+DEFAULT_BATCH_SIZE = 10000
+
+# table -> (model, owner field, [(column, type)]); types are int, float,
+# string, bool and date.
+EXPORT_TABLES = {
+    'weight': (WeightEntry, 'user', [
+        ('id', 'int'), ('user_id', 'int'), ('date', 'date'), ('weight', 'float'),
+    ]),
+    'blood_pressure': (BloodPressureEntry, 'user', [
+        ('id', 'int'), ('user_id', 'int'), ('date', 'date'), ('systolic', 'int'), ('diastolic', 'int'),
+    ]),
+    'glucose': (GlucoseEntry, 'user', [
+        ('id', 'int'), ('user_id', 'int'), ('date', 'date'), ('glucose_level', 'float'),
+    ]),
+    'activity': (Activity, 'user', [
+        ('id', 'int'), ('user_id', 'int'), ('date', 'date'), ('activity_type', 'string'),
+        ('duration_minutes', 'int'), ('calories_burned', 'int'),
+    ]),
+    'meals': (MealEntry, 'user', [
+        ('id', 'int'), ('user_id', 'int'), ('date', 'date'), ('meal_type', 'string'),
+        ('food_items', 'string'), ('calories', 'int'),
+    ]),
+    'dosage_logs': (DosageLog, 'patient', [
+        ('id', 'int'), ('patient_id', 'int'), ('prescribed_medicine_id', 'int'), ('date', 'date'), ('taken', 'bool'),
+    ]),
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise ImproperlyConfigured('Parquet and Arrow exports require the pyarrow package.') from exc
+    return pyarrow
+
+
+def _convert(kind):
+    # Decimal columns become floats; None stays None in every type.
+    if kind == 'float':
+        return lambda value: None if value is None else float(value)
+    return lambda value: value
+
+
+def iter_batches(table, user=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yields one table's rows as column-oriented batches ({column: [values]}),
+    ordered by id, for one user or (user=None) the whole population.
+    """
+    model, owner, columns = EXPORT_TABLES[table]
+    names = [name for name, _kind in columns]
+    converters = [_convert(kind) for _name, kind in columns]
+    queryset = model.objects.all()
+    if user is not None:
+        queryset = queryset.filter(**{owner: user})
+
+    batch = [[] for _ in names]
+    for row in queryset.order_by('id').values_list(*names).iterator(chunk_size=batch_size):
+        for values, convert, value in zip(batch, converters, row):
+            values.append(convert(value))
+        if len(batch[0]) >= batch_size:
+            yield dict(zip(names, batch))
+            batch = [[] for _ in names]
+    if batch[0]:
+        yield dict(zip(names, batch))
+
+
+def iter_ndjson(table, user=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yields encoded NDJSON chunks, one per record batch; dates are ISO strings."""
+    _model, _owner, columns = EXPORT_TABLES[table]
+    date_columns = [name for name, kind in columns if kind == 'date']
+    for batch in iter_batches(table, user, batch_size):
+        for name in date_columns:
+            batch[name] = [value.isoformat() for value in batch[name]]
+        names = list(batch)
+        lines = [json.dumps(dict(zip(names, row))) for row in zip(*batch.values())]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def arrow_schema(table):
+    pa = _pyarrow()
+    types = {'int': pa.int64(), 'float': pa.float64(), 'string': pa.string(), 'bool': pa.bool_(), 'date': pa.date32()}
+    _model, _owner, columns = EXPORT_TABLES[table]
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def write_columnar(table, sink, file_format, user=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Writes one table to sink (a path or binary file object) as Parquet or an
+    Arrow IPC file, one record batch (Parquet row group) per batch. Returns the
+    number of rows written.
+    """
+    pa = _pyarrow()
+    schema = arrow_schema(table)
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+    rows = 0
+    with writer:
+        for batch in iter_batches(table, user, batch_size):
+            record_batch = pa.RecordBatch.from_pydict(batch, schema=schema)
+            if file_format == 'parquet':
+                writer.write_table(pa.Table.from_batches([record_batch]))
+            else:
+                writer.write_batch(record_batch)
+            rows += record_batch.num_rows
+    return rows
@@ -0,0 +1,69 @@
+"""
+Shape-preserving downsampling for chart series.
+
+Both functions take rows in x order and return a subset of them (never
+synthesised points), so every plotted point is a real entry.
+"""
+
+
+def lttb(rows, threshold, x, y):
+    """
+    Largest-Triangle-Three-Buckets: keeps the first and last rows and, from
+    each of threshold - 2 equal buckets in between, the row forming the
+    largest triangle with the previously kept row and the mean of the next
+    bucket. Peaks and trend changes survive; flat stretches collapse.
+    """
+    n = len(rows)
+    if threshold >= n or threshold < 3:
+        return list(rows)
+
+    xs = [x(row) for row in rows]
+    ys = [y(row) for row in rows]
+    sampled = [rows[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Mean of the next bucket (the last row for the final bucket).
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        best, best_area = start, -1.0
+        ax, ay = xs[a], ys[a]
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(rows[best])
+        a = best
+    sampled.append(rows[-1])
+    return sampled
+
+
+def min_max_buckets(rows, threshold, y):
+    """
+    Splits the rows into threshold // 2 buckets and keeps the lowest and
+    highest row of each, in their original order. Suited to bar charts where
+    spikes matter more than the overall line shape.
+    """
+    n = len(rows)
+    if threshold >= n or threshold < 2:
+        return list(rows)
+
+    buckets = threshold // 2
+    sampled = []
+    for i in range(buckets):
+        start = i * n // buckets
+        end = (i + 1) * n // buckets
+        if start >= end:
+            continue
+        low = min(range(start, end), key=lambda j: y(rows[j]))
+        high = max(range(start, end), key=lambda j: y(rows[j]))
+        sampled.extend(rows[j] for j in sorted({low, high}))
+    return sampled
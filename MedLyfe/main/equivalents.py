@@ -0,0 +1,55 @@
+from django.db.models import Q, Value, CharField
+
+from .composition import composition_key
+from .models import Medicine, Substitute
+
+EQUIVALENT_FIELDS = ('name', 'manufacturer', 'composition', 'price')
+
+
+def index_compositions(full=False, batch_size=2000):
+    """
+    Fills Medicine/Substitute.composition_key for rows that have not been
+    indexed yet (or for every row when full=True, e.g. after the parser
+    changes). Returns the number of rows updated.
+    """
+    updated = 0
+    for model in (Medicine, Substitute):
+        queryset = model.objects.all() if full else model.objects.filter(composition_key__isnull=True)
+        batch = []
+        for row in queryset.only('id', 'composition').iterator(chunk_size=batch_size):
+            row.composition_key = composition_key(row.composition)
+            batch.append(row)
+            if len(batch) >= batch_size:
+                model.objects.bulk_update(batch, ['composition_key'])
+                updated += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['composition_key'])
+            updated += len(batch)
+    return updated
+
+
+def find_equivalents(medicine):
+    """
+    Every Medicine and Substitute in the catalog with the same normalized
+    composition as `medicine` (plus its hand-attached substitutes), cheapest
+    first. Both sides are lookups on the indexed composition_key and are
+    combined into a single UNION query.
+    """
+    key = medicine.composition_key
+    medicines = (
+        Medicine.objects.filter(composition_key=key).exclude(pk=medicine.pk)
+        if key else Medicine.objects.none()
+    )
+    substitute_filter = Q(original_medicine=medicine)
+    if key:
+        substitute_filter |= Q(composition_key=key)
+
+    kind = Value('medicine', output_field=CharField())
+    medicines = medicines.annotate(kind=kind).values(*EQUIVALENT_FIELDS, 'kind')
+    substitutes = (
+        Substitute.objects.filter(substitute_filter)
+        .annotate(kind=Value('substitute', output_field=CharField()))
+        .values(*EQUIVALENT_FIELDS, 'kind')
+    )
+    return list(substitutes.union(medicines).order_by('price', 'name'))
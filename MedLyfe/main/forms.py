@@ -1,14 +1,45 @@
+import copy
+
 from django import forms
 from django.contrib.auth.models import User
+from django.urls import reverse_lazy
 from .models import Prescription, PrescribedMedicine, Appointment
 from users.models import Profile
+from .availability import AvailabilityIndex
+
+class LookupSelect(forms.Select):
+    """
+    A <select> holding only the chosen option; static/js/user_lookup.js adds a
+    search box that finds the others through users:user_lookup. Rendering
+    costs one query for the chosen user instead of listing every user, and
+    ModelChoiceField still validates the submitted id against its queryset.
+    """
+
+    class Media:
+        js = ['js/user_lookup.js']
+
+    def __init__(self, role, attrs=None):
+        attrs = {'class': 'form-control', 'data-lookup-role': role, 'data-lookup-url': reverse_lazy('users:user_lookup'), **(attrs or {})}
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        iterator = self.choices
+        choices = [('', iterator.field.empty_label)] if iterator.field.empty_label is not None else []
+        chosen = [v for v in value if str(v).isdigit()]
+        if chosen:
+            choices += [iterator.choice(obj) for obj in iterator.queryset.filter(pk__in=chosen)]
+        widget = copy.copy(self)
+        widget.choices = choices
+        return super(LookupSelect, widget).optgroups(name, value, attrs)
+
 
 class PrescriptionForm(forms.ModelForm):
-    # Filter patients to only show users with 'user_type' == 'user'
+    # Only users with 'user_type' == 'user' are accepted; they are picked with
+    # the typeahead rather than listed.
     patient = forms.ModelChoiceField(
         queryset=User.objects.filter(profile__user_type='user'),
         empty_label="Select Patient",
-        widget=forms.Select(attrs={'class': 'form-control'})
+        widget=LookupSelect('patient'),
     )
 
     class Meta:
@@ -32,7 +63,7 @@ class AppointmentForm(forms.ModelForm):
     doctor = forms.ModelChoiceField(
         queryset=User.objects.filter(profile__user_type='doctor'),
         empty_label="Select Doctor",
-        widget=forms.Select(attrs={'class': 'form-control'})
+        widget=LookupSelect('doctor'),
     )
     date = forms.DateField(
         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
@@ -63,15 +94,9 @@ class AppointmentForm(forms.ModelForm):
                 self.add_error('end_time', "End time must be after start time.")
 
         if date and start_time and end_time and doctor:
-            # Check for overlapping appointments for the selected doctor
-            overlapping_appointments = Appointment.objects.filter(
-                doctor=doctor,
-                date=date,
-                start_time__lt=end_time,
-                end_time__gt=start_time
-            ).exclude(pk=self.instance.pk if self.instance else None) # Exclude self when updating
-
-            if overlapping_appointments.exists():
+            # Check for overlapping (non-cancelled) appointments for the selected doctor
+            schedule = AvailabilityIndex(doctor, date, date, exclude_pk=self.instance.pk) # Exclude self when updating
+            if schedule.conflicts(date, start_time, end_time):
                 self.add_error(None, "This doctor has an overlapping appointment at the requested time.")
 
         return cleaned_data
@@ -0,0 +1,100 @@
+import csv
+import heapq
+import zlib
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from .models import WeightEntry, BloodPressureEntry, GlucoseEntry, Activity, MealEntry
+
+EXPORT_HEADER = ['Data Type', 'Date', 'Value1', 'Value2', 'Value3', 'Description']
+EXPORT_CHUNK_SIZE = 2000
+# Chunks pulled from the database per thread hop when streaming under ASGI.
+ASYNC_CHUNKS_PER_STEP = 8
+
+
+class _Echo:
+    # csv.writer target that hands each formatted line back instead of buffering it.
+    def write(self, value):
+        return value
+
+
+def _blank(value):
+    return value if value else ''
+
+
+# Each source is (model, fields, row builder); rows keep the original export layout.
+EXPORT_SOURCES = [
+    (WeightEntry, ('date', 'weight'), lambda day, weight: ['Weight', day, weight, '', '', '']),
+    (BloodPressureEntry, ('date', 'systolic', 'diastolic'),
+     lambda day, systolic, diastolic: ['Blood Pressure', day, systolic, diastolic, '', '']),
+    (GlucoseEntry, ('date', 'glucose_level'), lambda day, level: ['Glucose', day, level, '', '', '']),
+    (Activity, ('date', 'duration_minutes', 'calories_burned', 'activity_type'),
+     lambda day, duration, calories, activity_type: ['Activity', day, duration, _blank(calories), activity_type, '']),
+    (MealEntry, ('date', 'calories', 'meal_type', 'food_items'),
+     lambda day, calories, meal_type, food_items: ['Meal', day, _blank(calories), meal_type, food_items, '']),
+]
+
+
+def iter_health_rows(user, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields the user's export rows from all five tables merged in date order
+    (ties keep the table order above). Each table is read with a chunked
+    values_list cursor, so memory stays bounded by chunk_size rows per table.
+    """
+    def source(rank, model, fields, build_row):
+        queryset = model.objects.filter(user=user)
+        if start:
+            queryset = queryset.filter(date__gte=start)
+        if end:
+            queryset = queryset.filter(date__lte=end)
+        rows = queryset.order_by('date', 'id').values_list(*fields).iterator(chunk_size=chunk_size)
+        for position, values in enumerate(rows):
+            yield values[0], rank, position, build_row(*values)
+
+    merged = heapq.merge(*(source(rank, *spec) for rank, spec in enumerate(EXPORT_SOURCES)))
+    for _day, _rank, _position, row in merged:
+        yield row
+
+
+def iter_csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_encoded(lines, batch_lines=500):
+    # Groups lines so the server writes a few large chunks rather than one per row.
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_lines:
+            yield ''.join(batch).encode('utf-8')
+            batch = []
+    if batch:
+        yield ''.join(batch).encode('utf-8')
+
+
+def iter_gzip(chunks):
+    """Compresses a byte stream incrementally into gzip format."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def aiter_chunks(chunks, per_step=ASYNC_CHUNKS_PER_STEP):
+    """
+    Async view of a synchronous chunk iterator for StreamingHttpResponse under
+    ASGI, which would otherwise collect a sync iterator into a list before
+    sending anything. Each step runs the database-backed iterator for
+    per_step chunks in the sync thread.
+    """
+    chunks = iter(chunks)
+    take = sync_to_async(lambda: list(islice(chunks, per_step)))
+    while batch := await take():
+        for chunk in batch:
+            yield chunk
@@ -0,0 +1,50 @@
+import threading
+import time
+
+from django.conf import settings
+
+
+class RefreshingIndex:
+    """
+    A process-wide, lazily built in-memory structure.
+
+    `build` creates the structure from the database. `fingerprint` returns a
+    cheap value (counts, max ids, latest modification times) that changes when
+    the underlying tables do; it is checked at most every `check_setting`
+    seconds so that bulk loads done by other processes, which fire no signals
+    here, are still picked up.
+    Same-process changes should call invalidate() from a signal handler.
+    """
+
+    def __init__(self, build, fingerprint, check_setting, default_check_seconds=30):
+        self._build = build
+        self._fingerprint = fingerprint
+        self._check_setting = check_setting
+        self._default_check_seconds = default_check_seconds
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def _fresh(self, now):
+        check_interval = getattr(settings, self._check_setting, self._default_check_seconds)
+        return self._value is not None and now - self._checked_at < check_interval
+
+    def get(self):
+        now = time.monotonic()
+        if self._fresh(now):
+            return self._value
+
+        with self._lock:
+            if self._fresh(now):
+                return self._value
+            version = self._fingerprint()
+            if self._value is None or version != self._version:
+                self._value = self._build()
+                self._version = version
+            self._checked_at = now
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
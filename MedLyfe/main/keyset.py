@@ -0,0 +1,42 @@
+from datetime import date, time
+
+from django.db.models import Q
+
+# Appointment lists are ordered newest first on (date, start_time, id); the
+# id makes the order total, so a cursor pins an exact position.
+APPOINTMENT_ORDERING = ('-date', '-start_time', '-id')
+
+
+def encode_cursor(appointment):
+    return f'{appointment.date.isoformat()}_{appointment.start_time.isoformat()}_{appointment.pk}'
+
+
+def decode_cursor(cursor):
+    """(date, start_time, id) from a cursor string; raises ValueError."""
+    day, start, pk = cursor.split('_')
+    return date.fromisoformat(day), time.fromisoformat(start), int(pk)
+
+
+def appointments_after(queryset, cursor):
+    """Rows strictly after the cursor in APPOINTMENT_ORDERING (i.e. older)."""
+    day, start, pk = decode_cursor(cursor)
+    return queryset.filter(
+        Q(date__lt=day)
+        | Q(date=day, start_time__lt=start)
+        | Q(date=day, start_time=start, id__lt=pk)
+    )
+
+
+def keyset_page(queryset, cursor=None, page_size=20):
+    """
+    One page of appointments and the cursor of the next page (None on the
+    last page). Each page is a single indexed range scan of page_size + 1 rows
+    no matter how deep the client has paged, unlike OFFSET.
+    """
+    if cursor:
+        queryset = appointments_after(queryset, cursor)
+    rows = list(queryset.order_by(*APPOINTMENT_ORDERING)[:page_size + 1])
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
@@ -0,0 +1,169 @@
+import csv
+import json
+import os
+
+from django.db import transaction
+
+from .models import Symptom, Disease
+from .symptom_scoring import invalidate_scoring_engine
+
+# Symptoms in the CSV format are separated by semicolons:
+#   name,description,precautions,symptoms
+#   Migraine,...,...,Nausea;Vomiting;Sensitivity to light and sound
+CSV_SYMPTOM_SEPARATOR = ';'
+
+
+def read_medical_data(path, file_format=None):
+    """
+    Reads a disease knowledge base into a list of
+    {'name', 'description', 'precautions', 'symptoms'} dicts.
+
+    JSON files may hold a list of such records or a mapping of disease name to
+    {'symptoms', 'description', 'precautions'} (the original layout).
+    """
+    file_format = file_format or ('csv' if os.path.splitext(path)[1].lower() == '.csv' else 'json')
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if file_format == 'csv':
+            return _read_csv_records(f)
+        data = json.load(f)
+    if isinstance(data, dict):
+        return [dict(values, name=name) for name, values in data.items()]
+    return data
+
+
+def _read_csv_records(f):
+    """
+    Short rows leave the missing columns empty; a row without a name or with
+    more columns than the header raises ValueError naming its line.
+    """
+    reader = csv.DictReader(f)
+    records = []
+    for row in reader:
+        name = (row.get('name') or '').strip()
+        if not name or None in row:
+            raise ValueError(f'Malformed row on line {reader.line_num}: {row!r}')
+        records.append({
+            'name': name,
+            'description': row.get('description') or '',
+            'precautions': row.get('precautions') or '',
+            'symptoms': (row.get('symptoms') or '').split(CSV_SYMPTOM_SEPARATOR),
+        })
+    return records
+
+
+def _clean_symptoms(names):
+    # Keep order, drop blanks and duplicates.
+    seen = {}
+    for name in names:
+        name = name.strip()
+        if name and name not in seen:
+            seen[name] = None
+    return list(seen)
+
+
+def import_medical_data(records):
+    """
+    Idempotently loads diseases and their symptoms with a fixed number of
+    queries, whatever the size of the dataset:
+
+      * one query to preload existing symptoms, one bulk insert for new ones
+        (plus one to reload their ids),
+      * one query to preload existing diseases, one bulk insert / bulk update
+        for new and changed ones,
+      * one query to preload existing symptom links, one bulk insert, and one
+        lookup and one delete of the removed links for the Disease.symptoms
+        through table.
+
+    Diseases whose description, precautions and symptoms are unchanged are
+    skipped. Returns a dict of counts.
+    """
+    records_by_name = {}
+    for record in records:
+        name = record['name'].strip()
+        records_by_name[name] = {
+            'description': record.get('description', ''),
+            'precautions': record.get('precautions', ''),
+            'symptoms': _clean_symptoms(record.get('symptoms', [])),
+        }
+
+    stats = {'symptoms_created': 0, 'diseases_created': 0, 'diseases_updated': 0, 'diseases_unchanged': 0, 'links_created': 0, 'links_deleted': 0}
+    Through = Disease.symptoms.through
+
+    with transaction.atomic():
+        # Symptoms
+        wanted_symptoms = {s for record in records_by_name.values() for s in record['symptoms']}
+        symptom_ids = dict(Symptom.objects.values_list('name', 'id'))
+        missing = [name for name in wanted_symptoms if name not in symptom_ids]
+        if missing:
+            Symptom.objects.bulk_create([Symptom(name=name) for name in missing], ignore_conflicts=True)
+            symptom_ids = dict(Symptom.objects.values_list('name', 'id'))
+            stats['symptoms_created'] = len(missing)
+
+        # Diseases
+        # The whole knowledge base is preloaded rather than filtered with
+        # name__in, which would hit SQLite's bound-parameter limit.
+        existing = {}
+        for disease_id, name, description, precautions in Disease.objects.order_by('id').values_list(
+            'id', 'name', 'description', 'precautions'
+        ):
+            existing.setdefault(name, (disease_id, description, precautions))
+
+        existing_links = {}
+        for disease_id, symptom_id in Through.objects.values_list('disease_id', 'symptom_id'):
+            existing_links.setdefault(disease_id, set()).add(symptom_id)
+
+        to_create = []
+        to_update = []
+        desired_links = {}  # disease name -> {symptom_id}
+        for name, record in records_by_name.items():
+            wanted = {symptom_ids[s] for s in record['symptoms']}
+            if name not in existing:
+                to_create.append(Disease(name=name, description=record['description'], precautions=record['precautions']))
+                desired_links[name] = wanted
+                continue
+            disease_id, description, precautions = existing[name]
+            fields_changed = (description, precautions) != (record['description'], record['precautions'])
+            links_changed = existing_links.get(disease_id, set()) != wanted
+            if not fields_changed and not links_changed:
+                stats['diseases_unchanged'] += 1
+                continue
+            if fields_changed:
+                to_update.append(Disease(id=disease_id, name=name, description=record['description'], precautions=record['precautions']))
+            desired_links[name] = wanted
+            stats['diseases_updated'] += 1
+
+        if to_create:
+            # The insert returns the new primary keys.
+            for disease in Disease.objects.bulk_create(to_create):
+                existing.setdefault(disease.name, (disease.pk, None, None))
+            stats['diseases_created'] = len(to_create)
+        if to_update:
+            Disease.objects.bulk_update(to_update, ['description', 'precautions'])
+
+        # Disease.symptoms through table
+        new_links = []
+        stale_links = []
+        for name, wanted in desired_links.items():
+            disease_id = existing[name][0]
+            current = existing_links.get(disease_id, set())
+            new_links.extend(Through(disease_id=disease_id, symptom_id=symptom_id) for symptom_id in wanted - current)
+            stale_links.extend((disease_id, symptom_id) for symptom_id in current - wanted)
+        if new_links:
+            Through.objects.bulk_create(new_links, ignore_conflicts=True)
+            stats['links_created'] = len(new_links)
+        if stale_links:
+            stale_pairs = set(stale_links)
+            # Only the links of diseases losing a symptom are read; those are
+            # few, so the id lists stay small.
+            stale_ids = [
+                link_id for link_id, disease_id, symptom_id in Through.objects.filter(
+                    disease_id__in={disease_id for disease_id, _symptom_id in stale_pairs}
+                ).values_list('id', 'disease_id', 'symptom_id')
+                if (disease_id, symptom_id) in stale_pairs
+            ]
+            Through.objects.filter(id__in=stale_ids).delete()
+            stats['links_deleted'] = len(stale_ids)
+
+    # Bulk writes fire no signals, so drop the in-process scoring engine here.
+    invalidate_scoring_engine()
+    return stats
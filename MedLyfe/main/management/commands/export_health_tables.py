@@ -0,0 +1,39 @@
+import os
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from main.columnar_export import EXPORT_TABLES, EXPORT_FORMATS, DEFAULT_BATCH_SIZE, iter_ndjson, write_columnar
+
+class Command(BaseCommand):
+    help = 'Exports every user\'s health tracker data as typed tables (one file per metric) in NDJSON, Parquet or Arrow IPC format.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Directory the table files are written to.')
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='parquet', help='Output format (Parquet and Arrow need pyarrow).')
+        parser.add_argument('--tables', nargs='+', choices=list(EXPORT_TABLES), help='Tables to export (default: all).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per record batch.')
+
+    def handle(self, *args, **options):
+        output_dir = options['output_dir']
+        file_format = options['format']
+        extension = EXPORT_FORMATS[file_format][1]
+        os.makedirs(output_dir, exist_ok=True)
+
+        for table in options['tables'] or EXPORT_TABLES:
+            path = os.path.join(output_dir, f'{table}.{extension}')
+            started = time.monotonic()
+            if file_format == 'ndjson':
+                rows = 0
+                with open(path, 'wb') as f:
+                    for chunk in iter_ndjson(table, batch_size=options['batch_size']):
+                        f.write(chunk)
+                        rows += chunk.count(b'\n')
+            else:
+                try:
+                    rows = write_columnar(table, path, file_format, batch_size=options['batch_size'])
+                except ImproperlyConfigured as e:
+                    raise CommandError(str(e)) from e
+            self.stdout.write(f'  {table}: {rows} rows -> {path} ({time.monotonic() - started:.2f}s)')
+
+        self.stdout.write(self.style.SUCCESS(f'Exported health tables to {output_dir}.'))
@@ -1,46 +1,55 @@
-import json
 import os
-from django.core.management.base import BaseCommand
-from main.models import Medicine, Substitute
+from decimal import InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from main.catalog_import import import_catalog, iter_medicine_entries, detect_format, DEFAULT_BATCH_SIZE
+from main.equivalents import index_compositions
 
 class Command(BaseCommand):
-    help = 'Loads sample medicine and substitute data into the database from a JSON file'
+    help = 'Loads medicine and substitute data into the database from a JSON, NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Data file to load (default: the bundled medicine_data.json).')
+        parser.add_argument('--format', choices=['json', 'ndjson', 'csv'], help='File format (default: detected from the file extension).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Medicines upserted per transaction.')
+        parser.add_argument('--reindex-compositions', action='store_true', help='Recompute the composition key of every medicine and substitute, not only new ones.')
 
     def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS('Starting to load medicine and substitute data from JSON...'))
+        self.stdout.write(self.style.SUCCESS('Starting to load medicine and substitute data...'))
 
-        json_file_path = os.path.join(os.path.dirname(__file__), 'medicine_data.json')
+        data_path = options['path'] or os.path.join(os.path.dirname(__file__), 'medicine_data.json')
 
-        if not os.path.exists(json_file_path):
-            self.stderr.write(self.style.ERROR(f'Error: JSON data file not found at {json_file_path}'))
+        if not os.path.exists(data_path):
+            self.stderr.write(self.style.ERROR(f'Error: data file not found at {data_path}'))
             return
 
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            medicine_data = json.load(f)
-
-        for med_entry in medicine_data:
-            medicine, created = Medicine.objects.get_or_create(
-                search_tag=med_entry['search_tag'],
-                defaults={
-                    'name': med_entry['name'],
-                    'manufacturer': med_entry['manufacturer'],
-                    'composition': med_entry['composition'],
-                    'price': med_entry['price']
-                }
-            )
-            if created:
-                self.stdout.write(self.style.SUCCESS(f'Created Medicine: {medicine.name}'))
-            else:
-                self.stdout.write(self.style.WARNING(f'Medicine already exists: {medicine.name}'))
-            
-            for sub_data in med_entry['substitutes']:
-                Substitute.objects.get_or_create(
-                    original_medicine=medicine,
-                    name=sub_data['name'],
-                    manufacturer=sub_data['manufacturer'],
-                    composition=sub_data['composition'],
-                    price=sub_data['price']
+        file_format = options['format'] or detect_format(data_path)
+        verbosity = options['verbosity']
+
+        def progress(totals):
+            if verbosity >= 2:
+                rate = totals['rows'] / totals['seconds'] if totals['seconds'] else 0
+                self.stdout.write(f"  {totals['rows']} rows ({rate:,.0f} rows/sec)")
+
+        # The file is parsed incrementally and written in batches, so memory use
+        # stays flat regardless of the catalog size.
+        with open(data_path, 'r', encoding='utf-8', newline='') as f:
+            try:
+                totals = import_catalog(
+                    iter_medicine_entries(f, file_format),
+                    batch_size=options['batch_size'],
+                    progress=progress,
                 )
-                self.stdout.write(self.style.SUCCESS(f'  Added Substitute: {sub_data["name"]} for {medicine.name}'))
+            except (ValueError, KeyError, InvalidOperation) as e:
+                raise CommandError(f'Could not load {data_path}: {e!r}') from e
+
+        rate = totals['rows'] / totals['seconds'] if totals['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Upserted {totals['medicines']} medicines and created {totals['substitutes_created']} substitutes "
+            f"from {totals['rows']} rows in {totals['seconds']:.2f}s ({rate:,.0f} rows/sec)."
+        ))
+
+        # Bulk-loaded rows are keyed during the import; this picks up anything left unindexed.
+        indexed = index_compositions(full=options['reindex_compositions'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} compositions.'))
 
-        self.stdout.write(self.style.SUCCESS('Finished loading medicine and substitute data from JSON.'))
+        self.stdout.write(self.style.SUCCESS('Finished loading medicine and substitute data.'))
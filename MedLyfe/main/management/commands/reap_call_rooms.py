@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from main.reaper import reap_call_rooms, DEFAULT_BATCH_SIZE
+
+class Command(BaseCommand):
+    help = 'Deletes idle video call rooms and undelivered signaling messages in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-idle-hours', type=float, help='Expire rooms with no activity for this many hours (default: settings.CALL_ROOM_MAX_IDLE_HOURS).')
+        parser.add_argument('--message-max-age-minutes', type=float, help='Delete undelivered messages older than this (default: settings.CALL_MESSAGE_MAX_AGE_MINUTES).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows deleted per transaction.')
+
+    def handle(self, *args, **options):
+        max_idle = options['max_idle_hours']
+        message_max_age = options['message_max_age_minutes']
+
+        result = reap_call_rooms(
+            max_idle=timedelta(hours=max_idle) if max_idle is not None else None,
+            message_max_age=timedelta(minutes=message_max_age) if message_max_age is not None else None,
+            batch_size=options['batch_size'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reclaimed {result['rooms']} rooms and {result['messages']} messages in {result['seconds']:.3f}s."
+        ))
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from main.rollups import rebuild_rollups, REBUILD_BATCH_SIZE
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily, weekly and monthly health metric rollups from the raw tracker entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the rollups of this username.')
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE, help='Rollup rows inserted per query.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']!r} does not exist")
+
+        written = rebuild_rollups(user=user, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} rollup rows.'))
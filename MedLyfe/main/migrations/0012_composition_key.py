@@ -0,0 +1,152 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:03
+
+import hashlib
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+# Frozen copy of main/composition.py as of this migration, so later changes to
+# the live parser do not change what the backfill writes on a fresh database.
+# `load_medicine_substitutes --reindex-compositions` recomputes the keys with
+# the current parser.
+
+# Mass units are converted to milligrams so "0.5g" and "500mg" compare equal.
+MASS_UNITS_TO_MG = {
+    'g': Decimal('1000'),
+    'mg': Decimal('1'),
+    'mcg': Decimal('0.001'),
+    'ug': Decimal('0.001'),
+    'µg': Decimal('0.001'),
+}
+OTHER_UNITS = {'iu', 'units', 'units/ml', 'ml', '%'}
+
+# Dosage-form and release modifiers change what a medicine is equivalent to,
+# so they are kept in the key (separately from the molecules).
+FORM_WORDS = {
+    'er', 'xl', 'sr', 'cr', 'xr', 'mr', 'la', 'od', 'dr', 'ec',
+    'inhaler', 'turbuhaler', 'rotacap', 'respules', 'injection', 'syrup',
+    'suspension', 'drops', 'cream', 'gel', 'ointment', 'spray',
+}
+# Words that carry no information for equivalence.
+FILLER_WORDS = {'tablet', 'tablets', 'tab', 'tabs', 'capsule', 'capsules', 'cap', 'caps', 'and'}
+
+STRENGTH_RE = re.compile(
+    r'(\d+(?:\.\d+)?)\s*(units/ml|units|iu|mcg|µg|ug|mg|ml|g|%)(?![a-z])',
+    re.IGNORECASE,
+)
+SEPARATOR_RE = re.compile(r'\s*(?:\+|/|,|\band\b)\s*', re.IGNORECASE)
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+MAX_KEY_LENGTH = 255
+
+
+def _normalize_strength(value, unit):
+    unit = unit.lower()
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        return None, unit
+    if unit in MASS_UNITS_TO_MG:
+        amount *= MASS_UNITS_TO_MG[unit]
+        unit = 'mg'
+    elif unit == 'units':
+        unit = 'iu'
+    # normalize() turns 50.00 into 5E+1, so format as a plain decimal.
+    text = format(amount.normalize(), 'f')
+    return text, unit
+
+
+def parse_composition(composition):
+    """
+    Parses a composition string into sorted (molecule, strength, unit) tuples
+    plus a sorted tuple of dosage-form words.
+
+    "Sitagliptin 50mg/Metformin 500mg" -> ((('metformin', '500', 'mg'),
+    ('sitagliptin', '50', 'mg')), ()). Components without a strength get
+    ('', '') as strength and unit.
+    """
+    text = (composition or '').lower()
+    # Protect "units/ml" from being treated as a component separator.
+    text = text.replace('units/ml', 'units_per_ml')
+    text = re.sub(r'[()\[\]]', ' ', text)
+
+    components = []
+    form = set()
+    for part in SEPARATOR_RE.split(text):
+        part = part.replace('units_per_ml', 'units/ml').strip()
+        if not part:
+            continue
+        strength, unit = '', ''
+        match = STRENGTH_RE.search(part)
+        if match:
+            strength, unit = _normalize_strength(match.group(1), match.group(2))
+            if strength is None:
+                strength = ''
+            part = part[:match.start()] + ' ' + part[match.end():]
+
+        molecule_words = []
+        for word in WORD_RE.findall(part):
+            if word in FORM_WORDS:
+                form.add(word)
+            elif word not in FILLER_WORDS:
+                molecule_words.append(word)
+        if molecule_words:
+            components.append((' '.join(molecule_words), strength, unit))
+        elif components and strength and not components[-1][1]:
+            # A bare strength following a molecule, e.g. "Paracetamol / 500mg".
+            components[-1] = (components[-1][0], strength, unit)
+
+    return tuple(sorted(components)), tuple(sorted(form))
+
+
+def composition_key(composition):
+    """
+    Canonical string used to group equivalent medicines, e.g.
+    "metformin 500mg+sitagliptin 50mg". Returns '' when nothing could be parsed.
+    """
+    components, form = parse_composition(composition)
+    if not components:
+        return ''
+    key = '+'.join(f'{molecule} {strength}{unit}'.strip() for molecule, strength, unit in components)
+    if form:
+        key += '#' + ' '.join(form)
+    if len(key) > MAX_KEY_LENGTH:
+        key = 'sha1:' + hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return key
+
+
+
+def backfill_composition_keys(apps, schema_editor):
+    for model_name in ('Medicine', 'Substitute'):
+        model = apps.get_model('main', model_name)
+        batch = []
+        for row in model.objects.only('id', 'composition').iterator(chunk_size=2000):
+            row.composition_key = composition_key(row.composition)
+            batch.append(row)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ['composition_key'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['composition_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_room_last_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='composition_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='substitute',
+            name='composition_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(backfill_composition_keys, migrations.RunPython.noop),
+    ]
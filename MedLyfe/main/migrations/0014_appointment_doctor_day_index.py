@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_metricrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'date', 'start_time', 'end_time'], name='main_appt_doctor_day_idx'),
+        ),
+    ]
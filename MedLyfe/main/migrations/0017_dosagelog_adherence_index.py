@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_appointment_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dosagelog',
+            index=models.Index(fields=['prescribed_medicine', 'taken', 'date'], name='main_dose_adherence_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_dosagelog_adherence_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrescriptionTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('advice', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prescription_templates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('doctor', 'name')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PrescriptionTemplateMedicine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('dosage', models.CharField(max_length=255)),
+                ('duration_weeks', models.PositiveIntegerField(default=1)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='medicines', to='main.prescriptiontemplate')),
+            ],
+        ),
+    ]
@@ -1,10 +1,16 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 import uuid
 
+from .composition import composition_key
+
 class Room(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255, null=True, blank=True)
+    # Bumped whenever the room is opened or a signaling message is posted; the
+    # reaper (main/reaper.py) expires rooms by this timestamp.
+    last_activity = models.DateTimeField(default=timezone.now, db_index=True)
 
 class Message(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='messages')
@@ -12,6 +18,13 @@ class Message(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Signaling drains read and acknowledge id ranges within one room.
+            models.Index(fields=['room', 'id'], name='main_message_room_cursor_idx'),
+            models.Index(fields=['room', 'created_at'], name='main_message_room_created_idx'),
+        ]
+
 class Medicine(models.Model):
     name = models.CharField(max_length=100)
     manufacturer = models.CharField(max_length=100)
@@ -21,6 +34,18 @@ class Medicine(models.Model):
     # This is for the search. We'll store a simple, lowercase name.
     search_tag = models.CharField(max_length=100, unique=True, help_text="A simple lowercase name for searching, e.g., 'crocin'")
 
+    # Normalized (molecule, strength, unit) key; see main/composition.py.
+    # NULL means the row has not been indexed yet.
+    composition_key = models.CharField(max_length=255, null=True, blank=True, db_index=True, editable=False)
+
+    # Bumped by saves and by the catalog import's upserts; the search index
+    # compares Max(updated_at) to notice edits made in other processes.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.composition_key = composition_key(self.composition)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -34,6 +59,14 @@ class Substitute(models.Model):
     composition = models.CharField(max_length=200)
     price = models.DecimalField(max_digits=6, decimal_places=2)
 
+    composition_key = models.CharField(max_length=255, null=True, blank=True, db_index=True, editable=False)
+
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.composition_key = composition_key(self.composition)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -77,6 +110,29 @@ class PrescribedMedicine(models.Model):
     def __str__(self):
         return f"{self.name} for {self.prescription.patient.username}"
 
+class PrescriptionTemplate(models.Model):
+    # A doctor's reusable regimen, issued to many patients at once by
+    # main/bulk_prescribe.py.
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='prescription_templates')
+    name = models.CharField(max_length=255)
+    advice = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('doctor', 'name')
+
+    def __str__(self):
+        return f"{self.name} (Dr. {self.doctor.username})"
+
+class PrescriptionTemplateMedicine(models.Model):
+    template = models.ForeignKey(PrescriptionTemplate, on_delete=models.CASCADE, related_name='medicines')
+    name = models.CharField(max_length=255)
+    dosage = models.CharField(max_length=255)
+    duration_weeks = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} in {self.template.name}"
+
 class DosageLog(models.Model):
     prescribed_medicine = models.ForeignKey(PrescribedMedicine, on_delete=models.CASCADE, related_name='logs')
     patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='dosage_logs')
@@ -85,6 +141,10 @@ class DosageLog(models.Model):
 
     class Meta:
         unique_together = ('prescribed_medicine', 'patient', 'date')
+        indexes = [
+            # Adherence report: taken days of a medicine over a date range.
+            models.Index(fields=['prescribed_medicine', 'taken', 'date'], name='main_dose_adherence_idx'),
+        ]
 
     def __str__(self):
         return f"Log for {self.prescribed_medicine.name} on {self.date} - Taken: {self.taken}"
@@ -239,7 +299,73 @@ class Appointment(models.Model):
 
     class Meta:
         ordering = ['date', 'start_time']
-        unique_together = ('doctor', 'date', 'start_time') # Ensure a doctor can't have overlapping appointments
+        constraints = [
+            # A doctor can't have two live appointments starting together; a
+            # cancelled slot may be booked again. Full overlap checks are done
+            # under the booking lock in main/booking.py.
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'start_time'],
+                condition=~models.Q(status='Cancelled'),
+                name='main_appt_unique_live_start',
+            ),
+        ]
+        indexes = [
+            # Overlap checks and free-slot lookups read one doctor's day(s).
+            models.Index(fields=['doctor', 'date', 'start_time', 'end_time'], name='main_appt_doctor_day_idx'),
+            # Appointment lists page newest first on (date, start_time, id),
+            # optionally filtered by status (see main/keyset.py).
+            models.Index(fields=['patient', 'date', 'start_time', 'id'], name='main_appt_patient_keyset_idx'),
+            models.Index(fields=['doctor', 'status', 'date', 'start_time', 'id'], name='main_appt_doctor_status_idx'),
+            models.Index(fields=['patient', 'status', 'date', 'start_time', 'id'], name='main_appt_patient_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Appointment with Dr. {self.doctor.username} for {self.patient.username} on {self.date} at {self.start_time}"
+
+class AppointmentDayLock(models.Model):
+    """
+    One row per doctor and day that has been booked. Bookings update this row
+    first inside their transaction, which serializes concurrent bookings for
+    the same doctor and day across processes (see main/booking.py).
+    """
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='appointment_day_locks')
+    date = models.DateField()
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('doctor', 'date')
+
+    def __str__(self):
+        return f"Booking lock for Dr. {self.doctor.username} on {self.date}"
+
+class MetricRollup(models.Model):
+    """
+    Per-user daily/weekly/monthly aggregate of one health metric, kept up to
+    date by the tracker views (see main/rollups.py) so trend views read one row
+    per period instead of every entry.
+    """
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='metric_rollups')
+    metric = models.CharField(max_length=50)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(default=0)
+    minimum = models.FloatField()
+    maximum = models.FloatField()
+
+    class Meta:
+        ordering = ['period_start']
+        unique_together = ('user', 'metric', 'period', 'period_start')
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
 
     def __str__(self):
-        return f"Appointment with Dr. {self.doctor.username} for {self.patient.username} on {self.date} at {self.start_time}"
\ No newline at end of file
+        return f"{self.user.username} - {self.metric} ({self.period} of {self.period_start})"
@@ -0,0 +1,143 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Room, Message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOM_MAX_IDLE_HOURS = 24
+DEFAULT_MESSAGE_MAX_AGE_MINUTES = 60
+DEFAULT_BATCH_SIZE = 500
+
+
+def _delete_messages_in_batches(queryset, batch_size):
+    """Deletes a Message queryset a batch of ids at a time, one short transaction per batch."""
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            count, _ = Message.objects.filter(id__in=ids).delete()
+        deleted += count
+
+
+def _delete_idle_rooms(room_ids, room_cutoff, batch_size):
+    """
+    Deletes the rooms in room_ids that are still idle, with their messages.
+
+    Every transaction re-checks the cutoff with the rooms locked before it
+    deletes anything, and only touches the rooms that are still idle. A room
+    that becomes active part way through keeps the messages posted since:
+    post_message bumps last_activity under the same row lock before it
+    inserts. Messages go batch_size at a time and the rooms last, so no
+    transaction cascades over a whole backlog. Returns (rooms, messages).
+    """
+    messages_deleted = 0
+    while True:
+        with transaction.atomic():
+            idle_ids = list(
+                Room.objects.select_for_update()
+                .filter(id__in=room_ids, last_activity__lt=room_cutoff)
+                .values_list('id', flat=True)
+            )
+            if not idle_ids:
+                return 0, messages_deleted
+            ids = list(
+                Message.objects.filter(room_id__in=idle_ids)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if ids:
+                count, _ = Message.objects.filter(id__in=ids).delete()
+                messages_deleted += count
+                continue
+            rooms_deleted, _ = Room.objects.filter(id__in=idle_ids).delete()
+            return rooms_deleted, messages_deleted
+
+
+def reap_call_rooms(max_idle=None, message_max_age=None, batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Expires call rooms that have been idle for longer than max_idle and deletes
+    undelivered signaling messages older than message_max_age.
+
+    Work is done in chunks of batch_size rows, each in its own transaction, so
+    SQLite never holds the write lock for long. Returns a dict with the number
+    of rooms and messages reclaimed and the elapsed time in seconds.
+    """
+    if max_idle is None:
+        max_idle = timedelta(hours=getattr(settings, 'CALL_ROOM_MAX_IDLE_HOURS', DEFAULT_ROOM_MAX_IDLE_HOURS))
+    if message_max_age is None:
+        message_max_age = timedelta(minutes=getattr(settings, 'CALL_MESSAGE_MAX_AGE_MINUTES', DEFAULT_MESSAGE_MAX_AGE_MINUTES))
+    now = now or timezone.now()
+    started = time.monotonic()
+
+    room_cutoff = now - max_idle
+    rooms_deleted = 0
+    messages_deleted = 0
+    while True:
+        room_ids = list(
+            Room.objects.filter(last_activity__lt=room_cutoff)
+            .order_by('last_activity')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not room_ids:
+            break
+        rooms, messages = _delete_idle_rooms(room_ids, room_cutoff, batch_size)
+        rooms_deleted += rooms
+        messages_deleted += messages
+        if len(room_ids) < batch_size:
+            break
+
+    messages_deleted += _delete_messages_in_batches(
+        Message.objects.filter(created_at__lt=now - message_max_age), batch_size
+    )
+
+    return {
+        'rooms': rooms_deleted,
+        'messages': messages_deleted,
+        'seconds': time.monotonic() - started,
+    }
+
+
+_reaper_thread = None
+
+
+def start_reaper_from_settings():
+    """
+    Starts the periodic reaper if CALL_ROOM_REAPER_INTERVAL_SECONDS is set.
+    Called from the ASGI and WSGI entrypoints, so only serving processes run
+    it, not management commands or the test runner.
+    """
+    interval = getattr(settings, 'CALL_ROOM_REAPER_INTERVAL_SECONDS', None)
+    if interval:
+        return start_periodic_reaper(interval)
+    return None
+
+
+def start_periodic_reaper(interval_seconds):
+    """Runs reap_call_rooms every interval_seconds in a daemon thread (once per process)."""
+    global _reaper_thread
+    if _reaper_thread is not None:
+        return _reaper_thread
+
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                result = reap_call_rooms()
+                logger.info(
+                    'Reaped %d call rooms and %d signaling messages in %.3fs',
+                    result['rooms'], result['messages'], result['seconds'],
+                )
+            except Exception:
+                logger.exception('Call room reaper failed')
+
+    _reaper_thread = threading.Thread(target=run, name='call-room-reaper', daemon=True)
+    _reaper_thread.start()
+    return _reaper_thread
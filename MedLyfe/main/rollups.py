@@ -0,0 +1,186 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum, Min, Max, F
+from django.db.models.functions import Greatest, Least, TruncDay, TruncWeek, TruncMonth
+
+from .models import WeightEntry, BloodPressureEntry, GlucoseEntry, Activity, MealEntry, MetricRollup
+
+# metric name -> (entry model, value field)
+ROLLUP_METRICS = {
+    'weight': (WeightEntry, 'weight'),
+    'systolic': (BloodPressureEntry, 'systolic'),
+    'diastolic': (BloodPressureEntry, 'diastolic'),
+    'glucose': (GlucoseEntry, 'glucose_level'),
+    'activity_calories': (Activity, 'calories_burned'),
+    'meal_calories': (MealEntry, 'calories'),
+}
+
+ROLLUP_PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def period_bounds(period, day):
+    """First and last day of the day/week (Monday-based)/month containing day."""
+    if period == 'day':
+        return day, day
+    if period == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    start = day.replace(day=1)
+    next_month = (start + timedelta(days=32)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def _metrics_for(model):
+    return [(metric, field) for metric, (metric_model, field) in ROLLUP_METRICS.items() if metric_model is model]
+
+
+def record_entry(entry):
+    """
+    Folds a newly created entry into its day, week and month rollups with an
+    in-place UPDATE (count + 1, total + value, least/greatest), creating the
+    rollup row when it is the first entry of the period.
+    """
+    for metric, field in _metrics_for(type(entry)):
+        value = getattr(entry, field)
+        if value is None:
+            continue
+        value = float(value)
+        for period in ROLLUP_PERIODS:
+            period_start = period_bounds(period, entry.date)[0]
+            rollups = MetricRollup.objects.filter(user_id=entry.user_id, metric=metric, period=period, period_start=period_start)
+            changes = {
+                'count': F('count') + 1,
+                'total': F('total') + value,
+                'minimum': Least('minimum', value),
+                'maximum': Greatest('maximum', value),
+            }
+            if rollups.update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    MetricRollup.objects.create(
+                        user_id=entry.user_id, metric=metric, period=period, period_start=period_start,
+                        count=1, total=value, minimum=value, maximum=value,
+                    )
+            except IntegrityError:
+                # Another request created the row first; fold into it.
+                rollups.update(**changes)
+
+
+def refresh_rollups(user, model, day):
+    """
+    Recomputes the day, week and month rollups of every metric of model that
+    contain day from the raw entries. Used after deletes and edits, where
+    minimum/maximum cannot be maintained incrementally.
+    """
+    for metric, field in _metrics_for(model):
+        for period in ROLLUP_PERIODS:
+            start, end = period_bounds(period, day)
+            stats = model.objects.filter(
+                user=user, date__gte=start, date__lte=end, **{f'{field}__isnull': False}
+            ).aggregate(count=Count(field), total=Sum(field), minimum=Min(field), maximum=Max(field))
+            lookup = {'user': user, 'metric': metric, 'period': period, 'period_start': start}
+            if not stats['count']:
+                MetricRollup.objects.filter(**lookup).delete()
+                continue
+            MetricRollup.objects.update_or_create(**lookup, defaults={
+                'count': stats['count'],
+                'total': float(stats['total']),
+                'minimum': float(stats['minimum']),
+                'maximum': float(stats['maximum']),
+            })
+
+
+def _insert_grouped(entries, metric, field, period, batch_size):
+    # One GROUP BY over the entries, written back with batched bulk inserts.
+    rows = (
+        entries.filter(**{f'{field}__isnull': False})
+        .annotate(period_start=ROLLUP_PERIODS[period]('date'))
+        .values('user_id', 'period_start')
+        .annotate(count=Count(field), total=Sum(field), minimum=Min(field), maximum=Max(field))
+        .order_by()
+    )
+    written = 0
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(MetricRollup(
+            user_id=row['user_id'], metric=metric, period=period, period_start=row['period_start'],
+            count=row['count'], total=float(row['total']),
+            minimum=float(row['minimum']), maximum=float(row['maximum']),
+        ))
+        if len(batch) >= batch_size:
+            MetricRollup.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        MetricRollup.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def rebuild_rollups(user=None, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Drops and recomputes all rollups (or one user's) with one GROUP BY query per
+    metric and period. Returns the number of rollup rows written.
+    """
+    written = 0
+    with transaction.atomic():
+        existing = MetricRollup.objects.all()
+        if user is not None:
+            existing = existing.filter(user=user)
+        existing.delete()
+
+        for metric, (model, field) in ROLLUP_METRICS.items():
+            entries = model.objects.all()
+            if user is not None:
+                entries = entries.filter(user=user)
+            for period in ROLLUP_PERIODS:
+                written += _insert_grouped(entries, metric, field, period, batch_size)
+    return written
+
+
+def rebuild_rollups_between(user, model, start, end, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recomputes the rollups of model's metrics for every period overlapping
+    [start, end]. Used after bulk writes, where folding rows in one at a time
+    would cost a query per entry.
+    """
+    with transaction.atomic():
+        for metric, field in _metrics_for(model):
+            for period in ROLLUP_PERIODS:
+                first = period_bounds(period, start)[0]
+                last = period_bounds(period, end)[1]
+                MetricRollup.objects.filter(
+                    user=user, metric=metric, period=period, period_start__gte=first, period_start__lte=last
+                ).delete()
+                entries = model.objects.filter(user=user, date__gte=first, date__lte=last)
+                _insert_grouped(entries, metric, field, period, batch_size)
+
+
+def rollup_series(user, metric, period, start=None, end=None):
+    """Rollup rows for one metric as JSON-ready dicts, oldest first."""
+    rollups = MetricRollup.objects.filter(user=user, metric=metric, period=period)
+    if start:
+        rollups = rollups.filter(period_start__gte=period_bounds(period, start)[0])
+    if end:
+        rollups = rollups.filter(period_start__lte=end)
+    return [
+        {
+            'period_start': period_start.isoformat(),
+            'count': count,
+            'sum': round(total, 2),
+            'mean': round(total / count, 2),
+            'min': minimum,
+            'max': maximum,
+        }
+        for period_start, count, total, minimum, maximum in rollups.order_by('period_start').values_list(
+            'period_start', 'count', 'total', 'minimum', 'maximum'
+        )
+    ]
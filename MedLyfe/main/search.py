@@ -0,0 +1,249 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db.models import Count, Max
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .indexing import RefreshingIndex
+from .models import Medicine, Substitute
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# How many distinct terms a single prefix token may expand to.
+MAX_PREFIX_TERMS = 64
+
+# Terms shorter than this are never matched with a typo.
+MIN_FUZZY_LENGTH = 4
+
+# Match weights: hits on the name count more than hits on the composition.
+NAME_WEIGHT = 2.0
+COMPOSITION_WEIGHT = 1.0
+FUZZY_PENALTY = 0.5
+
+
+def normalize(text):
+    return ' '.join(TOKEN_RE.findall((text or '').lower()))
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def _deletes(term):
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a, b):
+    """True if a and b differ by at most one insertion, deletion, substitution or transposition."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    # b is one character longer than a
+    for i in range(len(a)):
+        if a[i] != b[i]:
+            return a[i:] == b[i + 1:]
+    return True
+
+
+class MedicineSearchIndex:
+    """
+    In-memory search index over Medicine and Substitute names and compositions.
+
+    Supports three kinds of lookups, cheapest first:
+      * prefix of the full name (bisect over the sorted names),
+      * per-token prefix matches on name and composition terms,
+      * single-typo matches using a deletion dictionary (SymSpell style).
+    Every query touches only the postings of the matched terms, so lookups
+    stay well under a millisecond for catalogs of 100k+ medicines.
+    """
+
+    def __init__(self, medicines, substitutes):
+        # medicines: (id, name, search_tag, composition, price)
+        # substitutes: (id, name, composition, price, original_medicine_id)
+        self.docs = []
+        self.by_search_tag = {}
+        self._names = []
+        self._name_postings = defaultdict(set)
+        self._composition_postings = defaultdict(set)
+
+        for medicine_id, name, search_tag, composition, price in medicines:
+            doc_id = len(self.docs)
+            self.docs.append({
+                'type': 'medicine',
+                'id': medicine_id,
+                'medicine_id': medicine_id,
+                'name': name,
+                'search_tag': search_tag,
+                'composition': composition,
+                'price': str(price),
+            })
+            self.by_search_tag[search_tag] = doc_id
+            self._add(doc_id, name, composition, extra_name=search_tag)
+
+        tags_by_medicine = {doc['id']: doc['search_tag'] for doc in self.docs}
+        for substitute_id, name, composition, price, medicine_id in substitutes:
+            doc_id = len(self.docs)
+            self.docs.append({
+                'type': 'substitute',
+                'id': substitute_id,
+                'medicine_id': medicine_id,
+                'name': name,
+                'search_tag': tags_by_medicine.get(medicine_id),
+                'composition': composition,
+                'price': str(price),
+            })
+            self._add(doc_id, name, composition)
+
+        self._names.sort()
+        self._terms = sorted(set(self._name_postings) | set(self._composition_postings))
+        self._deletes = defaultdict(set)
+        for term in self._terms:
+            if len(term) >= MIN_FUZZY_LENGTH:
+                for deleted in _deletes(term):
+                    self._deletes[deleted].add(term)
+
+    def _add(self, doc_id, name, composition, extra_name=None):
+        self._names.append((normalize(name), doc_id))
+        for term in tokenize(name) + tokenize(extra_name):
+            self._name_postings[term].add(doc_id)
+        for term in tokenize(composition):
+            self._composition_postings[term].add(doc_id)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def get_by_search_tag(self, search_tag):
+        doc_id = self.by_search_tag.get(search_tag)
+        return self.docs[doc_id] if doc_id is not None else None
+
+    def medicines(self, limit=None):
+        """Medicine (not substitute) documents in name order."""
+        results = []
+        for _, doc_id in self._names:
+            doc = self.docs[doc_id]
+            if doc['type'] == 'medicine':
+                results.append(doc)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    def _prefix_terms(self, token):
+        start = bisect_left(self._terms, token)
+        terms = []
+        for term in self._terms[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(token):
+                break
+            terms.append(term)
+        return terms
+
+    def _fuzzy_terms(self, token):
+        if len(token) < MIN_FUZZY_LENGTH:
+            return []
+        candidates = set(self._deletes.get(token, ()))
+        for deleted in _deletes(token):
+            candidates.update(self._deletes.get(deleted, ()))
+            if deleted in self._name_postings or deleted in self._composition_postings:
+                candidates.add(deleted)
+        return [term for term in candidates if _within_one_edit(token, term)]
+
+    def _score_token(self, token):
+        """Returns {doc_id: score} for one query token."""
+        terms = self._prefix_terms(token)
+        weight = 1.0
+        if not terms:
+            terms = self._fuzzy_terms(token)
+            weight = FUZZY_PENALTY
+        scores = {}
+        for term in terms:
+            # Exact term hits beat prefix hits.
+            term_weight = weight * (1.0 if term == token else 0.75)
+            for doc_id in self._name_postings.get(term, ()):
+                scores[doc_id] = max(scores.get(doc_id, 0), NAME_WEIGHT * term_weight)
+            for doc_id in self._composition_postings.get(term, ()):
+                scores[doc_id] = max(scores.get(doc_id, 0), COMPOSITION_WEIGHT * term_weight)
+        return scores
+
+    def search(self, query, limit=10):
+        normalized = normalize(query)
+        if not normalized or limit <= 0:
+            return []
+
+        ranked = []
+        seen = set()
+
+        # 1. Full-name prefix matches, alphabetically.
+        position = bisect_left(self._names, (normalized,))
+        while position < len(self._names) and len(ranked) < limit:
+            name, doc_id = self._names[position]
+            if not name.startswith(normalized):
+                break
+            ranked.append(doc_id)
+            seen.add(doc_id)
+            position += 1
+
+        # 2. Token matches (prefix, then typo-tolerant) across name and composition.
+        if len(ranked) < limit:
+            combined = None
+            for token in normalized.split():
+                token_scores = self._score_token(token)
+                if combined is None:
+                    combined = token_scores
+                else:
+                    combined = {
+                        doc_id: score + token_scores[doc_id]
+                        for doc_id, score in combined.items() if doc_id in token_scores
+                    }
+                if not combined:
+                    break
+            extra = sorted(
+                (doc_id for doc_id in (combined or ()) if doc_id not in seen),
+                key=lambda doc_id: (-combined[doc_id], self.docs[doc_id]['name'].lower()),
+            )
+            ranked.extend(extra[:limit - len(ranked)])
+
+        return [self.docs[doc_id] for doc_id in ranked]
+
+
+def _catalog_version():
+    # Cheap fingerprint so bulk loads done by other processes (which fire no
+    # signals here) are still picked up. The count catches deletes and the
+    # latest updated_at catches inserts and in-place edits, including the
+    # catalog import's upserts.
+    medicines = Medicine.objects.aggregate(count=Count('id'), last=Max('updated_at'))
+    substitutes = Substitute.objects.aggregate(count=Count('id'), last=Max('updated_at'))
+    return (medicines['count'], medicines['last'], substitutes['count'], substitutes['last'])
+
+
+def build_search_index():
+    medicines = Medicine.objects.values_list('id', 'name', 'search_tag', 'composition', 'price').iterator(chunk_size=5000)
+    substitutes = Substitute.objects.values_list('id', 'name', 'composition', 'price', 'original_medicine_id').iterator(chunk_size=5000)
+    return MedicineSearchIndex(medicines, substitutes)
+
+
+_search_index = RefreshingIndex(build_search_index, _catalog_version, 'MEDICINE_SEARCH_INDEX_CHECK_SECONDS')
+
+
+def get_search_index():
+    """Returns the process-wide index, building or refreshing it if needed."""
+    return _search_index.get()
+
+
+def invalidate_search_index():
+    _search_index.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Medicine)
+@receiver([post_save, post_delete], sender=Substitute)
+def _invalidate_on_change(sender, **kwargs):
+    invalidate_search_index()
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Message, Room
+
+# Maximum number of messages returned by one drain.
+DRAIN_BATCH_SIZE = 100
+
+
+class SignalingBroker:
+    """
+    A local, in-process pub/sub broker for WebRTC signaling messages.
+
+    Each open signaling stream subscribes an asyncio.Queue for its room. Sync
+    views (the POST branch of signaling_view) may publish from a worker thread,
+    so events are handed to the subscriber's event loop with
+    call_soon_threadsafe. Subscribers only exist in the process that serves the
+    stream, so this assumes both peers of a room are served by one ASGI worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)  # room_id -> {(loop, queue)}
+
+    def subscribe(self, room_id):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers[str(room_id)].add((loop, queue))
+        return queue
+
+    def unsubscribe(self, room_id, queue):
+        room_key = str(room_id)
+        with self._lock:
+            subscribers = self._subscribers.get(room_key)
+            if not subscribers:
+                return
+            subscribers.difference_update({sub for sub in subscribers if sub[1] is queue})
+            if not subscribers:
+                del self._subscribers[room_key]
+
+    def subscriber_count(self, room_id):
+        with self._lock:
+            return len(self._subscribers.get(str(room_id), ()))
+
+    def publish(self, room_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(room_id), ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's loop has already been closed.
+                self.unsubscribe(room_id, queue)
+
+
+broker = SignalingBroker()
+
+
+def parse_cursor(value):
+    """Cursors are message ids; anything missing or malformed starts from 0."""
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def post_message(room_id, session_id, payload):
+    """
+    Stores a signaling message and bumps the room's last activity. Raises
+    Room.DoesNotExist for an unknown room.
+
+    The room row is updated before the insert in the same transaction, so its
+    row lock serializes posts to one room: a later post cannot take an id
+    until the earlier one has committed. Ids within a room therefore become
+    visible in id order, which the cursor in drain_messages relies on. SQLite
+    has a single writer anyway; this matters on PostgreSQL, where ids are
+    handed out by a sequence before commit.
+    """
+    with transaction.atomic():
+        if not Room.objects.filter(id=room_id).update(last_activity=timezone.now()):
+            raise Room.DoesNotExist
+        return Message.objects.create(room_id=room_id, sender_session_id=session_id, message=json.dumps(payload))
+
+
+def acknowledge_messages(room_id, session_id, cursor):
+    """Deletes every message for this peer up to and including the cursor."""
+    if cursor <= 0:
+        return 0
+    deleted, _ = (
+        Message.objects.filter(room_id=room_id, id__lte=cursor)
+        .exclude(sender_session_id=session_id)
+        .delete()
+    )
+    return deleted
+
+
+def drain_messages(room_id, session_id, cursor, limit=DRAIN_BATCH_SIZE):
+    """
+    Acknowledges everything the peer has already received (ids <= cursor) and
+    returns the next batch of (id, payload) pairs after the cursor.
+
+    Both statements are range reads on the (room, id) index, so the cost is
+    proportional to the number of new messages rather than the room backlog.
+    Messages are only deleted once the peer has advanced its cursor past
+    them, so nothing inserted between the read and the delete is lost. This
+    assumes no message with a lower id can commit after a higher one has been
+    read, which post_message guarantees per room.
+    """
+    with transaction.atomic():
+        acknowledge_messages(room_id, session_id, cursor)
+        rows = (
+            Message.objects.filter(room_id=room_id, id__gt=cursor)
+            .exclude(sender_session_id=session_id)
+            .order_by('id')
+            .values_list('id', 'message')[:limit]
+        )
+        return [(message_id, decode_message(message)) for message_id, message in rows]
+
+
+def decode_message(raw_message):
+    """Signaling payloads are stored as JSON text; fall back to the raw string."""
+    try:
+        return json.loads(raw_message)
+    except json.JSONDecodeError:
+        return raw_message
+
+
+def format_sse(data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
@@ -0,0 +1,139 @@
+import math
+
+from django.db.models import Count, Max
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .indexing import RefreshingIndex
+from .models import Symptom, Disease
+
+SCORING_METHODS = ('jaccard', 'tfidf', 'overlap')
+DEFAULT_SCORING_METHOD = 'jaccard'
+
+
+class SymptomScoringEngine:
+    """
+    Holds the Disease.symptoms many-to-many as one bitset (a Python int) per
+    disease, with bit i set when the disease has the i-th symptom.
+
+    Scoring a selection is a single AND + popcount per disease, so all
+    diseases are ranked in memory without a database round trip. Supported
+    scores:
+      * overlap: number of selected symptoms the disease has (the old ranking),
+      * jaccard: |selected & disease| / |selected | disease|, which stops
+        diseases with long symptom lists from winning on raw overlap,
+      * tfidf: cosine similarity with symptoms weighted by log(N / df), so
+        rare, specific symptoms count more than common ones like "Fever".
+    """
+
+    def __init__(self, symptoms, diseases, links):
+        # symptoms: (id, name); diseases: (id, name, description, precautions);
+        # links: (disease_id, symptom_id)
+        self.symptoms = [{'id': symptom_id, 'name': name} for symptom_id, name in symptoms]
+        self._bit = {symptom['id']: bit for bit, symptom in enumerate(self.symptoms)}
+
+        self.diseases = [
+            {'id': disease_id, 'name': name, 'description': description, 'precautions': precautions}
+            for disease_id, name, description, precautions in diseases
+        ]
+        row = {disease['id']: i for i, disease in enumerate(self.diseases)}
+        self._masks = [0] * len(self.diseases)
+        document_frequency = [0] * len(self.symptoms)
+        for disease_id, symptom_id in links:
+            i = row.get(disease_id)
+            bit = self._bit.get(symptom_id)
+            if i is None or bit is None or self._masks[i] >> bit & 1:
+                continue
+            self._masks[i] |= 1 << bit
+            document_frequency[bit] += 1
+
+        disease_count = max(len(self.diseases), 1)
+        self._idf = [math.log(disease_count / df) + 1.0 if df else 0.0 for df in document_frequency]
+        self._sizes = [mask.bit_count() for mask in self._masks]
+        self._norms = [math.sqrt(self._weight_sum(mask, squared=True)) for mask in self._masks]
+
+    def _weight_sum(self, mask, squared=False):
+        total = 0.0
+        while mask:
+            low = mask & -mask
+            weight = self._idf[low.bit_length() - 1]
+            total += weight * weight if squared else weight
+            mask ^= low
+        return total
+
+    def query_mask(self, symptom_ids):
+        mask = 0
+        for symptom_id in symptom_ids:
+            bit = self._bit.get(symptom_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def score(self, symptom_ids, method=DEFAULT_SCORING_METHOD, limit=None):
+        """
+        Returns diseases matching at least one of the symptoms, best first, as
+        dicts with the disease fields plus 'score' and 'symptom_match_count'.
+        """
+        if method not in SCORING_METHODS:
+            raise ValueError(f'Unknown scoring method {method!r}')
+        query = self.query_mask(symptom_ids)
+        if not query:
+            return []
+        query_size = query.bit_count()
+        query_norm = math.sqrt(self._weight_sum(query, squared=True)) if method == 'tfidf' else 0.0
+
+        scored = []
+        for i, mask in enumerate(self._masks):
+            shared = mask & query
+            if not shared:
+                continue
+            overlap = shared.bit_count()
+            if method == 'overlap':
+                score = float(overlap)
+            elif method == 'jaccard':
+                score = overlap / (self._sizes[i] + query_size - overlap)
+            else:
+                denominator = self._norms[i] * query_norm
+                score = self._weight_sum(shared, squared=True) / denominator if denominator else 0.0
+            scored.append((score, overlap, i))
+
+        scored.sort(key=lambda item: (-item[0], -item[1], self.diseases[item[2]]['name']))
+        if limit is not None:
+            scored = scored[:limit]
+        return [
+            dict(self.diseases[i], score=round(score, 4), symptom_match_count=overlap)
+            for score, overlap, i in scored
+        ]
+
+
+def _knowledge_base_version():
+    symptoms = Symptom.objects.aggregate(count=Count('id'), last=Max('id'))
+    diseases = Disease.objects.aggregate(count=Count('id'), last=Max('id'))
+    links = Disease.symptoms.through.objects.aggregate(count=Count('id'), last=Max('id'))
+    return (symptoms['count'], symptoms['last'], diseases['count'], diseases['last'], links['count'], links['last'])
+
+
+def build_scoring_engine():
+    return SymptomScoringEngine(
+        Symptom.objects.order_by('id').values_list('id', 'name'),
+        Disease.objects.order_by('id').values_list('id', 'name', 'description', 'precautions'),
+        Disease.symptoms.through.objects.values_list('disease_id', 'symptom_id'),
+    )
+
+
+_scoring_engine = RefreshingIndex(build_scoring_engine, _knowledge_base_version, 'SYMPTOM_ENGINE_CHECK_SECONDS')
+
+
+def get_scoring_engine():
+    return _scoring_engine.get()
+
+
+def invalidate_scoring_engine():
+    _scoring_engine.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Symptom)
+@receiver([post_save, post_delete], sender=Disease)
+@receiver(m2m_changed, sender=Disease.symptoms.through)
+def _invalidate_on_change(sender, **kwargs):
+    invalidate_scoring_engine()
@@ -1,9 +1,52 @@
-from django.test import TestCase, Client
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import threading
+import unittest
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO, BytesIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from datetime import date
-from .models import WeightEntry, WeightGoal, BloodPressureEntry, GlucoseEntry, BloodPressureGoal, GlucoseGoal, Activity, MealEntry
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, Client, AsyncClient, override_settings
+from django.utils import timezone
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # Optional: only the Parquet/Arrow exports need it.
+    pyarrow = None
+
 from users.models import Profile
 
+from .models import (
+    WeightEntry, WeightGoal, BloodPressureEntry, GlucoseEntry, BloodPressureGoal, GlucoseGoal, Activity, MealEntry,
+    Prescription, PrescribedMedicine, DosageLog, PrescriptionTemplate, Room, Message, Medicine, Substitute,
+    Symptom, Disease, MetricRollup, Appointment,
+)
+from .adherence import build_adherence_calendar, adherence_report
+from .availability import AvailabilityIndex, DaySchedule
+from .booking import book_appointment, SlotUnavailable
+from .catalog_import import import_catalog, iter_json_array, iter_medicine_entries
+from .columnar_export import iter_batches
+from .composition import composition_key, parse_composition
+from .downsampling import lttb, min_max_buckets
+from .equivalents import find_equivalents, index_compositions
+from .forms import AppointmentForm
+from .knowledge_import import import_medical_data
+from .reaper import _delete_idle_rooms, reap_call_rooms, start_reaper_from_settings
+from .search import MedicineSearchIndex, get_search_index
+from .signaling import broker, post_message
+from .symptom_scoring import SymptomScoringEngine
+
 User = get_user_model()
 
 class HealthTrackerModelsTest(TestCase):
@@ -78,10 +121,39 @@ class HealthTrackerViewsTest(TestCase):
         WeightEntry.objects.create(user=self.user, weight=70.0, date=date(2023, 1, 1))
         response = self.client.get('/tracker/')
         self.assertEqual(response.status_code, 200)
-        self.assertIn('weight_data', response.context)
+        self.assertIn('tracker_panels', response.context)
         self.assertIn('bmi', response.context)
         self.assertAlmostEqual(response.context['bmi'], 70.0 / ((170/100)**2), places=2)
 
+    def test_health_tracker_shell_query_count_is_fixed(self):
+        for day in range(1, 29):
+            WeightEntry.objects.create(user=self.user, weight=70.0, date=date(2023, 1, day))
+            Activity.objects.create(user=self.user, activity_type='Walk', duration_minutes=30, date=date(2023, 1, day))
+        self.client.get('/tracker/')  # warm up session/auth caches
+        # session, user + profile, dosage logs, prescriptions, latest weight;
+        # independent of how many entries each panel holds.
+        with self.assertNumQueries(5):
+            response = self.client.get('/tracker/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_tracker_panel_api(self):
+        WeightEntry.objects.create(user=self.user, weight=72.5, date=date(2023, 1, 2))
+        WeightEntry.objects.create(user=self.user, weight=70.0, date=date(2023, 1, 1))
+        WeightGoal.objects.create(user=self.user, target_weight=68.0)
+        data = self.client.get('/tracker/api/weight/').json()
+        self.assertEqual([e['date'] for e in data['entries']], ['2023-01-01', '2023-01-02'])
+        self.assertEqual(data['entries'][-1]['weight'], 72.5)
+        self.assertEqual(data['goal']['target_weight'], 68.0)
+
+        BloodPressureEntry.objects.create(user=self.user, systolic=120, diastolic=80, date=date(2023, 1, 1))
+        data = self.client.get('/tracker/api/blood_pressure/').json()
+        self.assertEqual(data['entries'][0]['systolic'], 120)
+        self.assertIsNone(data['goal'])
+
+    def test_tracker_panel_api_unknown_panel(self):
+        response = self.client.get('/tracker/api/nope/')
+        self.assertEqual(response.status_code, 404)
+
     def test_add_weight_view(self):
         response = self.client.post('/health_tracker/add_weight/', {'weight': 71.0, 'date': '2023-01-02'})
         self.assertEqual(response.status_code, 302) # Redirect
@@ -107,6 +179,1285 @@ class HealthTrackerViewsTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'text/csv')
         self.assertIn('attachment; filename="health_data.csv"', response['Content-Disposition'])
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('Weight,2023-01-01,70.00,,,\r\n', content)
+        self.assertIn('Blood Pressure,2023-01-01,120,80,,\r\n', content)
+
+    def test_export_health_data_csv_merges_tables_by_date(self):
+        MealEntry.objects.create(user=self.user, meal_type='Lunch', food_items='Rice, dal', calories=None, date=date(2023, 1, 3))
+        WeightEntry.objects.create(user=self.user, weight=70.0, date=date(2023, 1, 5))
+        Activity.objects.create(user=self.user, activity_type='Run', duration_minutes=20, calories_burned=200, date=date(2023, 1, 1))
+        GlucoseEntry.objects.create(user=self.user, glucose_level=95, date=date(2023, 1, 3))
+        response = self.client.get('/health_tracker/export_csv/')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines, [
+            'Data Type,Date,Value1,Value2,Value3,Description',
+            'Activity,2023-01-01,20,200,Run,',
+            'Glucose,2023-01-03,95.00,,,',
+            'Meal,2023-01-03,,Lunch,"Rice, dal",',
+            'Weight,2023-01-05,70.00,,,',
+        ])
+
+        response = self.client.get('/health_tracker/export_csv/?start=2023-01-02&end=2023-01-04')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['Glucose', 'Meal'])
+
+    def test_export_health_data_csv_gzip(self):
+        WeightEntry.objects.create(user=self.user, weight=70.0, date=date(2023, 1, 1))
+        response = self.client.get('/health_tracker/export_csv/?gzip=1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('health_data.csv.gz', response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        self.assertIn('Weight,2023-01-01,70.00,,,\r\n', content)
+        self.assertEqual(self.client.get('/health_tracker/export_csv/?start=soon').status_code, 400)
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        await WeightEntry.objects.acreate(user=self.user, weight=70.0, date=date(2023, 1, 1))
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+
+        response = await client.get('/health_tracker/export_csv/?gzip=1')
+        # An async iterator is streamed as produced instead of being collected first.
+        self.assertTrue(response.is_async)
+        content = gzip.decompress(b''.join([chunk async for chunk in response.streaming_content])).decode('utf-8')
         self.assertIn('Weight,2023-01-01,70.00,,,\r\n', content)
-        self.assertIn('Blood Pressure,2023-01-01,120,80,,\r\n', content)
\ No newline at end of file
+
+        response = await client.get('/health_tracker/export/weight/')
+        self.assertTrue(response.is_async)
+        self.assertIn(b'"weight": 70.0', b''.join([chunk async for chunk in response.streaming_content]))
+
+
+class BulkIngestTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='device', password='testpassword')
+        Profile.objects.create(user=self.user, user_type='user', height_cm=170)
+        self.client.login(username='device', password='testpassword')
+
+    def post_json(self, readings):
+        return self.client.post('/health_tracker/api/ingest/', json.dumps(readings), content_type='application/json')
+
+    def test_json_upsert_with_per_row_results(self):
+        WeightEntry.objects.create(user=self.user, weight=80, date=date(2023, 3, 1))
+        response = self.post_json([
+            {'type': 'weight', 'date': '2023-03-01', 'weight': 79.5},
+            {'type': 'weight', 'date': '2023-03-02', 'weight': 79.0},
+            {'type': 'blood_pressure', 'date': '2023-03-01', 'systolic': 118, 'diastolic': 76},
+            {'type': 'glucose', 'date': '2023-03-01', 'glucose_level': 'high'},
+            {'type': 'steps', 'date': '2023-03-01'},
+            {'type': 'meal', 'date': '2023-03-01', 'meal_type': 'Brunch', 'food_items': 'Eggs'},
+            {'type': 'activity', 'date': '2023-03-01', 'activity_type': 'Walk', 'duration_minutes': 40},
+            {'type': 'weight', 'date': '2023-03-02', 'weight': 78.8},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        statuses = [result['status'] for result in data['results']]
+        self.assertEqual(statuses, ['updated', 'duplicate', 'created', 'error', 'error', 'error', 'created', 'created'])
+        self.assertEqual((data['created'], data['updated'], data['errors']), (3, 1, 3))
+        self.assertIn('glucose_level', data['results'][3]['errors'])
+        self.assertIn('meal_type', data['results'][5]['errors'])
+        self.assertEqual(data['results'][1]['superseded_by'], 7)
+
+        weights = dict(WeightEntry.objects.filter(user=self.user).values_list('date', 'weight'))
+        self.assertEqual(weights, {date(2023, 3, 1): Decimal('79.50'), date(2023, 3, 2): Decimal('78.80')})
+        # Rollups follow bulk writes too.
+        month = MetricRollup.objects.get(user=self.user, metric='weight', period='month', period_start=date(2023, 3, 1))
+        self.assertEqual((month.count, month.minimum, month.maximum), (2, 78.8, 79.5))
+
+    def test_csv_batch(self):
+        rows = ['type,date,glucose_level,activity_type,duration_minutes,calories_burned']
+        rows += [f'glucose,{(date(2022, 1, 1) + timedelta(days=i)).isoformat()},{90 + i % 20},,,' for i in range(2000)]
+        rows.append('activity,2022-01-01,,Cycling,60,')
+        body = '\n'.join(rows).encode('utf-8')
+        response = self.client.post('/health_tracker/api/ingest/', body, content_type='text/csv')
+        data = response.json()
+        self.assertEqual((data['created'], data['errors']), (2001, 0))
+        self.assertEqual(GlucoseEntry.objects.filter(user=self.user).count(), 2000)
+        self.assertIsNone(Activity.objects.get(user=self.user).calories_burned)
+
+        # Re-syncing the same dump updates in place.
+        data = self.client.post('/health_tracker/api/ingest/', body, content_type='text/csv').json()
+        self.assertEqual(data['updated'], 2000)
+        self.assertEqual(GlucoseEntry.objects.filter(user=self.user).count(), 2000)
+
+    def test_rejects_malformed_bodies(self):
+        response = self.client.post('/health_tracker/api/ingest/', '{"readings": 3}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.post_json([{'type': ['weight'], 'date': '2023-03-01', 'weight': 70}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/health_tracker/api/ingest/').status_code, 405)
+
+
+class ColumnarExportTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='analyst', password='testpassword')
+        Profile.objects.create(user=self.user, user_type='user', height_cm=170)
+        self.client.login(username='analyst', password='testpassword')
+        other = User.objects.create_user(username='other', password='testpassword')
+        WeightEntry.objects.create(user=self.user, weight=70.5, date=date(2023, 1, 1))
+        WeightEntry.objects.create(user=self.user, weight=71, date=date(2023, 1, 2))
+        WeightEntry.objects.create(user=other, weight=90, date=date(2023, 1, 1))
+        Activity.objects.create(user=self.user, activity_type='Swim', duration_minutes=45, date=date(2023, 1, 1))
+
+    def test_batches_are_typed_and_bounded(self):
+        batches = list(iter_batches('weight', batch_size=2))
+        self.assertEqual([len(batch['id']) for batch in batches], [2, 1])
+        self.assertEqual(batches[0]['weight'], [70.5, 71.0])
+        self.assertEqual(batches[0]['date'][0], date(2023, 1, 1))
+
+    def test_ndjson_endpoint_is_per_user(self):
+        response = self.client.get('/health_tracker/export/weight/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(rows, [
+            {'id': rows[0]['id'], 'user_id': self.user.id, 'date': '2023-01-01', 'weight': 70.5},
+            {'id': rows[1]['id'], 'user_id': self.user.id, 'date': '2023-01-02', 'weight': 71.0},
+        ])
+
+        response = self.client.get('/health_tracker/export/activity/')
+        row = json.loads(b''.join(response.streaming_content))
+        self.assertIsNone(row['calories_burned'])
+        self.assertEqual(row['duration_minutes'], 45)
+        self.assertEqual(self.client.get('/health_tracker/export/passwords/').status_code, 404)
+
+    def test_export_command_ndjson(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('export_health_tables', output_dir, '--format', 'ndjson', '--tables', 'weight', 'dosage_logs', stdout=StringIO())
+            with open(os.path.join(output_dir, 'weight.ndjson')) as f:
+                self.assertEqual(len(f.read().splitlines()), 3)
+            with open(os.path.join(output_dir, 'dosage_logs.ndjson')) as f:
+                self.assertEqual(f.read(), '')
+
+    def test_columnar_formats_need_pyarrow(self):
+        with mock.patch('main.columnar_export._pyarrow', side_effect=ImproperlyConfigured('no pyarrow')):
+            response = self.client.get('/health_tracker/export/weight/?format=parquet')
+        self.assertEqual(response.status_code, 501)
+
+    @unittest.skipUnless(pyarrow, 'pyarrow is not installed')
+    def test_parquet_round_trip(self):
+        import pyarrow.parquet as pq
+        response = self.client.get('/health_tracker/export/weight/?format=parquet')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+        table = pq.read_table(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.column_names, ['id', 'user_id', 'date', 'weight'])
+        self.assertEqual(table.column('date').to_pylist(), [date(2023, 1, 1), date(2023, 1, 2)])
+        self.assertEqual(table.column('weight').to_pylist(), [70.5, 71.0])
+        self.assertEqual(set(table.column('user_id').to_pylist()), {self.user.id})
+
+    @unittest.skipUnless(pyarrow, 'pyarrow is not installed')
+    def test_arrow_command_round_trip(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('export_health_tables', output_dir, '--format', 'arrow', '--tables', 'weight', 'activity', stdout=StringIO())
+            weight = pyarrow.ipc.open_file(os.path.join(output_dir, 'weight.arrow')).read_all()
+            activity = pyarrow.ipc.open_file(os.path.join(output_dir, 'activity.arrow')).read_all()
+        self.assertEqual(weight.num_rows, 3)
+        self.assertEqual(sorted(weight.column('weight').to_pylist()), [70.5, 71.0, 90.0])
+        self.assertEqual(activity.column('duration_minutes').to_pylist(), [45])
+        self.assertEqual(activity.column('calories_burned').to_pylist(), [None])
+
+
+class TrackerDownsamplingTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='longhistory', password='testpassword')
+        Profile.objects.create(user=self.user, user_type='user', height_cm=170)
+        self.client.login(username='longhistory', password='testpassword')
+        start = date(2020, 1, 1)
+        WeightEntry.objects.bulk_create([
+            WeightEntry(user=self.user, weight=80 + (day % 30) / 10, date=start + timedelta(days=day))
+            for day in range(1000)
+        ])
+        # A single spike must survive downsampling.
+        WeightEntry.objects.filter(user=self.user, date=start + timedelta(days=500)).update(weight=120)
+
+    def test_lttb_keeps_endpoints_and_peaks(self):
+        rows = [(i, 0 if i != 37 else 50) for i in range(200)]
+        sampled = lttb(rows, 20, x=lambda r: r[0], y=lambda r: r[1])
+        self.assertEqual(len(sampled), 20)
+        self.assertEqual(sampled[0], rows[0])
+        self.assertEqual(sampled[-1], rows[-1])
+        self.assertIn((37, 50), sampled)
+        self.assertEqual(sampled, sorted(sampled))
+        self.assertEqual(lttb(rows[:5], 20, x=lambda r: r[0], y=lambda r: r[1]), rows[:5])
+
+    def test_min_max_buckets_keeps_extremes(self):
+        rows = [(i, i % 7) for i in range(100)]
+        sampled = min_max_buckets(rows, 10, y=lambda r: r[1])
+        self.assertLessEqual(len(sampled), 10)
+        self.assertIn(6, [r[1] for r in sampled])
+        self.assertIn(0, [r[1] for r in sampled])
+
+    def test_panel_is_downsampled(self):
+        data = self.client.get('/tracker/api/weight/?points=100').json()
+        self.assertEqual(data['total'], 1000)
+        self.assertEqual(len(data['entries']), 100)
+        self.assertIn(120.0, [e['weight'] for e in data['entries']])
+        self.assertEqual(data['entries'][-1]['date'], '2022-09-26')
+        self.assertEqual(len(data['recent']), 20)
+        self.assertEqual(data['recent'][0]['date'], '2022-09-26')
+        self.assertEqual(data['next_offset'], 20)
+
+    def test_history_is_paged(self):
+        data = self.client.get('/tracker/api/weight/?offset=20').json()
+        self.assertEqual(data['recent'][0]['date'], '2022-09-06')
+        self.assertEqual(data['next_offset'], 40)
+        data = self.client.get('/tracker/api/weight/?offset=990').json()
+        self.assertEqual(len(data['recent']), 10)
+        self.assertIsNone(data['next_offset'])
+
+    def test_panel_window(self):
+        data = self.client.get('/tracker/api/weight/?start=2020-02-01&end=2020-02-10').json()
+        self.assertEqual(data['total'], 10)
+        self.assertEqual(data['entries'][0]['date'], '2020-02-01')
+
+        data = self.client.get('/tracker/api/weight/?end=2022-09-26&days=30').json()
+        self.assertEqual(data['total'], 30)
+
+    def test_panel_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get('/tracker/api/weight/?start=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/tracker/api/weight/?points=many').status_code, 400)
+        # Huge windows are clamped; windows reaching before year 1 are rejected.
+        self.assertEqual(self.client.get('/tracker/api/weight/?days=999999999999').json()['total'], 1000)
+        self.assertEqual(self.client.get('/tracker/api/weight/?end=0001-01-05&days=30').status_code, 400)
+
+
+class MetricRollupTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rollups', password='testpassword')
+        Profile.objects.create(user=self.user, user_type='user', height_cm=170)
+        self.client.login(username='rollups', password='testpassword')
+
+    def rollup(self, metric, period, period_start):
+        return MetricRollup.objects.get(user=self.user, metric=metric, period=period, period_start=period_start)
+
+    def test_add_views_maintain_rollups(self):
+        # 2023-01-02 is a Monday.
+        self.client.post('/health_tracker/add_weight/', {'weight': 80, 'date': '2023-01-02'})
+        self.client.post('/health_tracker/add_weight/', {'weight': 78, 'date': '2023-01-04'})
+        self.client.post('/health_tracker/add_weight/', {'weight': 76, 'date': '2023-01-20'})
+
+        week = self.rollup('weight', 'week', date(2023, 1, 2))
+        self.assertEqual((week.count, week.total, week.minimum, week.maximum), (2, 158.0, 78.0, 80.0))
+        self.assertEqual(week.mean, 79.0)
+        month = self.rollup('weight', 'month', date(2023, 1, 1))
+        self.assertEqual((month.count, month.minimum, month.maximum), (3, 76.0, 80.0))
+        self.assertEqual(MetricRollup.objects.filter(metric='weight', period='day').count(), 3)
+
+        self.client.post('/health_tracker/add_blood_pressure/', {'systolic': 120, 'diastolic': 80, 'date': '2023-01-02'})
+        self.assertEqual(self.rollup('diastolic', 'day', date(2023, 1, 2)).maximum, 80.0)
+
+        # Activities without calories are not counted.
+        self.client.post('/health_tracker/add_activity/', {'activity_type': 'Walk', 'duration_minutes': 30, 'date': '2023-01-02'})
+        self.assertFalse(MetricRollup.objects.filter(metric='activity_calories').exists())
+
+    def test_delete_views_refresh_rollups(self):
+        self.client.post('/health_tracker/add_weight/', {'weight': 80, 'date': '2023-01-02'})
+        self.client.post('/health_tracker/add_weight/', {'weight': 78, 'date': '2023-01-04'})
+        entry = WeightEntry.objects.get(user=self.user, date=date(2023, 1, 2))
+        self.client.post(f'/health_tracker/delete_weight/{entry.pk}/')
+
+        week = self.rollup('weight', 'week', date(2023, 1, 2))
+        self.assertEqual((week.count, week.minimum, week.maximum), (1, 78.0, 78.0))
+        self.assertFalse(MetricRollup.objects.filter(metric='weight', period='day', period_start=date(2023, 1, 2)).exists())
+
+    def test_rebuild_matches_incremental(self):
+        for day, calories in [(1, 400), (2, 650), (15, 300), (40, None)]:
+            self.client.post('/health_tracker/add_meal/', {
+                'meal_type': 'Lunch', 'food_items': 'Rice', 'calories': calories or '',
+                'date': (date(2023, 1, 1) + timedelta(days=day)).isoformat(),
+            })
+        incremental = sorted(MetricRollup.objects.values_list('metric', 'period', 'period_start', 'count', 'total', 'minimum', 'maximum'))
+
+        out = StringIO()
+        call_command('rebuild_health_rollups', stdout=out)
+        self.assertIn(f'Rebuilt {len(incremental)} rollup rows', out.getvalue())
+        rebuilt = sorted(MetricRollup.objects.values_list('metric', 'period', 'period_start', 'count', 'total', 'minimum', 'maximum'))
+        self.assertEqual(rebuilt, incremental)
+
+    def test_rollup_api(self):
+        for day in range(1, 29):
+            self.client.post('/health_tracker/add_glucose/', {'glucose_level': 90 + day, 'date': f'2023-02-{day:02d}'})
+        data = self.client.get('/tracker/api/rollups/glucose/?period=month').json()
+        self.assertEqual(data['rollups'], [{'period_start': '2023-02-01', 'count': 28, 'sum': 2926.0, 'mean': 104.5, 'min': 91.0, 'max': 118.0}])
+
+        data = self.client.get('/tracker/api/rollups/glucose/?period=week&start=2023-02-15&end=2023-02-20').json()
+        self.assertEqual([r['period_start'] for r in data['rollups']], ['2023-02-13', '2023-02-20'])
+        self.assertEqual(self.client.get('/tracker/api/rollups/glucose/?period=year').status_code, 404)
+
+
+class PageCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_are_cached_with_etag(self):
+        response = self.client.get('/about/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Cookie', response['Vary'])
+
+        # The second hit comes from the cache: no template is rendered.
+        with self.assertTemplateNotUsed('about.html'):
+            response = self.client.get('/about/')
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get('/about/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_logged_in_users_do_not_share_pages(self):
+        self.client.get('/')
+        User.objects.create_user(username='visitor', password='testpassword')
+        self.client.login(username='visitor', password='testpassword')
+        response = self.client.get('/')
+        self.assertContains(response, 'Hi, visitor')
+
+        anonymous = Client()
+        self.assertNotContains(anonymous.get('/'), 'Hi, visitor')
+
+    def test_logged_in_pages_are_private_and_not_cached(self):
+        User.objects.create_user(username='visitor', password='testpassword')
+        self.client.login(username='visitor', password='testpassword')
+        response = self.client.get('/about/')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('max-age', response['Cache-Control'])
+
+        # Rendered again rather than served from the page cache.
+        with self.assertTemplateUsed('about.html'):
+            self.client.get('/about/')
+
+
+class AppointmentAvailabilityTest(TestCase):
+
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='drwho', password='testpassword')
+        Profile.objects.create(user=self.doctor, user_type='doctor')
+        self.patient = User.objects.create_user(username='amy', password='testpassword')
+        Profile.objects.create(user=self.patient, user_type='user')
+        self.day = timezone.localdate() + timedelta(days=3)
+
+    def book(self, start, end, status='Approved'):
+        return Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, date=self.day,
+            start_time=time.fromisoformat(start), end_time=time.fromisoformat(end), status=status,
+        )
+
+    def test_day_schedule_conflicts(self):
+        schedule = DaySchedule([(600, 630), (540, 570), (620, 660)])
+        self.assertEqual((schedule.starts, schedule.ends), ([540, 600], [570, 660]))
+        self.assertTrue(schedule.conflicts(550, 555))
+        self.assertTrue(schedule.conflicts(650, 700))
+        self.assertFalse(schedule.conflicts(570, 600))
+        self.assertFalse(schedule.conflicts(660, 720))
+        self.assertFalse(DaySchedule().conflicts(0, 1440))
+
+    def test_free_slots_skip_bookings_and_cancellations(self):
+        self.book('09:00', '09:30')
+        self.book('10:15', '11:00')
+        self.book('11:00', '11:30', status='Cancelled')
+        free = AvailabilityIndex(self.doctor, self.day, self.day).free_slots(30)[self.day]
+        starts = [slot[0].strftime('%H:%M') for slot in free]
+        self.assertEqual(starts[:4], ['09:30', '11:00', '11:30', '12:00'])
+        self.assertEqual(starts[-1], '16:30')
+
+    def test_past_days_have_no_slots(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        free = AvailabilityIndex(self.doctor, yesterday, yesterday).free_slots()
+        self.assertEqual(free, {yesterday: []})
+
+    def test_availability_endpoint(self):
+        self.book('09:00', '12:00')
+        self.client.login(username='amy', password='testpassword')
+        with self.assertNumQueries(4):  # session, user, doctor, appointments
+            response = self.client.get(f'/appointments/availability/{self.doctor.id}/?start={self.day}&end={self.day}&slot=60')
+        data = response.json()
+        self.assertEqual(data['days'][0]['slots'][0], {'start': '12:00', 'end': '13:00'})
+        self.assertEqual(len(data['days'][0]['slots']), 5)
+
+        self.assertContains(self.client.get('/appointments/create/'), 'id="free-slots"')
+        self.assertEqual(self.client.get(f'/appointments/availability/{self.patient.id}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/appointments/availability/{self.doctor.id}/?start=2024-01-01&end=2024-06-01').status_code, 400)
+
+    def test_form_ignores_cancelled_appointments(self):
+        self.book('10:00', '10:30', status='Cancelled')
+        self.book('11:00', '11:30')
+        data = {'doctor': self.doctor.id, 'date': self.day, 'start_time': '10:10', 'end_time': '10:40', 'reason': ''}
+        self.assertTrue(AppointmentForm(data).is_valid())
+        data.update(start_time='11:15', end_time='11:45')
+        self.assertFalse(AppointmentForm(data).is_valid())
+
+
+class ConcurrentBookingTest(TransactionTestCase):
+    """Many threads booking one doctor at once must never double-book."""
+
+    THREADS = 24
+
+    def setUp(self):
+        self.doctor = User.objects.create(username='busydoc')
+        Profile.objects.create(user=self.doctor, user_type='doctor')
+        self.patients = User.objects.bulk_create([User(username=f'p{i}') for i in range(self.THREADS)])
+        self.day = timezone.localdate() + timedelta(days=1)
+
+    def run_concurrently(self, requested_slots):
+        barrier = threading.Barrier(len(requested_slots))
+        outcomes = []
+
+        def attempt(patient, start, end):
+            try:
+                barrier.wait()
+                book_appointment(patient, self.doctor, self.day, start, end)
+                outcomes.append('booked')
+            except SlotUnavailable:
+                outcomes.append('rejected')
+            except Exception as e:  # anything else is a failure of the lock
+                outcomes.append(repr(e))
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=attempt, args=(patient, start, end))
+            for patient, (start, end) in zip(self.patients, requested_slots)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def assert_no_overlaps(self):
+        booked = sorted(Appointment.objects.filter(doctor=self.doctor, date=self.day).exclude(status='Cancelled')
+                        .values_list('start_time', 'end_time'))
+        for (_start, end), (next_start, _end) in zip(booked, booked[1:]):
+            self.assertLessEqual(end, next_start)
+        return booked
+
+    def test_identical_slot_is_booked_once(self):
+        outcomes = self.run_concurrently([(time(10, 0), time(10, 30))] * self.THREADS)
+        self.assertEqual(sorted(set(outcomes)), ['booked', 'rejected'])
+        self.assertEqual(outcomes.count('booked'), 1)
+        self.assertEqual(len(self.assert_no_overlaps()), 1)
+
+    def test_partially_overlapping_slots(self):
+        # 30-minute requests starting every 10 minutes: each overlaps its neighbours.
+        requested = [
+            (time(9 + (10 * i) // 60, (10 * i) % 60), time(9 + (10 * i + 30) // 60, (10 * i + 30) % 60))
+            for i in range(self.THREADS)
+        ]
+        outcomes = self.run_concurrently(requested)
+        self.assertEqual(set(outcomes), {'booked', 'rejected'})
+        booked = self.assert_no_overlaps()
+        self.assertEqual(len(booked), outcomes.count('booked'))
+
+    def test_cancelled_slot_can_be_rebooked(self):
+        first = book_appointment(self.patients[0], self.doctor, self.day, time(11, 0), time(11, 30))
+        with self.assertRaises(SlotUnavailable):
+            book_appointment(self.patients[1], self.doctor, self.day, time(11, 0), time(11, 30))
+        first.status = 'Cancelled'
+        first.save()
+        book_appointment(self.patients[1], self.doctor, self.day, time(11, 0), time(11, 30))
+
+
+class BookingViewTest(TestCase):
+
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='drbook', password='testpassword')
+        Profile.objects.create(user=self.doctor, user_type='doctor')
+        self.patient = User.objects.create_user(username='booker', password='testpassword')
+        Profile.objects.create(user=self.patient, user_type='user')
+        self.client.login(username='booker', password='testpassword')
+        self.data = {
+            'doctor': self.doctor.id, 'date': (timezone.localdate() + timedelta(days=2)).isoformat(),
+            'start_time': '10:00', 'end_time': '10:30', 'reason': 'Checkup',
+        }
+
+    def test_booking_creates_appointment(self):
+        response = self.client.post('/appointments/create/', self.data)
+        self.assertRedirects(response, '/appointment/', fetch_redirect_response=False)
+        self.assertEqual(Appointment.objects.get().patient, self.patient)
+
+    def test_losing_a_race_gets_a_clean_conflict_response(self):
+        with mock.patch('main.views.book_appointment', side_effect=SlotUnavailable):
+            response = self.client.post('/appointments/create/', self.data)
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, 'just booked by someone else', status_code=409)
+
+    def test_reviving_into_a_taken_slot_is_refused(self):
+        day = date.fromisoformat(self.data['date'])
+        cancelled = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=day, start_time=time(10, 0), end_time=time(10, 30), status='Cancelled',
+        )
+        book_appointment(self.patient, self.doctor, day, time(10, 15), time(10, 45))
+        self.client.login(username='drbook', password='testpassword')
+
+        response = self.client.post(f'/appointments/{cancelled.pk}/update_status/', {'status': 'Approved'})
+
+        self.assertContains(response, 'cannot be reinstated', status_code=409)
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, 'Cancelled')
+
+
+class AppointmentListTest(TestCase):
+
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='drlist', password='testpassword')
+        Profile.objects.create(user=self.doctor, user_type='doctor')
+        self.patient = User.objects.create_user(username='pat', password='testpassword')
+        Profile.objects.create(user=self.patient, user_type='user')
+        # 45 appointments, several sharing a date and start time across doctors' days.
+        Appointment.objects.bulk_create([
+            Appointment(
+                doctor=self.doctor, patient=self.patient, date=date(2024, 1, 1) + timedelta(days=i // 3),
+                start_time=time(9 + i % 3), end_time=time(10 + i % 3),
+                status='Cancelled' if i % 5 == 0 else 'Approved',
+            )
+            for i in range(45)
+        ])
+
+    def collect(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen.extend(response.context['appointments'])
+            cursor = response.context['next_cursor']
+            url = f'/appointment/?{response.context["filters"]}&after={cursor}' if cursor else None
+        return seen
+
+    def test_pages_cover_everything_once_in_order(self):
+        self.client.login(username='pat', password='testpassword')
+        seen = self.collect('/appointment/')
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(len({a.pk for a in seen}), 45)
+        keys = [(a.date, a.start_time, a.pk) for a in seen]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def test_page_cost_is_constant(self):
+        self.client.login(username='drlist', password='testpassword')
+        first = self.client.get('/appointment/')
+        # session, user + profile, one page of appointments with doctor/patient joined
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/appointment/?after={first.context["next_cursor"]}')
+        self.assertEqual(len(response.context['appointments']), 20)
+
+    def test_filters(self):
+        self.client.login(username='drlist', password='testpassword')
+        cancelled = self.collect('/appointment/?status=Cancelled')
+        self.assertEqual(len(cancelled), 9)
+        self.assertTrue(all(a.status == 'Cancelled' for a in cancelled))
+
+        response = self.client.get('/appointment/?from=2024-01-02&to=2024-01-03')
+        self.assertEqual(len(response.context['appointments']), 6)
+        self.assertIsNone(response.context['next_cursor'])
+
+        self.assertRedirects(self.client.get('/appointment/?after=garbage'), '/appointment/', fetch_redirect_response=False)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite connection tuning')
+class SQLiteConnectionTest(TestCase):
+
+    def _pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        # journal_mode is WAL on file databases; the test database is in memory.
+        self.assertEqual(self._pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self._pragma('cache_size'), -20000)
+        self.assertEqual(self._pragma('busy_timeout'), 20000)
+
+
+class AdherenceCalendarTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.doctor = User.objects.create_user(username='doctor', password='testpassword')
+        Profile.objects.create(user=self.doctor, user_type='doctor')
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        Profile.objects.create(user=self.user, user_type='user', height_cm=170)
+        self.client.login(username='testuser', password='testpassword')
+
+    def _prescribe(self, medicines=1, weeks=4):
+        prescription = Prescription.objects.create(doctor=self.doctor, patient=self.user)
+        for i in range(medicines):
+            PrescribedMedicine.objects.create(prescription=prescription, name=f'Med {i}', dosage='1 tablet', duration_weeks=weeks)
+        return prescription
+
+    def test_calendar_fills_missing_days_without_writing_logs(self):
+        prescription = self._prescribe(medicines=2, weeks=2)
+        medicine = prescription.medicines.first()
+        start = prescription.date_prescribed.date()
+        DosageLog.objects.create(prescribed_medicine=medicine, patient=self.user, date=start, taken=True)
+
+        calendar = build_adherence_calendar(self.user)
+
+        self.assertEqual(DosageLog.objects.count(), 1)
+        self.assertEqual(len(calendar), 1)
+        medicines = {m['medicine_obj'].id: m['dates_in_period'] for m in calendar[0]['medicines']}
+        self.assertEqual(len(medicines[medicine.id]), 14)
+        self.assertEqual(medicines[medicine.id][0], {'date': start, 'taken': True})
+        self.assertFalse(any(day['taken'] for day in medicines[medicine.id][1:]))
+
+    def test_calendar_query_count_is_flat(self):
+        for _ in range(5):
+            self._prescribe(medicines=4, weeks=12)
+        # prescriptions (+ doctor), medicines, dosage logs
+        with self.assertNumQueries(3):
+            calendar = build_adherence_calendar(self.user)
+        self.assertEqual(sum(len(m['dates_in_period']) for p in calendar for m in p['medicines']), 5 * 4 * 84)
+
+    def test_toggle_creates_log(self):
+        prescription = self._prescribe()
+        medicine = prescription.medicines.first()
+        response = self.client.post(
+            '/tracker/update_dosage/',
+            data=json.dumps({'medicine_id': medicine.id, 'date': '2023-01-01', 'taken': True}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(DosageLog.objects.get(prescribed_medicine=medicine, date=date(2023, 1, 1)).taken)
+
+
+class DosageBatchTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        doctor = User.objects.create(username='doctor')
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        Profile.objects.create(user=self.user, user_type='user')
+        self.medicine = Prescription.objects.create(doctor=doctor, patient=self.user).medicines.create(name='A', dosage='1', duration_weeks=2)
+        self.other = Prescription.objects.create(doctor=doctor, patient=doctor).medicines.create(name='B', dosage='1', duration_weeks=2)
+        # Both courses run from 2024-01-01 to 2024-01-14.
+        Prescription.objects.update(date_prescribed=timezone.make_aware(datetime(2024, 1, 1, 9)))
+        self.client.login(username='testuser', password='testpassword')
+
+    def _post(self, toggles):
+        return self.client.post('/tracker/update_dosage/batch/', data=json.dumps(toggles), content_type='application/json')
+
+    def test_week_is_one_authorization_query_and_one_upsert(self):
+        DosageLog.objects.create(prescribed_medicine=self.medicine, patient=self.user, date=date(2024, 1, 1), taken=False)
+        toggles = [{'medicine_id': self.medicine.id, 'date': f'2024-01-0{day}', 'taken': True} for day in range(1, 8)]
+        # Last toggle of a day wins.
+        toggles.append({'medicine_id': self.medicine.id, 'date': '2024-01-07', 'taken': False})
+
+        # session + user/profile, medicine ownership, savepoint + upsert + release
+        with self.assertNumQueries(6):
+            response = self._post(toggles)
+
+        self.assertEqual(response.json(), {'status': 'success', 'updated': 7})
+        logs = dict(DosageLog.objects.filter(patient=self.user).values_list('date', 'taken'))
+        self.assertEqual(len(logs), 7)
+        self.assertTrue(logs[date(2024, 1, 1)])
+        self.assertFalse(logs[date(2024, 1, 7)])
+
+    def test_foreign_medicine_rejects_whole_batch(self):
+        response = self._post([
+            {'medicine_id': self.medicine.id, 'date': '2024-01-01', 'taken': True},
+            {'medicine_id': self.other.id, 'date': '2024-01-01', 'taken': True},
+        ])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['medicine_ids'], [self.other.id])
+        self.assertFalse(DosageLog.objects.exists())
+
+    def test_malformed_toggles(self):
+        self.assertEqual(self._post([{'medicine_id': self.medicine.id, 'date': 'soon', 'taken': True}]).status_code, 400)
+        self.assertEqual(self._post([{'medicine_id': self.medicine.id, 'date': '2024-01-01', 'taken': 'yes'}]).status_code, 400)
+        self.assertEqual(self._post({'toggles': []}).json(), {'status': 'success', 'updated': 0})
+
+    def test_days_outside_the_course_reject_whole_batch(self):
+        for day in ('2023-12-31', '2024-01-15'):
+            response = self._post([
+                {'medicine_id': self.medicine.id, 'date': '2024-01-14', 'taken': True},
+                {'medicine_id': self.medicine.id, 'date': day, 'taken': True},
+            ])
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(day, response.json()['message'])
+        self.assertFalse(DosageLog.objects.exists())
+
+
+class BulkPrescribeTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.doctor = User.objects.create_user(username='doctor', password='testpassword')
+        Profile.objects.create(user=self.doctor, user_type='doctor')
+        self.patients = User.objects.bulk_create([User(username=f'p{i}') for i in range(30)])
+        Profile.objects.bulk_create([Profile(user=patient, user_type='user') for patient in self.patients])
+        self.regimen = [
+            {'name': 'Metformin', 'dosage': '500 mg twice daily', 'duration_weeks': 12},
+            {'name': 'Vitamin D', 'dosage': '1 tablet', 'duration_weeks': 4},
+        ]
+        self.client.login(username='doctor', password='testpassword')
+
+    def _post(self, url, data):
+        return self.client.post(url, data=json.dumps(data), content_type='application/json')
+
+    def test_template_round_trip_and_replace(self):
+        response = self._post('/prescription/templates/', {'name': 'Diabetes', 'advice': 'Walk daily', 'medicines': self.regimen})
+        self.assertEqual(response.status_code, 201)
+        self._post('/prescription/templates/', {'name': 'Diabetes', 'medicines': self.regimen[:1]})
+
+        templates = self.client.get('/prescription/templates/').json()['templates']
+        self.assertEqual(len(templates), 1)
+        self.assertEqual(templates[0]['medicines'], self.regimen[:1])
+
+    def test_invalid_medicine_is_reported_per_row(self):
+        response = self._post('/prescription/templates/', {'name': 'Bad', 'medicines': [{'name': 'X', 'dosage': '', 'duration_weeks': 0}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('dosage', response.json()['errors']['0'])
+
+    def test_bulk_prescribe_from_template_is_constant_queries(self):
+        template_id = self._post('/prescription/templates/', {'name': 'Diabetes', 'medicines': self.regimen}).json()['id']
+        patient_ids = [patient.id for patient in self.patients]
+
+        # session + user/profile, template, its medicines, patient check,
+        # savepoint + two bulk inserts + release
+        with self.assertNumQueries(9):
+            response = self._post('/prescription/bulk/', {'patients': patient_ids, 'template': template_id})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Prescription.objects.filter(doctor=self.doctor).count(), 30)
+        self.assertEqual(PrescribedMedicine.objects.filter(prescription__patient=self.patients[0]).count(), 2)
+        self.assertFalse(DosageLog.objects.exists())
+        # The patient's calendar fills the schedule in from the prescription.
+        calendar = build_adherence_calendar(self.patients[0])
+        self.assertEqual(len(calendar[0]['medicines'][0]['dates_in_period']), 84)
+
+    def test_unknown_patient_writes_nothing(self):
+        response = self._post('/prescription/bulk/', {'patients': [self.patients[0].id, self.doctor.id], 'medicines': self.regimen})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors']['patients'], [self.doctor.id])
+        self.assertFalse(Prescription.objects.exists())
+
+    def test_other_doctors_template_is_not_found(self):
+        other = User.objects.create(username='other')
+        template = PrescriptionTemplate.objects.create(doctor=other, name='Theirs')
+        response = self._post('/prescription/bulk/', {'patients': [self.patients[0].id], 'template': template.id})
+        self.assertEqual(response.status_code, 404)
+
+
+class AdherenceReportTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.doctor = User.objects.create_user(username='doctor', password='testpassword')
+        Profile.objects.create(user=self.doctor, user_type='doctor')
+        self.patient = User.objects.create_user(username='patient', password='testpassword')
+        Profile.objects.create(user=self.patient, user_type='user')
+        self.prescription = Prescription.objects.create(doctor=self.doctor, patient=self.patient)
+        self.medicine = PrescribedMedicine.objects.create(prescription=self.prescription, name='Med', dosage='1 tablet', duration_weeks=2)
+        self.first_day = self.prescription.date_prescribed.date()
+
+    def _log(self, medicine, offsets, taken=True):
+        DosageLog.objects.bulk_create([
+            DosageLog(prescribed_medicine=medicine, patient=medicine.prescription.patient,
+                      date=self.first_day + timedelta(days=offset), taken=taken)
+            for offset in offsets
+        ])
+
+    def test_percent_streak_and_last_dose(self):
+        # Taken on days 0-2, 6 and 8 of a 14-day course; day 3 logged as not taken.
+        self._log(self.medicine, [0, 1, 2, 6, 8])
+        self._log(self.medicine, [3], taken=False)
+        last_day = self.first_day + timedelta(days=13)
+
+        [row] = adherence_report(self.doctor, self.first_day, last_day, today=last_day)
+
+        self.assertEqual(row['due_days'], 14)
+        self.assertEqual(row['taken_days'], 5)
+        self.assertEqual(row['percent_taken'], 35.7)
+        # Days 9-13 are the longest run of misses (days 3-5 only three).
+        self.assertEqual(row['longest_missed_streak'], 5)
+        self.assertEqual(row['last_dose'], (self.first_day + timedelta(days=8)).isoformat())
+
+    def test_window_clips_course_and_future_days(self):
+        self._log(self.medicine, [0, 4, 5])
+        today = self.first_day + timedelta(days=5)
+
+        [row] = adherence_report(self.doctor, self.first_day + timedelta(days=1), self.first_day + timedelta(days=30), today=today)
+
+        self.assertEqual(row['due_days'], 5)
+        self.assertEqual(row['taken_days'], 2)
+        self.assertEqual(row['longest_missed_streak'], 3)
+
+    def test_medicine_never_taken(self):
+        [row] = adherence_report(self.doctor, self.first_day, self.first_day + timedelta(days=6), today=self.first_day + timedelta(days=6))
+        self.assertEqual((row['taken_days'], row['longest_missed_streak'], row['last_dose']), (0, 7, None))
+
+    def test_only_the_doctors_patients_and_flat_query_count(self):
+        other_doctor = User.objects.create(username='other')
+        Prescription.objects.create(doctor=other_doctor, patient=self.patient).medicines.create(name='Other', dosage='1', duration_weeks=2)
+        for i in range(20):
+            patient = User.objects.create(username=f'p{i}')
+            medicine = Prescription.objects.create(doctor=self.doctor, patient=patient).medicines.create(name='Med', dosage='1', duration_weeks=2)
+            self._log(medicine, range(0, 14, 3))
+        last_day = self.first_day + timedelta(days=13)
+
+        # medicines, grouped taken counts, gaps
+        with self.assertNumQueries(3):
+            report = adherence_report(self.doctor, self.first_day, last_day, today=last_day)
+
+        self.assertEqual(len(report), 21)
+        self.assertNotIn('Other', {row['medicine']['name'] for row in report})
+        self.assertEqual(report[0]['patient']['username'], 'patient')
+        self.assertEqual(report[-1]['longest_missed_streak'], 2)
+
+    def test_view_is_doctor_only_and_validates_window(self):
+        self.client.login(username='patient', password='testpassword')
+        self.assertEqual(self.client.get('/prescription/adherence/').status_code, 302)
+
+        self.client.login(username='doctor', password='testpassword')
+        response = self.client.get('/prescription/adherence/', {'patient': self.patient.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['medicines'][0]['medicine']['id'], self.medicine.id)
+        self.assertEqual(self.client.get('/prescription/adherence/', {'start': 'bad'}).status_code, 400)
+        self.assertEqual(self.client.get('/prescription/adherence/', {'end': '0001-01-05'}).status_code, 400)
+        self.assertEqual(self.client.get('/prescription/adherence/', {'start': '2024-01-01', 'end': '2025-06-01'}).status_code, 400)
+
+
+class SignalingDrainTest(TestCase):
+
+    def setUp(self):
+        self.room = Room.objects.create()
+        self.url = f'/signaling/{self.room.id}/'
+
+    def test_poll_returns_new_messages_and_acknowledges_on_next_poll(self):
+        first = Message.objects.create(room=self.room, sender_session_id='peer', message=json.dumps({'offer': 'sdp'}))
+
+        payload = self.client.get(self.url).json()
+        self.assertEqual(payload['messages'], [{'id': first.id, 'data': {'offer': 'sdp'}}])
+        self.assertEqual(payload['cursor'], first.id)
+        # Not deleted until the client advances its cursor past it.
+        self.assertTrue(Message.objects.filter(id=first.id).exists())
+
+        second = Message.objects.create(room=self.room, sender_session_id='peer', message=json.dumps({'answer': 'sdp'}))
+        payload = self.client.get(self.url, {'after': first.id}).json()
+        self.assertEqual(payload['messages'], [{'id': second.id, 'data': {'answer': 'sdp'}}])
+        self.assertFalse(Message.objects.filter(id=first.id).exists())
+        self.assertTrue(Message.objects.filter(id=second.id).exists())
+
+    def test_poll_skips_own_messages_and_keeps_cursor_when_empty(self):
+        self.client.post(self.url, data=json.dumps({'offer': 'sdp'}), content_type='application/json')
+        own = Message.objects.get(room=self.room)
+
+        payload = self.client.get(self.url, {'after': 7}).json()
+        self.assertEqual(payload, {'messages': [], 'cursor': 7})
+        self.assertTrue(Message.objects.filter(id=own.id).exists())
+
+    def test_post_to_unknown_room_is_rejected(self):
+        response = self.client.post(f'/signaling/{uuid.uuid4()}/', data='{}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Message.objects.exists())
+
+    def test_poll_is_scoped_to_room(self):
+        other_room = Room.objects.create()
+        Message.objects.create(room=other_room, sender_session_id='peer', message='{}')
+        payload = self.client.get(self.url).json()
+        self.assertEqual(payload['messages'], [])
+
+
+class SignalingStreamTest(TestCase):
+
+    def test_stream_requires_asgi(self):
+        room = Room.objects.create()
+        response = self.client.get(f'/signaling/{room.id}/stream/')
+        self.assertEqual(response.status_code, 501)
+
+    async def test_stream_delivers_backlog_then_live_messages(self):
+        room = await Room.objects.acreate()
+        backlog = await Message.objects.acreate(room=room, sender_session_id='peer', message=json.dumps({'offer': 'sdp'}))
+
+        response = await AsyncClient().get(f'/signaling/{room.id}/stream/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+
+        first = await anext(stream)
+        self.assertIn(f'id: {backlog.id}', first.decode())
+        self.assertIn('"offer": "sdp"', first.decode())
+
+        live = await Message.objects.acreate(room=room, sender_session_id='peer', message=json.dumps({'answer': 'sdp'}))
+        self.assertEqual(broker.subscriber_count(room.id), 1)
+        broker.publish(room.id, {'id': live.id, 'sender': 'peer', 'data': {'answer': 'sdp'}})
+        second = await anext(stream)
+        self.assertIn('"answer": "sdp"', second.decode())
+        self.assertFalse(await Message.objects.filter(id=backlog.id).aexists())
+
+    async def test_stream_reads_messages_published_out_of_order(self):
+        room = await Room.objects.acreate()
+        response = await AsyncClient().get(f'/signaling/{room.id}/stream/')
+        stream = aiter(response.streaming_content)
+        # Wait for the stream to subscribe.
+        drain = asyncio.ensure_future(anext(stream))
+        while not broker.subscriber_count(room.id):
+            await asyncio.sleep(0)
+
+        earlier = await Message.objects.acreate(room=room, sender_session_id='peer', message=json.dumps({'n': 1}))
+        later = await Message.objects.acreate(room=room, sender_session_id='peer', message=json.dumps({'n': 2}))
+        # Only the later post has been published so far.
+        broker.publish(room.id, {'id': later.id, 'sender': 'peer', 'data': {'n': 2}})
+
+        self.assertIn(f'id: {earlier.id}', (await drain).decode())
+        self.assertIn(f'id: {later.id}', (await anext(stream)).decode())
+
+
+class CallRoomReaperTest(TestCase):
+
+    def test_reaps_idle_rooms_and_their_messages(self):
+        now = timezone.now()
+        stale = Room.objects.create(last_activity=now - timedelta(days=2))
+        active = Room.objects.create(last_activity=now)
+        for i in range(5):
+            Message.objects.create(room=stale, sender_session_id='peer', message='{}')
+        Message.objects.create(room=active, sender_session_id='peer', message='{}')
+
+        result = reap_call_rooms(max_idle=timedelta(hours=1), message_max_age=timedelta(hours=1), batch_size=2, now=now)
+
+        self.assertEqual(result['rooms'], 1)
+        self.assertEqual(result['messages'], 5)
+        self.assertFalse(Room.objects.filter(id=stale.id).exists())
+        self.assertEqual(Message.objects.filter(room=active).count(), 1)
+
+    def test_room_that_becomes_active_keeps_its_messages(self):
+        now = timezone.now()
+        room = Room.objects.create(last_activity=now - timedelta(days=2))
+        room_ids = [room.id]
+        # The peer posts between the reaper listing the room and deleting it.
+        post_message(room.id, 'peer', {'offer': 'sdp'})
+
+        self.assertEqual(_delete_idle_rooms(room_ids, now - timedelta(hours=1), batch_size=2), (0, 0))
+        self.assertEqual(Message.objects.filter(room=room).count(), 1)
+
+    def test_reaps_old_undelivered_messages_in_active_rooms(self):
+        room = Room.objects.create()
+        old = Message.objects.create(room=room, sender_session_id='peer', message='{}')
+        Message.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(hours=3))
+        Message.objects.create(room=room, sender_session_id='peer', message='{}')
+
+        result = reap_call_rooms(max_idle=timedelta(hours=1), message_max_age=timedelta(hours=1))
+
+        self.assertEqual(result, {'rooms': 0, 'messages': 1, 'seconds': result['seconds']})
+        self.assertTrue(Room.objects.filter(id=room.id).exists())
+        self.assertFalse(Message.objects.filter(id=old.id).exists())
+
+    def test_posting_a_message_bumps_room_activity(self):
+        room = Room.objects.create(last_activity=timezone.now() - timedelta(days=2))
+        self.client.post(f'/signaling/{room.id}/', data='{}', content_type='application/json')
+        room.refresh_from_db()
+        self.assertGreater(room.last_activity, timezone.now() - timedelta(minutes=1))
+
+    @override_settings(CALL_ROOM_REAPER_INTERVAL_SECONDS=60)
+    def test_reaper_thread_is_started_by_the_server_entrypoint_only(self):
+        with mock.patch('main.reaper.start_periodic_reaper') as start:
+            call_command('reap_call_rooms', stdout=StringIO())
+            start.assert_not_called()
+            start_reaper_from_settings()
+        start.assert_called_once_with(60)
+
+    def test_management_command_reports_reclaimed_rows(self):
+        Room.objects.create(last_activity=timezone.now() - timedelta(days=2))
+        out = StringIO()
+        call_command('reap_call_rooms', '--max-idle-hours', '1', stdout=out)
+        self.assertIn('Reclaimed 1 rooms and 0 messages', out.getvalue())
+
+
+class MedicineSearchIndexTest(TestCase):
+
+    def setUp(self):
+        self.index = MedicineSearchIndex(
+            [
+                (1, 'Crocin Advance', 'crocin', 'Paracetamol 500mg', '20.00'),
+                (2, 'Levothyroxine', 'levothyroxine', 'Levothyroxine 50mcg', '10.00'),
+                (3, 'Dolo 650', 'dolo', 'Paracetamol 650mg', '30.00'),
+            ],
+            [
+                (10, 'Eltroxin 50', 'Levothyroxine 50mcg', '12.00', 2),
+            ],
+        )
+
+    def names(self, query, limit=10):
+        return [doc['name'] for doc in self.index.search(query, limit=limit)]
+
+    def test_prefix_search(self):
+        self.assertEqual(self.names('cro'), ['Crocin Advance'])
+        self.assertEqual(self.names('elt'), ['Eltroxin 50'])
+
+    def test_typo_tolerant_search(self):
+        self.assertEqual(self.names('crocn'), ['Crocin Advance'])
+        self.assertEqual(self.names('levothyroxin'), ['Levothyroxine', 'Eltroxin 50'])
+        self.assertEqual(self.names('levotyhroxine')[0], 'Levothyroxine')
+
+    def test_composition_search(self):
+        self.assertEqual(self.names('paracetamol'), ['Crocin Advance', 'Dolo 650'])
+        self.assertEqual(self.names('paracetamol 650'), ['Dolo 650'])
+
+    def test_search_tag_lookup_and_browse(self):
+        self.assertEqual(self.index.get_by_search_tag('dolo')['id'], 3)
+        self.assertIsNone(self.index.get_by_search_tag('missing'))
+        self.assertEqual([doc['name'] for doc in self.index.medicines()], ['Crocin Advance', 'Dolo 650', 'Levothyroxine'])
+
+
+class MedicineSearchViewsTest(TestCase):
+
+    def setUp(self):
+        self.medicine = Medicine.objects.create(name='Crocin Advance', manufacturer='GSK', composition='Paracetamol 500mg', price='20.00', search_tag='crocin')
+        Substitute.objects.create(original_medicine=self.medicine, name='Calpol 500', manufacturer='GSK', composition='Paracetamol 500mg', price='15.00')
+
+    def test_autocomplete_endpoint(self):
+        response = self.client.get('/medicines/autocomplete/', {'q': 'cal'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([r['name'] for r in results], ['Calpol 500'])
+        self.assertEqual(results[0]['medicine_id'], self.medicine.id)
+
+    def test_substitute_view_tolerates_typos(self):
+        response = self.client.post('/medicines/', {'medicine_name': 'crocn'})
+        self.assertEqual(response.context['results']['original'], self.medicine)
+        self.assertEqual(response.context['matched_name'], 'Crocin Advance')
+
+    def test_index_is_rebuilt_when_catalog_changes(self):
+        get_search_index()
+        Medicine.objects.create(name='Dolo 650', manufacturer='Micro Labs', composition='Paracetamol 650mg', price='30.00', search_tag='dolo')
+        response = self.client.get('/medicines/autocomplete/', {'q': 'dolo'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Dolo 650'])
+
+    def test_substitute_view_survives_a_stale_index(self):
+        get_search_index()
+        # A delete from another process fires no signal in this one.
+        with mock.patch('main.search.invalidate_search_index'):
+            self.medicine.delete()
+        response = self.client.post('/medicines/', {'medicine_name': 'crocin'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('not found', response.context['error'])
+        self.assertIsNone(get_search_index().get_by_search_tag('crocin'))
+
+    @override_settings(MEDICINE_SEARCH_INDEX_CHECK_SECONDS=0)
+    def test_index_notices_upserts_from_other_processes(self):
+        get_search_index()
+        # The catalog import upserts in bulk and fires no signals, like a load
+        # run from another process; only the fingerprint can notice the rename.
+        import_catalog([{'search_tag': 'crocin', 'name': 'Crocin Pain Relief', 'manufacturer': 'GSK',
+                         'composition': 'Paracetamol 500mg', 'price': '20.00', 'substitutes': []}])
+        self.assertEqual(get_search_index().get_by_search_tag('crocin')['name'], 'Crocin Pain Relief')
+
+
+class CompositionIndexTest(TestCase):
+
+    def test_parse_composition_normalizes_units_and_order(self):
+        self.assertEqual(
+            parse_composition('Sitagliptin 50mg/Metformin 500mg'),
+            ((('metformin', '500', 'mg'), ('sitagliptin', '50', 'mg')), ()),
+        )
+        self.assertEqual(composition_key('Paracetamol 0.5g'), composition_key('Paracetamol 500 mg Tablet'))
+        self.assertEqual(composition_key('Levothyroxine 50mcg'), 'levothyroxine 0.05mg')
+        self.assertEqual(composition_key('Insulin Glargine 100 units/ml'), 'insulin glargine 100units/ml')
+        self.assertNotEqual(composition_key('Venlafaxine ER 75mg'), composition_key('Venlafaxine 75mg'))
+
+    def test_equivalents_span_the_whole_catalog(self):
+        crocin = Medicine.objects.create(name='Crocin', manufacturer='GSK', composition='Paracetamol 500mg', price='20.00', search_tag='crocin')
+        calpol = Medicine.objects.create(name='Calpol', manufacturer='GSK', composition='Paracetamol 500 mg', price='12.00', search_tag='calpol')
+        Medicine.objects.create(name='Dolo 650', manufacturer='Micro Labs', composition='Paracetamol 650mg', price='30.00', search_tag='dolo')
+        Substitute.objects.create(original_medicine=calpol, name='Pacimol', manufacturer='Ipca', composition='Paracetamol 0.5g', price='8.00')
+        Substitute.objects.create(original_medicine=crocin, name='Hand picked', manufacturer='Acme', composition='Unknown blend', price='50.00')
+
+        equivalents = find_equivalents(crocin)
+
+        self.assertEqual([e['name'] for e in equivalents], ['Pacimol', 'Calpol', 'Hand picked'])
+        self.assertEqual([e['kind'] for e in equivalents], ['substitute', 'medicine', 'substitute'])
+
+    def test_index_compositions_only_touches_unindexed_rows(self):
+        medicine = Medicine.objects.create(name='Crocin', manufacturer='GSK', composition='Paracetamol 500mg', price='20.00', search_tag='crocin')
+        Medicine.objects.filter(pk=medicine.pk).update(composition_key=None)
+
+        self.assertEqual(index_compositions(), 1)
+        self.assertEqual(index_compositions(), 0)
+        medicine.refresh_from_db()
+        self.assertEqual(medicine.composition_key, 'paracetamol 500mg')
+
+    def test_load_medicine_substitutes_indexes_compositions(self):
+        call_command('load_medicine_substitutes', stdout=StringIO())
+        self.assertFalse(Medicine.objects.filter(composition_key__isnull=True).exists())
+        self.assertFalse(Substitute.objects.filter(composition_key__isnull=True).exists())
+        levothyroxine = Medicine.objects.get(search_tag='levothyroxine')
+        self.assertTrue(any(e['name'] == 'Eltroxin 50' for e in find_equivalents(levothyroxine)))
+
+
+class CatalogImportTest(TestCase):
+
+    ENTRIES = [
+        {'search_tag': 'crocin', 'name': 'Crocin', 'manufacturer': 'GSK', 'composition': 'Paracetamol 500mg', 'price': 20,
+         'substitutes': [{'name': 'Calpol 500', 'manufacturer': 'GSK', 'composition': 'Paracetamol 500mg', 'price': 15.5}]},
+        {'search_tag': 'dolo', 'name': 'Dolo 650', 'manufacturer': 'Micro Labs', 'composition': 'Paracetamol 650mg', 'price': '30.00',
+         'substitutes': []},
+    ]
+
+    def test_json_array_is_parsed_incrementally(self):
+        text = '  [\n' + ',\n'.join(json.dumps(entry) for entry in self.ENTRIES) + '\n]  '
+        self.assertEqual(list(iter_json_array(StringIO(text), chunk_size=7)), self.ENTRIES)
+        self.assertEqual(list(iter_json_array(StringIO('[]'))), [])
+        with self.assertRaises(ValueError):
+            list(iter_json_array(StringIO('[{"name": "trunc'), chunk_size=4))
+
+    def test_ndjson_and_csv_formats(self):
+        ndjson = StringIO('\n'.join(json.dumps(entry) for entry in self.ENTRIES) + '\n')
+        self.assertEqual(list(iter_medicine_entries(ndjson, 'ndjson')), self.ENTRIES)
+
+        csv_text = (
+            'search_tag,name,manufacturer,composition,price,substitute_name,substitute_manufacturer,substitute_composition,substitute_price\n'
+            'crocin,Crocin,GSK,Paracetamol 500mg,20,Calpol 500,GSK,Paracetamol 500mg,15.5\n'
+            'crocin,Crocin,GSK,Paracetamol 500mg,20,Pacimol,Ipca,Paracetamol 500mg,8\n'
+            'dolo,Dolo 650,Micro Labs,Paracetamol 650mg,30,,,,\n'
+        )
+        entries = list(iter_medicine_entries(StringIO(csv_text), 'csv'))
+        self.assertEqual([e['search_tag'] for e in entries], ['crocin', 'dolo'])
+        self.assertEqual([s['name'] for s in entries[0]['substitutes']], ['Calpol 500', 'Pacimol'])
+        self.assertEqual(entries[1]['substitutes'], [])
+
+    def test_import_is_an_idempotent_upsert(self):
+        totals = import_catalog(iter(self.ENTRIES), batch_size=1)
+        self.assertEqual((totals['medicines'], totals['substitutes_created'], totals['rows']), (2, 1, 3))
+
+        updated = [dict(self.ENTRIES[0], price=18), self.ENTRIES[1]]
+        with self.assertNumQueries(5):
+            totals = import_catalog(iter(updated), batch_size=10)
+        self.assertEqual(totals['substitutes_created'], 0)
+        self.assertEqual(Medicine.objects.count(), 2)
+        self.assertEqual(Substitute.objects.count(), 1)
+        crocin = Medicine.objects.get(search_tag='crocin')
+        self.assertEqual(crocin.price, Decimal('18.00'))
+        self.assertEqual(crocin.composition_key, 'paracetamol 500mg')
+        self.assertEqual(Substitute.objects.get().composition_key, 'paracetamol 500mg')
+
+    def test_command_loads_ndjson_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False, encoding='utf-8') as f:
+            for entry in self.ENTRIES:
+                f.write(json.dumps(entry) + '\n')
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('load_medicine_substitutes', f.name, stdout=out)
+        self.assertIn('Upserted 2 medicines and created 1 substitutes from 3 rows', out.getvalue())
+        self.assertEqual(Medicine.objects.count(), 2)
+
+    def test_command_reports_bad_price(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False, encoding='utf-8') as f:
+            f.write(json.dumps(dict(self.ENTRIES[1], price='n/a')) + '\n')
+        self.addCleanup(os.remove, f.name)
+        with self.assertRaises(CommandError):
+            call_command('load_medicine_substitutes', f.name, stdout=StringIO())
+
+
+class MedicalDataImportTest(TestCase):
+
+    RECORDS = [
+        {'name': 'Migraine', 'description': 'Headache.', 'precautions': 'Rest.', 'symptoms': ['Nausea', 'Headache']},
+        {'name': 'Flu', 'description': 'Virus.', 'precautions': 'Fluids.', 'symptoms': ['Fever', 'Headache', 'Fever']},
+    ]
+
+    def test_import_creates_diseases_symptoms_and_links(self):
+        stats = import_medical_data(self.RECORDS)
+        self.assertEqual(stats['diseases_created'], 2)
+        self.assertEqual(stats['symptoms_created'], 3)
+        self.assertEqual(stats['links_created'], 4)
+        flu = Disease.objects.get(name='Flu')
+        self.assertEqual(sorted(flu.symptoms.values_list('name', flat=True)), ['Fever', 'Headache'])
+
+    def test_rerun_skips_unchanged_records_in_a_few_queries(self):
+        import_medical_data(self.RECORDS)
+        # symptoms, diseases, links (+ savepoint/release)
+        with self.assertNumQueries(5):
+            stats = import_medical_data(self.RECORDS)
+        self.assertEqual(stats['diseases_unchanged'], 2)
+        self.assertEqual(stats['diseases_created'] + stats['diseases_updated'], 0)
+
+    def test_changed_records_are_updated(self):
+        import_medical_data(self.RECORDS)
+        changed = [dict(self.RECORDS[0], precautions='Dark room.', symptoms=['Nausea', 'Aura'])]
+        stats = import_medical_data(changed)
+        self.assertEqual((stats['diseases_updated'], stats['links_created'], stats['links_deleted']), (1, 1, 1))
+        migraine = Disease.objects.get(name='Migraine')
+        self.assertEqual(migraine.precautions, 'Dark room.')
+        self.assertEqual(sorted(migraine.symptoms.values_list('name', flat=True)), ['Aura', 'Nausea'])
+        # Flu shares Headache with the old Migraine record and keeps it.
+        self.assertEqual(sorted(Disease.objects.get(name='Flu').symptoms.values_list('name', flat=True)), ['Fever', 'Headache'])
+
+    def test_command_loads_bundled_dataset(self):
+        out = StringIO()
+        call_command('load_medical_data', stdout=out)
+        self.assertEqual(Disease.objects.count(), 12)
+        self.assertIn('Diseases: 12 created', out.getvalue())
+        call_command('load_medical_data', stdout=out)
+        self.assertEqual(Disease.objects.count(), 12)
+        self.assertIn('0 created, 0 updated, 12 unchanged', out.getvalue())
+
+    def write_csv(self, text):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8', newline='') as f:
+            f.write(text)
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_command_loads_short_csv_rows(self):
+        path = self.write_csv('name,description,precautions,symptoms\nMigraine,Headache.,Rest.,Nausea;Aura\nCold,Sneezing.\n')
+        call_command('load_medical_data', path, stdout=StringIO())
+        cold = Disease.objects.get(name='Cold')
+        self.assertEqual((cold.description, cold.precautions), ('Sneezing.', ''))
+        self.assertFalse(cold.symptoms.exists())
+
+    def test_command_rejects_malformed_csv_rows(self):
+        path = self.write_csv('name,description,precautions,symptoms\nMigraine,Headache.,Rest.,Nausea,extra\n')
+        with self.assertRaisesMessage(CommandError, 'line 2'):
+            call_command('load_medical_data', path, stdout=StringIO())
+        self.assertFalse(Disease.objects.exists())
+
+
+class SymptomScoringEngineTest(TestCase):
+
+    def setUp(self):
+        # 1 Fever, 2 Cough, 3 Rash, 4 Headache, 5 Joint pain
+        self.engine = SymptomScoringEngine(
+            [(1, 'Fever'), (2, 'Cough'), (3, 'Rash'), (4, 'Headache'), (5, 'Joint pain')],
+            [(10, 'Cold', '', ''), (20, 'Dengue', '', ''), (30, 'Flu', '', '')],
+            [(10, 1), (10, 2), (20, 1), (20, 3), (20, 4), (20, 5), (30, 1), (30, 2), (30, 4)],
+        )
+
+    def ranking(self, symptom_ids, method):
+        return [(d['name'], d['symptom_match_count']) for d in self.engine.score(symptom_ids, method=method)]
+
+    def test_overlap_matches_the_old_count_ranking(self):
+        self.assertEqual(self.ranking([1, 4], 'overlap'), [('Dengue', 2), ('Flu', 2), ('Cold', 1)])
+
+    def test_jaccard_penalizes_long_symptom_lists(self):
+        self.assertEqual(self.ranking([1, 4], 'jaccard'), [('Flu', 2), ('Dengue', 2), ('Cold', 1)])
+
+    def test_tfidf_favours_rare_symptoms(self):
+        # Rash only belongs to Dengue, Fever belongs to everything.
+        self.assertEqual(self.ranking([1, 3], 'tfidf')[0], ('Dengue', 2))
+
+    def test_unknown_symptoms_and_methods(self):
+        self.assertEqual(self.engine.score([999]), [])
+        with self.assertRaises(ValueError):
+            self.engine.score([1], method='magic')
+
+
+class SymptomCheckerViewTest(TestCase):
+
+    def setUp(self):
+        import_medical_data([
+            {'name': 'Migraine', 'description': 'Headache.', 'precautions': 'Rest.', 'symptoms': ['Nausea', 'Headache']},
+            {'name': 'Flu', 'description': 'Virus.', 'precautions': 'Fluids.', 'symptoms': ['Fever', 'Headache', 'Cough', 'Chills']},
+        ])
+
+    def test_ranks_without_database_queries(self):
+        ids = list(Symptom.objects.filter(name__in=['Nausea', 'Headache']).values_list('id', flat=True))
+        self.client.post('/symptoms/', {'symptom_ids': ids})  # warm the engine
+        with self.assertNumQueries(0):
+            response = self.client.post('/symptoms/', {'symptom_ids': ids})
+        results = response.context['results']
+        self.assertEqual([d['name'] for d in results], ['Migraine', 'Flu'])
+        self.assertEqual(results[0]['symptom_match_count'], 2)
+
+    def test_engine_refreshes_after_changes(self):
+        self.client.get('/symptoms/')
+        Disease.objects.create(name='Cold', description='', precautions='').symptoms.add(Symptom.objects.get(name='Cough'))
+        response = self.client.post('/symptoms/', {'symptom_ids': [Symptom.objects.get(name='Cough').id]})
+        self.assertIn('Cold', [d['name'] for d in response.context['results']])
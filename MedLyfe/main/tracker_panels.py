@@ -0,0 +1,135 @@
+from datetime import date
+
+from .downsampling import lttb, min_max_buckets
+from .models import (
+    WeightEntry, BloodPressureEntry, GlucoseEntry, Activity, MealEntry,
+    WeightGoal, BloodPressureGoal, GlucoseGoal,
+)
+
+
+def compute_bmi(height_cm, weight_kg):
+    if not height_cm or weight_kg is None:
+        return None
+    height_meters = float(height_cm) / 100 # Convert cm to meters
+    return round(float(weight_kg) / (height_meters ** 2), 2)
+
+
+# Chart series are limited to a date window and downsampled to at most
+# `points` entries, so a panel's payload stays bounded however long the
+# patient's history is. Each panel costs a fixed number of queries (entries
+# + active goal) and is serialized straight from values_list rows, oldest
+# first. The history list is paged RECENT_ENTRIES at a time with `offset`.
+DEFAULT_CHART_POINTS = 300
+RECENT_ENTRIES = 20
+
+
+def _window(queryset, start, end):
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    return queryset
+
+
+def _series(entries, points, downsample, offset=0):
+    """
+    Returns the panel body for a list of entry dicts: the downsampled chart
+    series, one page of raw entries (newest first, skipping the `offset`
+    newest) for the history list, the offset of the next page (None on the
+    last page) and the number of entries in the window.
+    """
+    points = points or DEFAULT_CHART_POINTS
+    newest_first = entries[::-1]
+    next_offset = offset + RECENT_ENTRIES
+    return {
+        'entries': downsample(entries, points) if len(entries) > points else entries,
+        'recent': newest_first[offset:next_offset],
+        'next_offset': next_offset if next_offset < len(entries) else None,
+        'total': len(entries),
+    }
+
+
+def _line(field):
+    # LTTB over (day, field) keeps the shape of vital-sign trends.
+    return lambda entries, points: lttb(entries, points, x=_ordinal, y=lambda e: e[field])
+
+
+def _bars(field):
+    # Min/max bucketing keeps the spikes bar charts are read for.
+    return lambda entries, points: min_max_buckets(entries, points, y=lambda e: e[field] or 0)
+
+
+def _ordinal(entry):
+    return date.fromisoformat(entry['date']).toordinal()
+
+
+def weight_panel(user, start=None, end=None, points=None, offset=0):
+    # BMI is rendered with the page (health_tracker_view) from the latest
+    # weight overall, so it is not repeated here.
+    rows = _window(WeightEntry.objects.filter(user=user), start, end).order_by('date', 'id').values_list('id', 'date', 'weight')
+    entries = [{'id': pk, 'date': day.isoformat(), 'weight': float(weight)} for pk, day, weight in rows]
+    goal = WeightGoal.objects.filter(user=user, is_active=True).values_list('target_weight', 'set_date').first()
+    return dict(
+        _series(entries, points, _line('weight'), offset),
+        goal={'target_weight': float(goal[0]), 'set_date': goal[1].isoformat()} if goal else None,
+    )
+
+
+def blood_pressure_panel(user, start=None, end=None, points=None, offset=0):
+    rows = _window(BloodPressureEntry.objects.filter(user=user), start, end).order_by('date', 'id').values_list(
+        'id', 'date', 'systolic', 'diastolic'
+    )
+    goal = BloodPressureGoal.objects.filter(user=user, is_active=True).values_list(
+        'target_systolic', 'target_diastolic', 'set_date'
+    ).first()
+    entries = [
+        {'id': pk, 'date': day.isoformat(), 'systolic': systolic, 'diastolic': diastolic}
+        for pk, day, systolic, diastolic in rows
+    ]
+    # Systolic drives the selection; diastolic readings stay paired with it.
+    return dict(
+        _series(entries, points, _line('systolic'), offset),
+        goal={'target_systolic': goal[0], 'target_diastolic': goal[1], 'set_date': goal[2].isoformat()} if goal else None,
+    )
+
+
+def glucose_panel(user, start=None, end=None, points=None, offset=0):
+    rows = _window(GlucoseEntry.objects.filter(user=user), start, end).order_by('date', 'id').values_list('id', 'date', 'glucose_level')
+    goal = GlucoseGoal.objects.filter(user=user, is_active=True).values_list('target_glucose_level', 'set_date').first()
+    entries = [{'id': pk, 'date': day.isoformat(), 'glucose_level': float(level)} for pk, day, level in rows]
+    return dict(
+        _series(entries, points, _line('glucose_level'), offset),
+        goal={'target_glucose_level': float(goal[0]), 'set_date': goal[1].isoformat()} if goal else None,
+    )
+
+
+def activity_panel(user, start=None, end=None, points=None, offset=0):
+    rows = _window(Activity.objects.filter(user=user), start, end).order_by('date', 'id').values_list(
+        'id', 'date', 'activity_type', 'duration_minutes', 'calories_burned'
+    )
+    entries = [
+        {'id': pk, 'date': day.isoformat(), 'activity_type': activity_type,
+         'duration_minutes': duration, 'calories_burned': calories}
+        for pk, day, activity_type, duration, calories in rows
+    ]
+    return _series(entries, points, _bars('duration_minutes'), offset)
+
+
+def meal_panel(user, start=None, end=None, points=None, offset=0):
+    rows = _window(MealEntry.objects.filter(user=user), start, end).order_by('date', 'id').values_list(
+        'id', 'date', 'meal_type', 'food_items', 'calories'
+    )
+    entries = [
+        {'id': pk, 'date': day.isoformat(), 'meal_type': meal_type, 'food_items': food_items, 'calories': calories}
+        for pk, day, meal_type, food_items, calories in rows
+    ]
+    return _series(entries, points, _bars('calories'), offset)
+
+
+TRACKER_PANELS = {
+    'weight': weight_panel,
+    'blood_pressure': blood_pressure_panel,
+    'glucose': glucose_panel,
+    'activity': activity_panel,
+    'meals': meal_panel,
+}
@@ -4,12 +4,16 @@ from . import views
 urlpatterns = [
     path('', views.index_view, name='index'),
     path('medicines/', views.substitute_view, name='medicines'),
+    path('medicines/autocomplete/', views.medicine_autocomplete_view, name='medicine_autocomplete'),
     path('fundraise/', views.fundraise_view, name='fundraise'),
     path('diagnose/', views.diagnose_view, name='diagnose'),
     path('tracker/', views.health_tracker_view, name='health_tracker'),
+    path('tracker/api/<str:panel>/', views.tracker_panel_view, name='tracker_panel'),
+    path('tracker/api/rollups/<str:metric>/', views.tracker_rollup_view, name='tracker_rollups'),
     path('schemes/', views.government_scheme_view, name='schemes'),
     path('appointment/', views.appointment_list, name='appointment_list'), # New appointment list view
     path('appointments/create/', views.create_appointment, name='create_appointment'),
+    path('appointments/availability/<int:doctor_id>/', views.doctor_availability_view, name='doctor_availability'),
     path('appointments/<int:pk>/', views.appointment_detail, name='appointment_detail'),
     path('appointments/<int:pk>/update_status/', views.update_appointment_status, name='update_appointment_status'),
     path('appointments/<int:pk>/cancel/', views.cancel_appointment, name='cancel_appointment'),
@@ -22,10 +26,15 @@ urlpatterns = [
     path('call/', views.create_room_view, name='create_room'),
     path('call/<uuid:room_id>/', views.call_view, name='call_page'),
     path('signaling/<uuid:room_id>/', views.signaling_view, name='signaling'),
+    path('signaling/<uuid:room_id>/stream/', views.signaling_stream_view, name='signaling_stream'),
     path('consultation/', views.consultation_view, name='consultation'),
     path('symptoms/', views.symptom_checker_view, name='symptom_checker'),
     path('prescription/create/', views.create_prescription_view, name='create_prescription'),
+    path('prescription/adherence/', views.adherence_report_view, name='adherence_report'),
+    path('prescription/templates/', views.prescription_templates_view, name='prescription_templates'),
+    path('prescription/bulk/', views.bulk_prescribe_view, name='bulk_prescribe'),
     path('tracker/update_dosage/', views.update_dosage_log_view, name='update_dosage_log'),
+    path('tracker/update_dosage/batch/', views.update_dosage_logs_view, name='update_dosage_logs'),
 
     path('health_tracker/add_weight/', views.add_weight, name='add_weight'),
     path('health_tracker/delete_weight/<int:pk>/', views.delete_weight, name='delete_weight'),
@@ -42,4 +51,6 @@ urlpatterns = [
     path('health_tracker/delete_meal/<int:pk>/', views.delete_meal, name='delete_meal'),
     path('health_tracker/update_height/', views.update_height, name='update_height'),
     path('health_tracker/export_csv/', views.export_health_data_csv, name='export_health_data_csv'),
+    path('health_tracker/api/ingest/', views.ingest_readings_view, name='ingest_readings'),
+    path('health_tracker/export/<str:table>/', views.export_health_table, name='export_health_table'),
 ]
@@ -2,16 +2,60 @@ from django.shortcuts import render, redirect
 from .models import Medicine
 from django.http import JsonResponse
 import json
-from .models import Room, Message
+from .models import Room
 import uuid
+import asyncio
+from functools import wraps
 from datetime import date, timedelta # Added for date calculations
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.conf import settings
+from django.views.decorators.cache import cache_control, cache_page
+from django.views.decorators.http import conditional_page
+from django.views.decorators.vary import vary_on_cookie
+from asgiref.sync import sync_to_async
+from .search import get_search_index, invalidate_search_index
+from .equivalents import find_equivalents
+from .signaling import broker, format_sse, parse_cursor, post_message, drain_messages, acknowledge_messages, DRAIN_BATCH_SIZE
+
+SIGNALING_KEEPALIVE_SECONDS = 15
+
+# Medicines listed on the substitute finder page before a search is made.
+MEDICINE_BROWSE_LIMIT = 200
+
+PAGE_CACHE_SECONDS = getattr(settings, 'PAGE_CACHE_SECONDS', 600)
+
+# Appointments shown per page of the appointment list.
+APPOINTMENT_PAGE_SIZE = 20
+
+def cached_page(view):
+    """
+    Full-page caching of the informational pages for anonymous visitors.
+    Logged-in users see their name and menu in the navbar, so their pages are
+    rendered on every request and marked private, keeping them out of the
+    shared page cache and out of any proxy. Both carry an ETag, and a matching
+    If-None-Match gets a 304 (for anonymous visitors without the template
+    being rendered).
+    """
+    anonymous_view = conditional_page(cache_page(PAGE_CACHE_SECONDS)(vary_on_cookie(view)))
+    user_view = conditional_page(cache_control(private=True, no_cache=True)(vary_on_cookie(view)))
 
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.user.is_anonymous:
+            return anonymous_view(request, *args, **kwargs)
+        return user_view(request, *args, **kwargs)
+    return wrapper
+
+@cached_page
 def index_view(request):
     return render(request, 'index.html')
 
 def virtual_view(request):
     return render(request, 'virtual1.html')
 
+@cached_page
 def fundraise_view(request):
     return render(request, 'fundraise.html')
 
@@ -20,6 +64,7 @@ def fundraise_view(request):
 def diagnose_view(request):
     return render(request, 'symptom_checker.html')
 
+@cached_page
 def government_scheme_view(request):
     return render(request, 'schemes.html')
 
@@ -29,16 +74,20 @@ def contact_view(request):
 def login_view(request):
     return render(request, 'login.html')
 
+@cached_page
 def eih_view(request):
     return render(request, 'eih.html')
 
 # New views for footer links
+@cached_page
 def about_us_view(request):
     return render(request, 'about.html')
 
+@cached_page
 def privacy_policy_view(request):
     return render(request, 'privacy.html')
 
+@cached_page
 def terms_of_service_view(request):
     return render(request, 'terms.html')
 
@@ -50,117 +99,178 @@ def signaling_view(request, room_id):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            room = Room.objects.get(id=room_id)
             sender_session_id = request.session.session_key
             if not sender_session_id:
                 request.session.save()
                 sender_session_id = request.session.session_key
 
-            Message.objects.create(
-                room=room,
-                sender_session_id=sender_session_id,
-                message=json.dumps(data)
-            )
+            message = post_message(room_id, sender_session_id, data)
+            # Wake up any open signaling streams for this room.
+            broker.publish(room_id, {'id': message.id, 'sender': sender_session_id, 'data': data})
             return JsonResponse({'status': 'ok'})
         except (Room.DoesNotExist, json.JSONDecodeError):
             return JsonResponse({'status': 'error'}, status=400)
 
     elif request.method == 'GET':
-        try:
-            room = Room.objects.get(id=room_id)
-            sender_session_id = request.session.session_key
-            messages = room.messages.exclude(sender_session_id=sender_session_id).order_by('created_at')
-            
-            message_list = []
-            for msg in messages:
-                try:
-                    message_content = json.loads(msg.message)
-                    message_list.append(message_content)
-                except json.JSONDecodeError:
-                    message_list.append(msg.message)
+        # The client passes the id of the last message it received; everything
+        # up to it is acknowledged and only newer messages are returned.
+        cursor = parse_cursor(request.GET.get('after'))
+        batch = drain_messages(room_id, request.session.session_key, cursor)
+        if batch:
+            cursor = batch[-1][0]
+        return JsonResponse({
+            'messages': [{'id': message_id, 'data': data} for message_id, data in batch],
+            'cursor': cursor,
+        })
+
+async def signaling_stream_view(request, room_id):
+    """
+    Server-Sent Events stream of signaling messages for one room.
+
+    The stream wakes the moment the other peer's post to signaling_view is
+    published to the in-process broker and then drains the new messages, so
+    an idle call room costs no database queries. Only served under ASGI; WSGI
+    clients keep polling.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'status': 'error', 'message': 'Streaming requires the ASGI application.'}, status=501)
+    if not await Room.objects.filter(id=room_id).aexists():
+        return JsonResponse({'status': 'error', 'message': 'Room not found.'}, status=404)
+
+    session_id = request.session.session_key
 
-            messages.delete()
+    # EventSource resends the id of the last event it saw when it reconnects.
+    start_cursor = parse_cursor(request.headers.get('Last-Event-ID'))
 
-            return JsonResponse(message_list, safe=False)
-        except Room.DoesNotExist:
-            return JsonResponse([], safe=False)
+    async def event_stream():
+        # Subscribe before draining the backlog so nothing posted in between is missed.
+        queue = broker.subscribe(room_id)
+        cursor = start_cursor
+        try:
+            while True:
+                while True:
+                    batch = await sync_to_async(drain_messages)(room_id, session_id, cursor)
+                    for message_id, data in batch:
+                        yield format_sse(data, message_id)
+                        cursor = message_id
+                    if len(batch) < DRAIN_BATCH_SIZE:
+                        break
+                await sync_to_async(acknowledge_messages)(room_id, session_id, cursor)
+
+                # Sleep until the other peer posts. Events are only a wake-up:
+                # posts served by different threads can be published out of
+                # id order, so the messages themselves are read back from the
+                # database, where post_message keeps each room in id order.
+                while True:
+                    try:
+                        events = [await asyncio.wait_for(queue.get(), timeout=SIGNALING_KEEPALIVE_SECONDS)]
+                    except asyncio.TimeoutError:
+                        yield ': keepalive\n\n'
+                        continue
+                    while not queue.empty():
+                        events.append(queue.get_nowait())
+                    if any(event['sender'] != session_id and event['id'] > cursor for event in events):
+                        break
+        finally:
+            broker.unsubscribe(room_id, queue)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 def call_view(request, room_id):
+    # Make sure the session (and its cookie) exists before the page opens the
+    # signaling stream, so both transports agree on who the sender is.
+    request.session['call_room_id'] = str(room_id)
+    Room.objects.filter(id=room_id).update(last_activity=timezone.now())
     context = {
         'room_id': room_id
     }
     return render(request, 'call.html', context)
 
+@cached_page
 def consultation_view(request):
     return render(request, 'consultation.html')
 
 def substitute_view(request):
     """This is the view for your substitute medicine page."""
     context = {}
-    all_medicines = Medicine.objects.all().order_by('name') # Fetch all medicines, ordered alphabetically
+    index = get_search_index()
 
     if request.method == 'POST':
         search_query = request.POST.get('medicine_name', '').lower()
         context['search_query'] = search_query
 
         if search_query:
-            try:
-                medicine = Medicine.objects.get(search_tag=search_query)
+            # Exact search_tag first, then the best prefix/typo-tolerant match.
+            match = index.get_by_search_tag(search_query)
+            if match is None:
+                hits = index.search(search_query, limit=1)
+                match = hits[0] if hits else None
+
+            medicine = None
+            if match is not None:
+                medicine = Medicine.objects.filter(pk=match['medicine_id']).first()
+                if medicine is None:
+                    # Deleted by another process since the index was built.
+                    invalidate_search_index()
+
+            if medicine is not None:
                 context['results'] = {
                     'original': medicine,
-                    'substitutes': medicine.substitutes.all()
+                    'substitutes': find_equivalents(medicine)
                 }
-            except Medicine.DoesNotExist:
+                if medicine.search_tag != search_query:
+                    context['matched_name'] = medicine.name
+            else:
                 context['error'] = f"Sorry, '{search_query}' not found in our database."
         else:
             context['error'] = "Please enter a medicine name to search."
             
-    context['all_medicines'] = all_medicines # Always include all medicines in context
+    # Served from the in-memory index, so listing costs no query.
+    context['all_medicines'] = index.medicines(limit=MEDICINE_BROWSE_LIMIT)
     return render(request, 'substitute1.html', context)
 
-# (Your other imports like 'render' and 'Medicine' are already here)
-from .models import Symptom, Disease  # <-- ADD Symptom & Disease to your imports
-from django.db.models import Count     # <-- ADD this new import
-
-#
-# (Your index_view, call_page_view, and substitute_view functions are here)
-#
+def medicine_autocomplete_view(request):
+    """JSON typeahead over medicine and substitute names and compositions."""
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    results = get_search_index().search(query, limit=limit)
+    return JsonResponse({'query': query, 'results': results})
 
-# --- ADD THIS NEW FUNCTION AT THE BOTTOM ---
+from .symptom_scoring import get_scoring_engine, SCORING_METHODS, DEFAULT_SCORING_METHOD
 
 def symptom_checker_view(request):
     """
     This is the view for your AI Symptom Checker.
     """
     
-    # First, get all symptoms from the database to display on the page
-    all_symptoms = Symptom.objects.all()
+    # Symptoms and diseases are served from the in-memory scoring engine,
+    # so neither listing nor ranking touches the database.
+    engine = get_scoring_engine()
     
     context = {
-        'all_symptoms': all_symptoms,
+        'all_symptoms': engine.symptoms,
         'results': None
     }
 
     if request.method == 'POST':
         # Get the list of symptom IDs that the user checked
-        selected_symptom_ids = request.POST.getlist('symptom_ids')
+        selected_symptom_ids = [int(id) for id in request.POST.getlist('symptom_ids') if id.isdigit()]
         
         if selected_symptom_ids:
-            # Convert IDs from strings to integers
-            selected_symptom_ids = [int(id) for id in selected_symptom_ids]
-            
-            # This is the core logic:
-            # 1. Find diseases that have at least one of the selected symptoms.
-            # 2. Group them by the disease.
-            # 3. Count how many of the selected symptoms each disease has.
-            # 4. Order them so the best match (highest count) is first.
-            matching_diseases = Disease.objects.filter(
-                symptoms__id__in=selected_symptom_ids
-            ).annotate(
-                symptom_match_count=Count('id')
-            ).order_by('-symptom_match_count')
-
-            context['results'] = matching_diseases
+            method = request.POST.get('method', DEFAULT_SCORING_METHOD)
+            if method not in SCORING_METHODS:
+                method = DEFAULT_SCORING_METHOD
+
+            # Rank every disease sharing at least one selected symptom; the
+            # default Jaccard score also accounts for how many symptoms each
+            # disease has, not just the raw overlap.
+            context['results'] = engine.score(selected_symptom_ids, method=method)
             
             # This will help us re-check the boxes after the search
             context['selected_ids'] = selected_symptom_ids
@@ -172,17 +282,43 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from users.models import Profile
 from .forms import PrescriptionForm, PrescribedMedicineForm, AppointmentForm
-from .models import Prescription, PrescribedMedicine, DosageLog, WeightEntry, BloodPressureEntry, GlucoseEntry, WeightGoal, BloodPressureGoal, GlucoseGoal, Activity, MealEntry, Appointment # MealEntry added
+from .models import Prescription, PrescribedMedicine, DosageLog, WeightEntry, BloodPressureEntry, GlucoseEntry, WeightGoal, BloodPressureGoal, GlucoseGoal, Activity, MealEntry, Appointment, PrescriptionTemplate # MealEntry added
 from django.db import transaction
 from django.forms import inlineformset_factory
 from functools import wraps
+from .adherence import build_adherence_calendar, adherence_report
+from .adherence import parse_dosage_toggles, apply_dosage_toggles, DosageToggleError, DOSAGE_BATCH_MAX
+from .bulk_prescribe import save_template, template_regimen, bulk_prescribe, RegimenError, BULK_PRESCRIBE_MAX_PATIENTS
+from .tracker_panels import TRACKER_PANELS, compute_bmi
+from .availability import AvailabilityIndex, MAX_AVAILABILITY_DAYS
+from .keyset import keyset_page
+from .booking import book_appointment, doctor_day_lock, SlotUnavailable
+from .bulk_ingest import parse_readings, ingest_readings, INGEST_MAX_ROWS
+import csv
+from .rollups import ROLLUP_METRICS, ROLLUP_PERIODS, record_entry, refresh_rollups, rollup_series
+from django.http import HttpResponse
+from .health_export import iter_health_rows, iter_csv_lines, iter_encoded, iter_gzip, aiter_chunks
+from .columnar_export import EXPORT_TABLES, EXPORT_FORMATS, iter_ndjson, write_columnar
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse
+import tempfile
+
+# Bounds for the ?points= chart downsampling parameter of the tracker panels.
+MIN_CHART_POINTS = 10
+MAX_CHART_POINTS = 2000
+# Bounds for the ?days= chart window of the tracker panels.
+MIN_WINDOW_DAYS = 1
+MAX_WINDOW_DAYS = 3660
+# Per-user Parquet/Arrow exports larger than this are spooled to disk.
+EXPORT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
 
 def doctor_required(function):
     @wraps(function)
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('users:login') # Redirect to login if not authenticated
-        if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'doctor':
+        # request.profile comes from ProfileMiddleware; no extra query.
+        if not request.profile or request.profile.user_type != 'doctor':
             # You might want to render a 403 page or redirect to a more appropriate place
             return redirect('index') # Redirect to home if not a doctor
         return function(request, *args, **kwargs)
@@ -193,7 +329,7 @@ def patient_required(function):
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('users:login') # Redirect to login if not authenticated
-        if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'user':
+        if not request.profile or request.profile.user_type != 'user':
             return redirect('index') # Redirect to home if not a patient
         return function(request, *args, **kwargs)
     return wrapper
@@ -233,121 +369,176 @@ def create_prescription_view(request):
     return render(request, 'create_prescription.html', context)
 
 
+# Longest window the adherence report accepts, in days.
+MAX_ADHERENCE_DAYS = 366
+
+@login_required
+@doctor_required
+def adherence_report_view(request):
+    """
+    Adherence of the doctor's patients per prescribed medicine as JSON:
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD (default: the last 30 days), ?patient=<id>.
+    """
+    try:
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else end - timedelta(days=29)
+        patient = int(request.GET['patient']) if request.GET.get('patient') else None
+    except (ValueError, OverflowError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid date or patient.'}, status=400)
+    if end < start or (end - start).days >= MAX_ADHERENCE_DAYS:
+        return JsonResponse({'status': 'error', 'message': f'The range must cover 1 to {MAX_ADHERENCE_DAYS} days.'}, status=400)
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'medicines': adherence_report(request.user, start, end, patient=patient),
+    })
+
+
+@login_required
+@doctor_required
+def prescription_templates_view(request):
+    """
+    GET: the doctor's prescription templates.
+    POST: creates or replaces one, {'name', 'advice', 'medicines': [{'name', 'dosage', 'duration_weeks'}, ...]}.
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            name = str(data.get('name') or '').strip() if isinstance(data, dict) else ''
+            if not name:
+                return JsonResponse({'status': 'error', 'message': 'A template needs a name.'}, status=400)
+            template = save_template(request.user, name[:255], data.get('medicines'), advice=str(data.get('advice') or ''))
+        except json.JSONDecodeError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid JSON.'}, status=400)
+        except RegimenError as e:
+            return JsonResponse({'status': 'error', 'message': str(e), 'errors': e.errors}, status=400)
+        return JsonResponse({'status': 'success', 'id': template.id}, status=201)
+    if request.method != 'GET':
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
+
+    templates = PrescriptionTemplate.objects.filter(doctor=request.user).prefetch_related('medicines').order_by('name')
+    return JsonResponse({'templates': [
+        {
+            'id': template.id,
+            'name': template.name,
+            'advice': template.advice,
+            'medicines': [
+                {'name': medicine.name, 'dosage': medicine.dosage, 'duration_weeks': medicine.duration_weeks}
+                for medicine in template.medicines.all()
+            ],
+        }
+        for template in templates
+    ]})
+
+
+@login_required
+@doctor_required
+def bulk_prescribe_view(request):
+    """
+    Issues one regimen to many patients in one transaction:
+    {'patients': [ids], 'template': <id>} or {'patients': [ids], 'medicines': [...], 'advice': ...}.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid JSON.'}, status=400)
+    if not isinstance(data, dict) or not isinstance(data.get('patients'), list):
+        return JsonResponse({'status': 'error', 'message': 'Expected a list of patients.'}, status=400)
+    if len(data['patients']) > BULK_PRESCRIBE_MAX_PATIENTS:
+        return JsonResponse({'status': 'error', 'message': f'At most {BULK_PRESCRIBE_MAX_PATIENTS} patients per request.'}, status=413)
+
+    if data.get('template') is not None:
+        try:
+            template = PrescriptionTemplate.objects.get(pk=int(data['template']), doctor=request.user)
+        except (TypeError, ValueError, PrescriptionTemplate.DoesNotExist):
+            return JsonResponse({'status': 'error', 'message': 'Template not found.'}, status=404)
+        medicines, advice = template_regimen(template), data.get('advice', template.advice)
+    else:
+        medicines, advice = data.get('medicines'), data.get('advice', '')
+
+    try:
+        prescriptions = bulk_prescribe(request.user, data['patients'], medicines, advice=str(advice or ''))
+    except RegimenError as e:
+        return JsonResponse({'status': 'error', 'message': str(e), 'errors': e.errors}, status=400)
+    return JsonResponse({
+        'status': 'success',
+        'prescriptions': [{'patient': p.patient_id, 'id': str(p.id)} for p in prescriptions],
+    }, status=201)
+
+
 @login_required
 @patient_required
 def health_tracker_view(request):
-    patient_prescriptions = Prescription.objects.filter(patient=request.user).order_by('-date_prescribed')
-    
-    prescriptions_data = []
-    for prescription in patient_prescriptions:
-        medicines_data = []
-        for medicine in prescription.medicines.all(): # .medicines is the related_name from PrescribedMedicine
-            
-            # Calculate the duration of the dosage
-            start_date = prescription.date_prescribed.date()
-            end_date = start_date + timedelta(weeks=medicine.duration_weeks)
-            
-            # Generate dates for the tracking period
-            dates_in_period = []
-            current_date = start_date
-            while current_date < end_date:
-                # Check if a DosageLog entry exists for this date
-                log_entry, created = DosageLog.objects.get_or_create(
-                    prescribed_medicine=medicine,
-                    patient=request.user,
-                    date=current_date
-                )
-                dates_in_period.append({'date': current_date, 'taken': log_entry.taken})
-                current_date += timedelta(days=1)
-
-            medicines_data.append({
-                'medicine_obj': medicine,
-                'dates_in_period': dates_in_period,
-            })
-        prescriptions_data.append({
-            'prescription_obj': prescription,
-            'medicines': medicines_data,
-        })
-    
-    weight_data = WeightEntry.objects.filter(user=request.user).order_by('date') # Order by date ascending for charts
-    blood_pressure_data = BloodPressureEntry.objects.filter(user=request.user).order_by('date')
-    glucose_data = GlucoseEntry.objects.filter(user=request.user).order_by('date')
-
-    # Prepare data for Chart.js
-    weight_dates = [entry.date.strftime('%Y-%m-%d') for entry in weight_data]
-    weight_values = [float(entry.weight) for entry in weight_data]
-
-    bp_dates = [entry.date.strftime('%Y-%m-%d') for entry in blood_pressure_data]
-    bp_systolic_values = [entry.systolic for entry in blood_pressure_data]
-    bp_diastolic_values = [entry.diastolic for entry in blood_pressure_data]
-
-    glucose_dates = [entry.date.strftime('%Y-%m-%d') for entry in glucose_data]
-    glucose_values = [float(entry.glucose_level) for entry in glucose_data]
-
-    # Fetch active goals
-    active_weight_goal = WeightGoal.objects.filter(user=request.user, is_active=True).first()
-    active_blood_pressure_goal = BloodPressureGoal.objects.filter(user=request.user, is_active=True).first()
-    active_glucose_goal = GlucoseGoal.objects.filter(user=request.user, is_active=True).first()
-
-    # Fetch activity data
-    activity_data = Activity.objects.filter(user=request.user).order_by('date')
-    activity_dates = [entry.date.strftime('%Y-%m-%d') for entry in activity_data]
-    activity_types = [entry.activity_type for entry in activity_data]
-    activity_durations = [entry.duration_minutes for entry in activity_data]
-    activity_calories = [entry.calories_burned if entry.calories_burned else 0 for entry in activity_data]
-
-    # Fetch meal data
-    meal_data = MealEntry.objects.filter(user=request.user).order_by('date')
-    meal_dates = [entry.date.strftime('%Y-%m-%d') for entry in meal_data]
-    meal_calories = [entry.calories if entry.calories else 0 for entry in meal_data]
-
-    # BMI Calculation
-    bmi = None
-    user_height = request.user.profile.height_cm if hasattr(request.user, 'profile') and request.user.profile.height_cm else None
-    
-    if user_height and weight_data:
-        latest_weight = weight_data.last().weight # Assuming weight_data is ordered by date ascending
-        height_meters = float(user_height) / 100 # Convert cm to meters
-        bmi = round(float(latest_weight) / (height_meters ** 2), 2)
-
-    # BMI Calculation
-    bmi = None
-    user_height = request.user.profile.height_cm if hasattr(request.user, 'profile') and request.user.profile.height_cm else None
-    
-    if user_height and weight_data:
-        latest_weight = weight_data.last().weight # Assuming weight_data is ordered by date ascending
-        height_meters = float(user_height) / 100 # Convert cm to meters
-        bmi = round(float(latest_weight) / (height_meters ** 2), 2)
+    # Only the adherence calendar and BMI are rendered here; every other panel
+    # is fetched lazily from tracker_panel_view, so the page costs a fixed
+    # number of queries however much data the patient has.
+    prescriptions_data = build_adherence_calendar(request.user)
+
+    user_height = request.profile.height_cm
+    latest_weight = WeightEntry.objects.filter(user=request.user).order_by('-date').values_list('weight', flat=True).first()
 
     context = {
         'prescriptions_data': prescriptions_data,
-        'weight_data': weight_data,
-        'blood_pressure_data': blood_pressure_data,
-        'glucose_data': glucose_data,
-        'weight_chart_data': json.dumps({'dates': weight_dates, 'values': weight_values}),
-        'bp_chart_data': json.dumps({'dates': bp_dates, 'systolic': bp_systolic_values, 'diastolic': bp_diastolic_values}),
-        'glucose_chart_data': json.dumps({'dates': glucose_dates, 'values': glucose_values}),
-        'active_weight_goal': active_weight_goal,
-        'active_blood_pressure_goal': active_blood_pressure_goal,
-        'active_glucose_goal': active_glucose_goal,
-        'activity_data': activity_data,
-        'activity_chart_data': json.dumps({
-            'dates': activity_dates,
-            'types': activity_types,
-            'durations': activity_durations,
-            'calories': activity_calories
-        }),
-        'meal_data': meal_data,
-        'meal_chart_data': json.dumps({
-            'dates': meal_dates,
-            'calories': meal_calories
-        }),
+        'tracker_panels': list(TRACKER_PANELS),
         'user_height': user_height,
-        'bmi': bmi,
+        'bmi': compute_bmi(user_height, latest_weight),
     }
     return render(request, 'tracker.html', context)
 
 
+@login_required
+@patient_required
+def tracker_panel_view(request, panel):
+    """
+    JSON data for one health tracker panel (entries, active goal, ...).
+
+    Optional query parameters:
+      ?start=YYYY-MM-DD&end=YYYY-MM-DD or ?days=N  limit the chart window,
+      ?points=N  maximum chart points after downsampling,
+      ?offset=N  skip the N newest entries of the history list.
+    """
+    build_panel = TRACKER_PANELS.get(panel)
+    if build_panel is None:
+        return JsonResponse({'status': 'error', 'message': 'Unknown panel.'}, status=404)
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+        if request.GET.get('days'):
+            days = min(max(int(request.GET['days']), MIN_WINDOW_DAYS), MAX_WINDOW_DAYS)
+            start = (end or timezone.localdate()) - timedelta(days=days - 1)
+        points = int(request.GET['points']) if request.GET.get('points') else None
+        offset = max(int(request.GET.get('offset') or 0), 0)
+    except (ValueError, OverflowError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid window or points parameter.'}, status=400)
+    if points is not None:
+        points = min(max(points, MIN_CHART_POINTS), MAX_CHART_POINTS)
+    return JsonResponse(build_panel(request.user, start=start, end=end, points=points, offset=offset))
+
+
+@login_required
+@patient_required
+def tracker_rollup_view(request, metric):
+    """
+    Daily/weekly/monthly min, max, mean, count and sum of one metric, read from
+    the materialized rollups: ?period=day|week|month&start=YYYY-MM-DD&end=YYYY-MM-DD
+    """
+    period = request.GET.get('period', 'week')
+    if metric not in ROLLUP_METRICS or period not in ROLLUP_PERIODS:
+        return JsonResponse({'status': 'error', 'message': 'Unknown metric or period.'}, status=404)
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid date.'}, status=400)
+    return JsonResponse({
+        'metric': metric,
+        'period': period,
+        'rollups': rollup_series(request.user, metric, period, start=start, end=end),
+    })
+
+
 @login_required
 @patient_required
 def update_dosage_log_view(request):
@@ -386,6 +577,37 @@ def update_dosage_log_view(request):
     return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
 
 
+@login_required
+@patient_required
+def update_dosage_logs_view(request):
+    """
+    Batch version of update_dosage_log_view used by the tracker page:
+    a JSON list of {'medicine_id', 'date', 'taken'} saved in one transaction.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
+    try:
+        toggles = parse_dosage_toggles(json.loads(request.body))
+    except json.JSONDecodeError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid JSON.'}, status=400)
+    except DosageToggleError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    if len(toggles) > DOSAGE_BATCH_MAX:
+        return JsonResponse({'status': 'error', 'message': f'At most {DOSAGE_BATCH_MAX} toggles per request.'}, status=413)
+    if not toggles:
+        return JsonResponse({'status': 'success', 'updated': 0})
+
+    try:
+        forbidden = apply_dosage_toggles(request.user, toggles)
+    except DosageToggleError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    if forbidden:
+        return JsonResponse({
+            'status': 'error', 'message': 'Unauthorized access to medicine.', 'medicine_ids': forbidden,
+        }, status=403)
+    return JsonResponse({'status': 'success', 'updated': len(toggles)})
+
+
 @login_required
 @patient_required
 def add_weight(request):
@@ -395,7 +617,8 @@ def add_weight(request):
         if weight and date_str:
             try:
                 date_obj = date.fromisoformat(date_str)
-                WeightEntry.objects.create(user=request.user, weight=weight, date=date_obj)
+                with transaction.atomic():
+                    record_entry(WeightEntry.objects.create(user=request.user, weight=weight, date=date_obj))
             except ValueError:
                 pass # Handle invalid date format
     return redirect('health_tracker')
@@ -406,7 +629,9 @@ def delete_weight(request, pk):
     if request.method == 'POST':
         try:
             weight_entry = WeightEntry.objects.get(pk=pk, user=request.user)
-            weight_entry.delete()
+            with transaction.atomic():
+                weight_entry.delete()
+                refresh_rollups(request.user, WeightEntry, weight_entry.date)
         except WeightEntry.DoesNotExist:
             pass
     return redirect('health_tracker')
@@ -421,7 +646,8 @@ def add_blood_pressure(request):
         if systolic and diastolic and date_str:
             try:
                 date_obj = date.fromisoformat(date_str)
-                BloodPressureEntry.objects.create(user=request.user, systolic=systolic, diastolic=diastolic, date=date_obj)
+                with transaction.atomic():
+                    record_entry(BloodPressureEntry.objects.create(user=request.user, systolic=systolic, diastolic=diastolic, date=date_obj))
             except ValueError:
                 pass
     return redirect('health_tracker')
@@ -432,7 +658,9 @@ def delete_blood_pressure(request, pk):
     if request.method == 'POST':
         try:
             bp_entry = BloodPressureEntry.objects.get(pk=pk, user=request.user)
-            bp_entry.delete()
+            with transaction.atomic():
+                bp_entry.delete()
+                refresh_rollups(request.user, BloodPressureEntry, bp_entry.date)
         except BloodPressureEntry.DoesNotExist:
             pass
     return redirect('health_tracker')
@@ -446,7 +674,8 @@ def add_glucose(request):
         if glucose_level and date_str:
             try:
                 date_obj = date.fromisoformat(date_str)
-                GlucoseEntry.objects.create(user=request.user, glucose_level=glucose_level, date=date_obj)
+                with transaction.atomic():
+                    record_entry(GlucoseEntry.objects.create(user=request.user, glucose_level=glucose_level, date=date_obj))
             except ValueError:
                 pass
     return redirect('health_tracker')
@@ -457,11 +686,31 @@ def delete_glucose(request, pk):
     if request.method == 'POST':
         try:
             glucose_entry = GlucoseEntry.objects.get(pk=pk, user=request.user)
-            glucose_entry.delete()
+            with transaction.atomic():
+                glucose_entry.delete()
+                refresh_rollups(request.user, GlucoseEntry, glucose_entry.date)
         except GlucoseEntry.DoesNotExist:
             pass
     return redirect('health_tracker')
 
+@login_required
+@patient_required
+def ingest_readings_view(request):
+    """
+    Bulk upload of mixed readings (e.g. a glucometer or fitness band sync) as a
+    JSON list or CSV body; see main/bulk_ingest.py for the format. Responds
+    with per-row results.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
+    try:
+        readings = parse_readings(request.body, request.content_type or '')
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return JsonResponse({'status': 'error', 'message': f'Could not parse readings: {e}'}, status=400)
+    if len(readings) > INGEST_MAX_ROWS:
+        return JsonResponse({'status': 'error', 'message': f'At most {INGEST_MAX_ROWS} readings per request.'}, status=413)
+    return JsonResponse(dict(ingest_readings(request.user, readings), status='success'))
+
 @login_required
 @patient_required
 def set_weight_goal(request):
@@ -512,13 +761,15 @@ def add_activity(request):
         if activity_type and duration_minutes and date_str:
             try:
                 date_obj = date.fromisoformat(date_str)
-                Activity.objects.create(
-                    user=request.user,
-                    activity_type=activity_type,
-                    duration_minutes=duration_minutes,
-                    calories_burned=calories_burned if calories_burned else None,
-                    date=date_obj
-                )
+                with transaction.atomic():
+                    entry = Activity.objects.create(
+                        user=request.user,
+                        activity_type=activity_type,
+                        duration_minutes=duration_minutes,
+                        calories_burned=calories_burned if calories_burned else None,
+                        date=date_obj
+                    )
+                    record_entry(entry)
             except ValueError:
                 pass # Handle invalid date/number format
     return redirect('health_tracker')
@@ -529,7 +780,9 @@ def delete_activity(request, pk):
     if request.method == 'POST':
         try:
             activity_entry = Activity.objects.get(pk=pk, user=request.user)
-            activity_entry.delete()
+            with transaction.atomic():
+                activity_entry.delete()
+                refresh_rollups(request.user, Activity, activity_entry.date)
         except Activity.DoesNotExist:
             pass
     return redirect('health_tracker')
@@ -546,13 +799,15 @@ def add_meal(request):
         if meal_type and food_items and date_str:
             try:
                 date_obj = date.fromisoformat(date_str)
-                MealEntry.objects.create(
-                    user=request.user,
-                    meal_type=meal_type,
-                    food_items=food_items,
-                    calories=calories if calories else None,
-                    date=date_obj
-                )
+                with transaction.atomic():
+                    entry = MealEntry.objects.create(
+                        user=request.user,
+                        meal_type=meal_type,
+                        food_items=food_items,
+                        calories=calories if calories else None,
+                        date=date_obj
+                    )
+                    record_entry(entry)
             except ValueError:
                 pass
     return redirect('health_tracker')
@@ -563,26 +818,58 @@ def delete_meal(request, pk):
     if request.method == 'POST':
         try:
             meal_entry = MealEntry.objects.get(pk=pk, user=request.user)
-            meal_entry.delete()
+            with transaction.atomic():
+                meal_entry.delete()
+                refresh_rollups(request.user, MealEntry, meal_entry.date)
         except MealEntry.DoesNotExist:
             pass
     return redirect('health_tracker')
 
 @login_required
 def appointment_list(request):
-    if hasattr(request.user, 'profile'):
-        if request.user.profile.user_type == 'doctor':
-            appointments = Appointment.objects.filter(doctor=request.user).order_by('-date', '-start_time')
-            template_name = 'doctor_appointments.html' # Create this template
-        else: # user is a patient
-            appointments = Appointment.objects.filter(patient=request.user).order_by('-date', '-start_time')
-            template_name = 'patient_appointments.html' # Create this template
+    # Keyset-paginated, newest first: ?after=<cursor> continues from the last
+    # row of the previous page; ?status= and ?from=/?to= (YYYY-MM-DD) filter.
+    if request.profile and request.profile.user_type == 'doctor':
+        appointments = Appointment.objects.filter(doctor=request.user)
+        template_name = 'doctor_appointments.html'
+    elif request.profile: # user is a patient
+        appointments = Appointment.objects.filter(patient=request.user)
+        template_name = 'patient_appointments.html'
     else:
         appointments = Appointment.objects.none() # No profile, no appointments
         template_name = 'patient_appointments.html' # Default to patient view
 
+    status = request.GET.get('status', '')
+    if status in dict(Appointment.STATUS_CHOICES):
+        appointments = appointments.filter(status=status)
+    else:
+        status = ''
+    try:
+        date_from = date.fromisoformat(request.GET['from']) if request.GET.get('from') else None
+        date_to = date.fromisoformat(request.GET['to']) if request.GET.get('to') else None
+        if date_from:
+            appointments = appointments.filter(date__gte=date_from)
+        if date_to:
+            appointments = appointments.filter(date__lte=date_to)
+        page, next_cursor = keyset_page(
+            appointments.select_related('doctor', 'patient'),
+            cursor=request.GET.get('after'),
+            page_size=APPOINTMENT_PAGE_SIZE,
+        )
+    except ValueError:
+        return redirect('appointment_list')
+
+    filters = request.GET.copy()
+    filters.pop('after', None)
     context = {
-        'appointments': appointments
+        'appointments': page,
+        'next_cursor': next_cursor,
+        'filters': filters.urlencode(),
+        'status_filter': status,
+        'status_choices': Appointment.STATUS_CHOICES,
+        'date_from': date_from,
+        'date_to': date_to,
+        'is_first_page': not request.GET.get('after'),
     }
     return render(request, template_name, context)
 
@@ -592,10 +879,21 @@ def create_appointment(request):
     if request.method == 'POST':
         form = AppointmentForm(request.POST)
         if form.is_valid():
-            appointment = form.save(commit=False)
-            appointment.patient = request.user
-            appointment.save()
-            return redirect('appointment_list') # Redirect to appointment list
+            # The form's overlap check is advisory; the booking itself re-checks
+            # under the doctor-day lock, so a concurrent request can't slip in.
+            try:
+                book_appointment(
+                    patient=request.user,
+                    doctor=form.cleaned_data['doctor'],
+                    day=form.cleaned_data['date'],
+                    start_time=form.cleaned_data['start_time'],
+                    end_time=form.cleaned_data['end_time'],
+                    reason=form.cleaned_data['reason'],
+                )
+                return redirect('appointment_list') # Redirect to appointment list
+            except SlotUnavailable:
+                form.add_error(None, "Sorry, this time was just booked by someone else. Please choose another slot.")
+                return render(request, 'create_appointment.html', {'form': form}, status=409)
     else:
         form = AppointmentForm()
     
@@ -604,6 +902,36 @@ def create_appointment(request):
     }
     return render(request, 'create_appointment.html', context) # Create this template
 
+@login_required
+def doctor_availability_view(request, doctor_id):
+    """
+    Free appointment slots of one doctor as JSON:
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD (default: the next 7 days), ?slot=<minutes>.
+    """
+    doctor = get_object_or_404(User, pk=doctor_id, profile__user_type='doctor')
+    try:
+        first_day = date.fromisoformat(request.GET['start']) if request.GET.get('start') else timezone.localdate()
+        last_day = date.fromisoformat(request.GET['end']) if request.GET.get('end') else first_day + timedelta(days=6)
+        slot_minutes = int(request.GET['slot']) if request.GET.get('slot') else None
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid date or slot length.'}, status=400)
+    if last_day < first_day or (last_day - first_day).days >= MAX_AVAILABILITY_DAYS:
+        return JsonResponse({'status': 'error', 'message': f'The range must cover 1 to {MAX_AVAILABILITY_DAYS} days.'}, status=400)
+    if slot_minutes is not None and not 5 <= slot_minutes <= 240:
+        return JsonResponse({'status': 'error', 'message': 'Slot length must be between 5 and 240 minutes.'}, status=400)
+
+    free = AvailabilityIndex(doctor, first_day, last_day).free_slots(slot_minutes)
+    return JsonResponse({
+        'doctor': doctor.id,
+        'days': [
+            {
+                'date': day.isoformat(),
+                'slots': [{'start': start.strftime('%H:%M'), 'end': end.strftime('%H:%M')} for start, end in slots],
+            }
+            for day, slots in free.items()
+        ],
+    })
+
 @login_required
 def appointment_detail(request, pk):
     appointment = get_object_or_404(Appointment, pk=pk)
@@ -626,8 +954,26 @@ def update_appointment_status(request, pk):
     if request.method == 'POST':
         new_status = request.POST.get('status')
         if new_status in [choice[0] for choice in Appointment.STATUS_CHOICES]:
-            appointment.status = new_status
-            appointment.save()
+            if appointment.status == 'Cancelled' and new_status != 'Cancelled':
+                # Reviving a cancelled appointment takes its slot back, so it
+                # goes through the same lock and overlap check as a booking.
+                try:
+                    with doctor_day_lock(appointment.doctor, appointment.date):
+                        schedule = AvailabilityIndex(appointment.doctor, appointment.date, appointment.date, exclude_pk=appointment.pk)
+                        if schedule.conflicts(appointment.date, appointment.start_time, appointment.end_time):
+                            raise SlotUnavailable()
+                        appointment.status = new_status
+                        appointment.save()
+                except SlotUnavailable:
+                    appointment.status = 'Cancelled'
+                    context = {
+                        'appointment': appointment,
+                        'error': "This time has been booked by another appointment since it was cancelled, so it cannot be reinstated.",
+                    }
+                    return render(request, 'appointment_detail.html', context, status=409)
+            else:
+                appointment.status = new_status
+                appointment.save()
             # Add message framework for feedback if needed
     return redirect('appointment_detail', pk=pk)
 
@@ -648,46 +994,63 @@ def cancel_appointment(request, pk):
             # Add message framework for feedback if needed
     return redirect('appointment_list')
 
-from django.http import HttpResponse
-import csv
 from django.shortcuts import get_object_or_404 # Added for appointment_detail view
 
+def _stream(request, chunks):
+    # Under ASGI a sync iterator would be buffered whole before sending, so
+    # exports are handed over as an async iterator there.
+    return aiter_chunks(chunks) if isinstance(request, ASGIRequest) else chunks
+
 @login_required
 @patient_required
 def export_health_data_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="health_data.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Data Type', 'Date', 'Value1', 'Value2', 'Value3', 'Description']) # Header row
-
-    # Weight Data
-    weight_data = WeightEntry.objects.filter(user=request.user).order_by('date')
-    for entry in weight_data:
-        writer.writerow(['Weight', entry.date, entry.weight, '', '', ''])
-
-    # Blood Pressure Data
-    blood_pressure_data = BloodPressureEntry.objects.filter(user=request.user).order_by('date')
-    for entry in blood_pressure_data:
-        writer.writerow(['Blood Pressure', entry.date, entry.systolic, entry.diastolic, '', ''])
-
-    # Glucose Data
-    glucose_data = GlucoseEntry.objects.filter(user=request.user).order_by('date')
-    for entry in glucose_data:
-        writer.writerow(['Glucose', entry.date, entry.glucose_level, '', '', ''])
-    
-    # Activity Data
-    activity_data = Activity.objects.filter(user=request.user).order_by('date')
-    for entry in activity_data:
-        writer.writerow(['Activity', entry.date, entry.duration_minutes, entry.calories_burned if entry.calories_burned else '', entry.activity_type, ''])
-
-    # Meal Data
-    meal_data = MealEntry.objects.filter(user=request.user).order_by('date')
-    for entry in meal_data:
-        writer.writerow(['Meal', entry.date, entry.calories if entry.calories else '', entry.meal_type, entry.food_items, ''])
-        
+    # Streamed: rows are read in chunks from the five tables, merged by date and
+    # sent as they are produced. ?start=/&end= limit the date range and
+    # ?gzip=1 compresses the download.
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return HttpResponse('Invalid date.', status=400, content_type='text/plain')
+
+    chunks = iter_encoded(iter_csv_lines(iter_health_rows(request.user, start=start, end=end)))
+    if request.GET.get('gzip') in ('1', 'true'):
+        response = StreamingHttpResponse(_stream(request, iter_gzip(chunks)), content_type='application/gzip')
+        response['Content-Disposition'] = 'attachment; filename="health_data.csv.gz"'
+    else:
+        response = StreamingHttpResponse(_stream(request, chunks), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="health_data.csv"'
     return response
 
+@login_required
+@patient_required
+def export_health_table(request, table):
+    """
+    Typed export of one of the user's tracker tables (see EXPORT_TABLES):
+    ?format=ndjson (default, streamed), parquet or arrow.
+    """
+    file_format = request.GET.get('format', 'ndjson')
+    if table not in EXPORT_TABLES or file_format not in EXPORT_FORMATS:
+        return JsonResponse({'status': 'error', 'message': 'Unknown table or format.'}, status=404)
+    content_type, extension = EXPORT_FORMATS[file_format]
+    filename = f'{table}.{extension}'
+
+    if file_format == 'ndjson':
+        response = StreamingHttpResponse(_stream(request, iter_ndjson(table, user=request.user)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    # Parquet and Arrow files are assembled in a spooled temporary file, which
+    # stays in memory for typical per-user sizes and spills to disk otherwise.
+    buffer = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    try:
+        write_columnar(table, buffer, file_format, user=request.user)
+    except ImproperlyConfigured as e:
+        buffer.close()
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=501)
+    buffer.seek(0)
+    return FileResponse(buffer, as_attachment=True, filename=filename, content_type=content_type)
+
 @login_required
 @patient_required
 def update_height(request):
@@ -695,9 +1058,11 @@ def update_height(request):
         height_cm = request.POST.get('height_cm')
         if height_cm:
             try:
-                profile = request.user.profile
+                # Saved through the request's profile so this request sees the
+                # new height too; later requests reload it with the user.
+                profile = request.profile
                 profile.height_cm = float(height_cm)
-                profile.save()
-            except (ValueError, Profile.DoesNotExist):
+                profile.save(update_fields=['height_cm'])
+            except (ValueError, AttributeError):
                 pass
     return redirect('health_tracker')
@@ -0,0 +1,73 @@
+// Typeahead for the patient/doctor pickers (main.forms.LookupSelect). The
+// <select> only holds the chosen user; this adds a search box above it that
+// pages through users:user_lookup and puts the picked user into the select.
+document.addEventListener('DOMContentLoaded', function() {
+    const DEBOUNCE_MS = 250;
+
+    document.querySelectorAll('select[data-lookup-url]').forEach(select => {
+        const search = document.createElement('input');
+        search.type = 'search';
+        search.className = 'form-control lookup-search';
+        search.placeholder = 'Type a username to search';
+        search.autocomplete = 'off';
+        const results = document.createElement('ul');
+        results.className = 'lookup-results';
+        select.before(search, results);
+
+        let timer = null;
+        let request = 0;
+
+        function choose(user) {
+            let option = Array.from(select.options).find(o => o.value === String(user.id));
+            if (!option) {
+                option = new Option(user.name ? `${user.username} (${user.name})` : user.username, user.id);
+                select.add(option);
+            }
+            select.value = String(user.id);
+            select.dispatchEvent(new Event('change'));
+            results.innerHTML = '';
+            search.value = '';
+        }
+
+        function load(after) {
+            const params = new URLSearchParams({role: select.dataset.lookupRole, q: search.value.trim()});
+            if (after) {
+                params.set('after', after);
+            } else {
+                results.innerHTML = '';
+            }
+            const current = ++request;
+            fetch(`${select.dataset.lookupUrl}?${params}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (current !== request) {
+                        return; // A newer search has started.
+                    }
+                    results.querySelectorAll('.lookup-more').forEach(more => more.remove());
+                    (data.results || []).forEach(user => {
+                        const item = document.createElement('li');
+                        item.textContent = user.name ? `${user.username} (${user.name})` : user.username;
+                        item.addEventListener('click', () => choose(user));
+                        results.appendChild(item);
+                    });
+                    if (data.next) {
+                        const more = document.createElement('li');
+                        more.className = 'lookup-more';
+                        more.textContent = 'More results...';
+                        more.addEventListener('click', () => load(data.next));
+                        results.appendChild(more);
+                    }
+                })
+                .catch(error => console.error('Error searching users:', error));
+        }
+
+        search.addEventListener('input', () => {
+            clearTimeout(timer);
+            if (!search.value.trim()) {
+                results.innerHTML = '';
+                return;
+            }
+            timer = setTimeout(() => load(null), DEBOUNCE_MS);
+        });
+    });
+});
@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the session user together with its Profile in a
+    single query, so role checks (doctor_required/patient_required), the
+    navigation bar and the health tracker read user.profile without another
+    round trip. The profile is re-read on every request, so saves such as
+    update_height are picked up immediately with nothing to invalidate.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
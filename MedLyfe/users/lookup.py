@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.db.models import Q, Value
+from django.db.models.functions import Concat, Lower
+
+# lookup role -> Profile.user_type
+LOOKUP_ROLES = {
+    'patient': 'user',
+    'doctor': 'doctor',
+}
+
+LOOKUP_PAGE_SIZE = 20
+LOOKUP_MAX_PAGE_SIZE = 50
+# Sorts after every character, closing the prefix range.
+PREFIX_END = '\U0010ffff'
+
+
+def lookup_users(role, query='', after=None, limit=LOOKUP_PAGE_SIZE):
+    """
+    One page of users of a role whose username starts with query, ignoring
+    case, ordered by lowercased username (then username), and the cursor of
+    the next page (None on the last page).
+
+    The prefix match and the keyset cursor are both ranges on LOWER(username)
+    (>= the lowered query and < it followed by the highest code point), which
+    the users_username_lower_idx expression index serves; a LIKE 'query%'
+    could not use an index. Both sides are lowered by the database, so the
+    case folding is whatever its LOWER() does (ASCII only on SQLite).
+    """
+    users = (
+        User.objects.filter(profile__user_type=LOOKUP_ROLES[role])
+        .alias(username_lower=Lower('username'))
+    )
+    if query:
+        prefix = Lower(Value(query))
+        users = users.filter(username_lower__gte=prefix, username_lower__lt=Concat(prefix, Value(PREFIX_END)))
+    if after:
+        after_lower = Lower(Value(after))
+        users = users.filter(
+            Q(username_lower__gt=after_lower) | Q(username_lower=after_lower, username__gt=after),
+            username_lower__gte=after_lower,
+        )
+    rows = list(users.order_by('username_lower', 'username').values('id', 'username', 'first_name', 'last_name')[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]['username']
+    return [
+        {
+            'id': row['id'],
+            'username': row['username'],
+            'name': f"{row['first_name']} {row['last_name']}".strip(),
+        }
+        for row in rows
+    ], next_cursor
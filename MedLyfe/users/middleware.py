@@ -0,0 +1,23 @@
+from django.utils.functional import SimpleLazyObject
+
+
+def get_profile(user):
+    """The user's Profile, or None for anonymous users and users without one."""
+    if not user.is_authenticated:
+        return None
+    return getattr(user, 'profile', None)
+
+
+class ProfileMiddleware:
+    """
+    Sets request.profile (lazily, like request.user) to the logged-in user's
+    Profile, or None. With ProfileModelBackend the profile arrives with the
+    user, so reading it costs no query. Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.profile = SimpleLazyObject(lambda: get_profile(request.user))
+        return self.get_response(request)
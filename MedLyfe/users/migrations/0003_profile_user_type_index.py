@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_profile_height_cm'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['user_type', 'user'], name='users_profile_type_user_idx'),
+        ),
+    ]
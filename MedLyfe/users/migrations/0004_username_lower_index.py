@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Expression index for the case-insensitive username typeahead
+    (users.lookup.lookup_users). auth_user belongs to django.contrib.auth, so
+    the index is created with SQL rather than declared on the model.
+    """
+
+    dependencies = [
+        ('users', '0003_profile_user_type_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX users_username_lower_idx ON auth_user (LOWER(username), username);',
+            reverse_sql='DROP INDEX users_username_lower_idx;',
+        ),
+    ]
@@ -10,5 +10,11 @@ class Profile(models.Model):
     user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES)
     height_cm = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True) # Height in centimeters
 
+    class Meta:
+        indexes = [
+            # Role-filtered user lookups (users/lookup.py) and form validation.
+            models.Index(fields=['user_type', 'user'], name='users_profile_type_user_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user.username} - {self.get_user_type_display()}'
\ No newline at end of file
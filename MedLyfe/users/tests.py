@@ -1,3 +1,129 @@
+from django.contrib.auth import BACKEND_SESSION_KEY, SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Profile
+
+
+class ProfileMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.patient = User.objects.create_user(username='patient', password='testpassword')
+        Profile.objects.create(user=self.patient, user_type='user', height_cm=170)
+        self.doctor = User.objects.create_user(username='doctor', password='testpassword')
+        Profile.objects.create(user=self.doctor, user_type='doctor')
+
+    def test_role_check_costs_no_profile_query(self):
+        self.client.login(username='patient', password='testpassword')
+        # session, user joined with profile, then the panel's own two queries.
+        with self.assertNumQueries(4):
+            response = self.client.get('/tracker/api/glucose/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_roles_are_enforced(self):
+        self.client.login(username='doctor', password='testpassword')
+        response = self.client.get('/tracker/')
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+
+        self.client.login(username='patient', password='testpassword')
+        self.assertEqual(self.client.get('/tracker/').status_code, 200)
+
+    def test_user_without_profile_is_redirected(self):
+        User.objects.create_user(username='bare', password='testpassword')
+        self.client.login(username='bare', password='testpassword')
+        response = self.client.get('/tracker/')
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+
+    def test_height_update_is_seen_on_next_request(self):
+        self.client.login(username='patient', password='testpassword')
+        self.client.post('/health_tracker/update_height/', {'height_cm': '180'})
+        response = self.client.get('/tracker/')
+        self.assertEqual(response.context['user_height'], 180)
+
+    def test_sessions_from_model_backend_still_work(self):
+        self.client.login(username='patient', password='testpassword')
+        session = self.client.session
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session.save()
+        self.assertEqual(session[SESSION_KEY], str(self.patient.pk))
+        self.assertIn(HASH_SESSION_KEY, session)
+        self.assertEqual(self.client.get('/tracker/').status_code, 200)
+
+
+
+class SignUpTest(TestCase):
+
+    def test_user_signup_logs_in_as_patient(self):
+        response = self.client.post('/accounts/signup/user/', {'username': 'newpatient', 'email': 'p@example.com', 'password': 'secret-pass-1'})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        user = User.objects.get(username='newpatient')
+        self.assertEqual(user.profile.user_type, 'user')
+        self.assertEqual(self.client.session[SESSION_KEY], str(user.pk))
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], 'users.backends.ProfileModelBackend')
+        # The session works for patient-only pages.
+        self.assertEqual(self.client.get('/tracker/').status_code, 200)
+
+    def test_doctor_signup_logs_in_as_doctor(self):
+        response = self.client.post('/accounts/signup/doctor/', {'username': 'newdoctor', 'email': 'd@example.com', 'password': 'secret-pass-1'})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertEqual(User.objects.get(username='newdoctor').profile.user_type, 'doctor')
+        self.assertEqual(self.client.get('/prescription/create/').status_code, 200)
+
+class UserLookupTest(TestCase):
+
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='doctor', password='testpassword')
+        Profile.objects.create(user=self.doctor, user_type='doctor')
+        self.patient = User.objects.create_user(username='patient', password='testpassword')
+        Profile.objects.create(user=self.patient, user_type='user')
+        patients = User.objects.bulk_create([User(username=f'anna{i:02d}', first_name='Anna') for i in range(25)])
+        Profile.objects.bulk_create([Profile(user=user, user_type='user') for user in patients])
+
+    def test_prefix_pages_in_username_order(self):
+        self.client.login(username='doctor', password='testpassword')
+        first = self.client.get('/accounts/lookup/', {'role': 'patient', 'q': 'anna', 'limit': 10}).json()
+        self.assertEqual([user['username'] for user in first['results']], [f'anna{i:02d}' for i in range(10)])
+        self.assertEqual(first['results'][0]['name'], 'Anna')
+
+        last = self.client.get('/accounts/lookup/', {'role': 'patient', 'q': 'anna', 'limit': 10, 'after': 'anna19'}).json()
+        self.assertEqual(len(last['results']), 5)
+        self.assertIsNone(last['next'])
+
+    def test_prefix_ignores_case(self):
+        doctors = User.objects.bulk_create([User(username=name) for name in ('John', 'johnny', 'john', 'JOHN2', 'jon')])
+        Profile.objects.bulk_create([Profile(user=user, user_type='doctor') for user in doctors])
+        self.client.login(username='doctor', password='testpassword')
+
+        found = self.client.get('/accounts/lookup/', {'role': 'doctor', 'q': 'john'}).json()
+        self.assertEqual([user['username'] for user in found['results']], ['John', 'john', 'JOHN2', 'johnny'])
+
+        first = self.client.get('/accounts/lookup/', {'role': 'doctor', 'q': 'JOHN', 'limit': 1}).json()
+        self.assertEqual(first['next'], 'John')
+        rest = self.client.get('/accounts/lookup/', {'role': 'doctor', 'q': 'JOHN', 'after': first['next']}).json()
+        self.assertEqual([user['username'] for user in rest['results']], ['john', 'JOHN2', 'johnny'])
+
+    def test_roles_are_kept_apart(self):
+        self.client.login(username='doctor', password='testpassword')
+        doctors = self.client.get('/accounts/lookup/', {'role': 'doctor'}).json()['results']
+        self.assertEqual([user['username'] for user in doctors], ['doctor'])
+
+    def test_patients_cannot_search_patients(self):
+        self.client.login(username='patient', password='testpassword')
+        self.assertEqual(self.client.get('/accounts/lookup/', {'role': 'patient'}).status_code, 403)
+        self.assertEqual(self.client.get('/accounts/lookup/', {'role': 'doctor'}).status_code, 200)
+
+    def test_prescription_form_renders_without_listing_patients(self):
+        self.client.login(username='doctor', password='testpassword')
+        response = self.client.get('/prescription/create/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'anna00')
+        self.assertContains(response, 'data-lookup-role="patient"')
+
+        # A rejected submission re-renders with only the chosen patient.
+        response = self.client.post('/prescription/create/', {
+            'patient': self.patient.id, 'advice': '',
+            'medicines-TOTAL_FORMS': 1, 'medicines-INITIAL_FORMS': 0,
+            'medicines-0-name': '', 'medicines-0-dosage': 'x', 'medicines-0-duration_weeks': 1,
+        })
+        self.assertContains(response, f'<option value="{self.patient.id}" selected>')
+        self.assertNotContains(response, 'anna00')
@@ -9,4 +9,5 @@ urlpatterns = [
     path('signup/doctor/', views.doctor_signup, name='doctor_signup'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
+    path('lookup/', views.user_lookup_view, name='user_lookup'),
 ]
@@ -1,6 +1,11 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from .forms import UserSignUpForm, DoctorSignUpForm, LoginForm
+from .lookup import lookup_users, LOOKUP_ROLES, LOOKUP_PAGE_SIZE, LOOKUP_MAX_PAGE_SIZE
+
+PROFILE_BACKEND = 'users.backends.ProfileModelBackend'
 
 def signup_choice(request):
     return render(request, 'users/signup_choice.html')
@@ -10,7 +15,8 @@ def user_signup(request):
         form = UserSignUpForm(request.POST)
         if form.is_valid():
             user = form.save()
-            login(request, user)
+            # Several backends are configured, so name the one to remember.
+            login(request, user, backend=PROFILE_BACKEND)
             return redirect('index')
     else:
         form = UserSignUpForm()
@@ -21,7 +27,8 @@ def doctor_signup(request):
         form = DoctorSignUpForm(request.POST)
         if form.is_valid():
             user = form.save()
-            login(request, user)
+            # Several backends are configured, so name the one to remember.
+            login(request, user, backend=PROFILE_BACKEND)
             return redirect('index')
     else:
         form = DoctorSignUpForm()
@@ -43,4 +50,23 @@ def login_view(request):
 
 def logout_view(request):
     logout(request)
-    return redirect('index')
\ No newline at end of file
+    return redirect('index')
+
+@login_required
+def user_lookup_view(request):
+    """
+    Typeahead for the patient and doctor pickers:
+    ?role=patient|doctor&q=<username prefix>&after=<cursor>&limit=N
+    Only doctors may search patients.
+    """
+    role = request.GET.get('role', 'doctor')
+    if role not in LOOKUP_ROLES:
+        return JsonResponse({'status': 'error', 'message': 'Unknown role.'}, status=400)
+    if role == 'patient' and (not request.profile or request.profile.user_type != 'doctor'):
+        return JsonResponse({'status': 'error', 'message': 'Only doctors can search patients.'}, status=403)
+    try:
+        limit = min(max(int(request.GET.get('limit', LOOKUP_PAGE_SIZE)), 1), LOOKUP_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = LOOKUP_PAGE_SIZE
+    results, next_cursor = lookup_users(role, request.GET.get('q', '').strip(), request.GET.get('after'), limit)
+    return JsonResponse({'results': results, 'next': next_cursor})